@@ -1,7 +1,15 @@
+import hashlib
 import os
-import sys
+import re
 import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import deque
 from pathlib import Path
+
+import duckdb
 import pandas as pd
 import streamlit as st
 
@@ -9,6 +17,190 @@ st.set_page_config(page_title="Industry Entity Finder — Demo", layout="wide")
 st.title("Industry Entity Finder — Paving Pilot Demo")
 st.write("Select options, then click **Run pipeline** to discover paving contractors in TX/MI/CO using free/low-cost sources.")
 
+# st.fragment is st.experimental_fragment before Streamlit 1.37
+fragment = getattr(st, "fragment", None) or st.experimental_fragment
+PAGE_SIZES = [50, 100, 250, 500]
+
+# --- Background pipeline runs ---
+# The pipeline runs as a child process: its stdout/stderr are private to the
+# run (no process-wide redirection shared between sessions) and its process
+# pools start from a normal main thread. A reader thread collects the output;
+# finished stages are parsed from the "Stage ..." log lines and polled by a
+# fragment.
+
+APP_DIR = Path(__file__).resolve().parent
+TMP_DIR = Path(tempfile.gettempdir()) / "ief_app"
+_STAGE_LINE = re.compile(r"Stage (\S+(?: \[[^\]]*\])*): ([\d.]+)s, rows \S+ -> (\S+),")
+
+class PipelineJob:
+    def __init__(self, argv):
+        self.argv = argv
+        self.lines = deque(maxlen=400)
+        self.stages = []
+        self.status = "running"
+        self.error = ""
+        self.started = time.time()
+        self.finished = None
+        self.thread = threading.Thread(target=self._run, name="ief-pipeline", daemon=True)
+
+    def _run(self):
+        env = {**os.environ, "PYTHONPATH": os.pathsep.join(filter(None, [str(APP_DIR), os.environ.get("PYTHONPATH")]))}
+        try:
+            proc = subprocess.Popen([sys.executable, "-u", "-m", "ief.flows.paving_run", *self.argv],
+                                    stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True, env=env)
+            for line in proc.stdout:
+                line = line.rstrip()
+                if not line:
+                    continue
+                self.lines.append(line)
+                m = _STAGE_LINE.search(line)
+                if m:
+                    rows = m.group(3)
+                    self.stages.append((m.group(1), float(m.group(2)), int(rows) if rows.isdigit() else None))
+            self.status = "done" if proc.wait() == 0 else "failed"
+            if self.status == "failed":
+                self.error = "\n".join(list(self.lines)[-15:])
+        except OSError as e:
+            self.status = "failed"
+            self.error = str(e)
+        finally:
+            _clear_tmp()
+            self.finished = time.time()
+
+def _clear_tmp():
+    """Drop CSV->Parquet conversions and prepared downloads; the run has rewritten
+    (or failed to write) the outputs."""
+    for f in [*TMP_DIR.glob("*.parquet"), *TMP_DIR.glob("*.tmp"), *TMP_DIR.glob("*.csv")]:
+        f.unlink(missing_ok=True)
+
+@st.cache_resource
+def _jobs() -> dict:
+    # one pipeline at a time per server: runs share the output paths and caches
+    return {}
+
+# --- Paged, filtered reads ---
+# Outputs are queried with DuckDB; a CSV is converted to Parquet once per
+# version (keyed by mtime) so each page only touches the row groups it needs.
+# The evidence dataset is read in place: state/source filters prune whole
+# hive partitions. Every cached reader takes the output's `version` (its
+# newest mtime), so a rewritten file or a new partition misses the cache.
+
+def _sql_str(s: str) -> str:
+    return "'" + s.replace("'", "''") + "'"
+
+def _scan(src: str) -> str:
+    return f"read_parquet({_sql_str(src)}, hive_partitioning = true)"
+
+def _mtime(path: str) -> float:
+    p = Path(path)
+    if p.is_dir():
+        return max((f.stat().st_mtime for f in p.rglob("*.parquet")), default=0.0)
+    return p.stat().st_mtime
+
+def _as_parquet(path: str, version: float) -> str:
+    if Path(path).is_dir():
+        return str(Path(path) / "run_date=*" / "**" / "*.parquet")  # skips _staging-* of a live run
+    if path.lower().endswith(".parquet"):
+        return path
+    TMP_DIR.mkdir(parents=True, exist_ok=True)
+    stem = hashlib.sha1(path.encode()).hexdigest()[:12]
+    dst = TMP_DIR / f"{stem}_{int(version * 1000)}.parquet"
+    if not dst.exists():
+        with st.spinner("Indexing output…"):
+            part = dst.with_suffix(".tmp")
+            with duckdb.connect() as con:
+                con.execute(f"COPY (SELECT * FROM read_csv_auto({_sql_str(path)}, sample_size=-1)) "
+                            f"TO {_sql_str(str(part))} (FORMAT parquet)")
+            part.replace(dst)
+        for old in TMP_DIR.glob(f"{stem}_*.parquet"):
+            if old != dst:
+                old.unlink(missing_ok=True)
+    return str(dst)
+
+@st.cache_data(max_entries=16)
+def _schema(src: str, version: float) -> dict:
+    with duckdb.connect() as con:
+        rows = con.execute(f"DESCRIBE SELECT * FROM {_scan(src)}").fetchall()
+    return {r[0]: r[1] for r in rows}
+
+@st.cache_data(max_entries=16)
+def _distinct(src: str, version: float, col: str) -> list:
+    with duckdb.connect() as con:
+        rows = con.execute(f'SELECT DISTINCT "{col}" FROM {_scan(src)} ORDER BY 1 LIMIT 200').fetchall()
+    return [r[0] for r in rows if r[0] is not None]
+
+@st.cache_data(max_entries=64)
+def _count(src: str, version: float, where: str, params: tuple) -> int:
+    with duckdb.connect() as con:
+        return con.execute(f"SELECT count(*) FROM {_scan(src)} {where}", list(params)).fetchone()[0]
+
+@st.cache_data(max_entries=64)
+def _page(src: str, version: float, where: str, params: tuple, order: str, limit: int, offset: int) -> pd.DataFrame:
+    with duckdb.connect() as con:
+        return con.execute(f"SELECT * FROM {_scan(src)} {where} {order} LIMIT ? OFFSET ?",
+                           [*params, limit, offset]).df()
+
+def _filters(src: str, version: float, schema: dict, key: str):
+    """Filter/sort widgets -> (WHERE clause, params, ORDER BY clause)."""
+    clauses, params = [], []
+    cols = st.columns([3, 2, 2, 2, 1])
+    text_cols = [c for c in ("name", "address", "city", "website", "website_root") if c in schema]
+    with cols[0]:
+        q = st.text_input("Search", key=f"{key}_q", placeholder=", ".join(text_cols[:3]) if text_cols else "")
+    if q and text_cols:
+        clauses.append("(" + " OR ".join(f'CAST("{c}" AS VARCHAR) ILIKE ?' for c in text_cols) + ")")
+        params += [f"%{q}%"] * len(text_cols)
+    for i, col in enumerate([c for c in ("state", "fit_label", "source_name") if c in schema][:2]):
+        with cols[1 + i]:
+            picked = st.multiselect(col.replace("_", " ").title(), _distinct(src, version, col), key=f"{key}_{col}")
+        if picked:
+            clauses.append(f'"{col}" IN ({", ".join("?" * len(picked))})')
+            params += picked
+    with cols[3]:
+        sort = st.selectbox("Sort by", ["(file order)"] + list(schema), key=f"{key}_sort")
+    with cols[4]:
+        desc = st.checkbox("Desc", key=f"{key}_desc")
+    order = f'ORDER BY "{sort}" {"DESC" if desc else "ASC"} NULLS LAST' if sort != "(file order)" else ""
+    where = ("WHERE " + " AND ".join(clauses)) if clauses else ""
+    return where, tuple(params), order
+
+def results_table(label: str, path: str, key: str):
+    """Paged view of a CSV/Parquet output; only the visible page is read."""
+    version = _mtime(path)
+    src = _as_parquet(path, version)
+    schema = _schema(src, version)
+    where, params, order = _filters(src, version, schema, key)
+    total = _count(src, version, where, params)
+    c1, c2, c3 = st.columns([1, 1, 4])
+    with c1:
+        size = st.selectbox("Rows per page", PAGE_SIZES, index=1, key=f"{key}_size")
+    pages = max((total + size - 1) // size, 1)
+    if st.session_state.get(f"{key}_page", 1) > pages:
+        st.session_state[f"{key}_page"] = 1  # filters shrank the result
+    with c2:
+        page = st.number_input("Page", min_value=1, max_value=pages, key=f"{key}_page")
+    with c3:
+        st.caption(f"{total:,} matching rows • page {page} of {pages:,} • {path}")
+    st.dataframe(_page(src, version, where, params, order, size, (page - 1) * size), use_container_width=True, hide_index=True)
+
+    # the CSV is only materialized when asked for, and only the filtered rows
+    if st.button("Prepare CSV download", key=f"{key}_prep"):
+        out = TMP_DIR / f"{key}_{int(time.time())}.csv"
+        out.parent.mkdir(parents=True, exist_ok=True)
+        with duckdb.connect() as con:
+            con.execute(f"COPY (SELECT * FROM {_scan(src)} {where} {order}) "
+                        f"TO {_sql_str(str(out))} (HEADER, DELIMITER ',')", list(params))
+        # one prepared download per table: the previous one is superseded
+        for old in TMP_DIR.glob(f"{key}_*.csv"):
+            if old != out:
+                old.unlink(missing_ok=True)
+        st.session_state[f"{key}_csv"] = str(out)
+    ready = st.session_state.get(f"{key}_csv")
+    if ready and Path(ready).exists():
+        with open(ready, "rb") as f:
+            st.download_button(f"Download {label} CSV", data=f, file_name=Path(path).stem + ".csv",
+                               mime="text/csv", key=f"{key}_dl")
+
 # --- Controls ---
 col1, col2, col3 = st.columns(3)
 with col1:
@@ -24,69 +216,74 @@ with col4:
 with col5:
     out_path = st.text_input("Output CSV", value=str(Path("out/paving_demo.csv").resolve()))
 
-save_evidence = st.text_input("Evidence Parquet (optional)", value=str(Path("out/evidence_demo.parquet").resolve()))
+evidence_dir = st.text_input("Evidence dataset folder (optional)", value=str(Path("out/evidence_demo").resolve()))
 
 st.divider()
 
 # --- Run button ---
-run_clicked = st.button("Run pipeline", type="primary")
+jobs = _jobs()
+job = jobs.get("current")
+busy = job is not None and job.status == "running"
+run_clicked = st.button("Run pipeline", type="primary", disabled=busy)
 
 # Ensure output dirs exist
 Path(out_path).parent.mkdir(parents=True, exist_ok=True)
-if save_evidence:
-    Path(save_evidence).parent.mkdir(parents=True, exist_ok=True)
 
 if run_clicked:
     if not states:
         st.error("Please select at least one state.")
         st.stop()
 
-    cmd = [
-        sys.executable, "-m", "ief.flows.paving_run",
+    argv = [
         "--states", *states,
         "--osm", "yes" if use_osm else "no",
         "--web-discovery", "yes" if use_web else "no",
         "--out", out_path,
     ]
     if dot_dir:
-        cmd += ["--dot-dir", dot_dir]
-    if save_evidence:
-        cmd += ["--save-evidence", save_evidence]
+        argv += ["--dot-dir", dot_dir]
+    if evidence_dir:
+        argv += ["--evidence-dir", evidence_dir]
+    job = jobs["current"] = PipelineJob(argv)
+    job.thread.start()
+    busy = True
 
-    st.info("Running: ``{}``".format(" ".join(cmd)))
+@fragment(run_every=1.0)
+def job_progress():
+    job = _jobs().get("current")
+    if job is None:
+        return
+    elapsed = (job.finished or time.time()) - job.started
+    st.info("Pipeline `{}` — {} ({:.0f}s)".format(" ".join(job.argv), job.status, elapsed))
+    if job.stages:
+        st.caption(" → ".join(f"{name} {wall:.1f}s" + (f" ({rows:,} rows)" if rows is not None else "")
+                              for name, wall, rows in job.stages))
+    st.code("\n".join(list(job.lines)[-25:]) or "(starting…)")
+    if job.status == "failed":
+        st.error("Pipeline failed.")
+        if job.error:
+            st.code(job.error)
+    elif job.status == "done" and not st.session_state.get("shown_done") == job.started:
+        # finished since the last full run: rerun the page so result tables pick up the new files
+        st.session_state["shown_done"] = job.started
+        st.rerun()
 
-    try:
-        proc = subprocess.run(cmd, capture_output=True, text=True, check=False)
-        st.code(proc.stdout or "(no stdout)")
-        if proc.returncode != 0:
-            st.error("Pipeline exited with code {}".format(proc.returncode))
-            st.code(proc.stderr or "(no stderr)")
-        else:
-            st.success("Pipeline completed.")
-    except Exception as e:
-        st.exception(e)
+job_progress()
 
 # --- Results preview ---
-if Path(out_path).exists():
+if Path(out_path).exists() and not busy:
+    st.subheader("Results")
     try:
-        df = pd.read_csv(out_path)
-        st.subheader("Results Preview")
-        st.caption(f"{len(df):,} rows • {out_path}")
-        st.dataframe(df.head(500), use_container_width=True)
-        st.download_button("Download CSV", data=df.to_csv(index=False), file_name=Path(out_path).name, mime="text/csv")
+        results_table("results", out_path, "res")
     except Exception as e:
         st.warning(f"Couldn't read output yet: {e}")
 
-if save_evidence and Path(save_evidence).exists():
-    st.caption(f"Evidence saved at: {save_evidence}")
-    if st.button("Preview first 1,000 evidence rows"):
+if evidence_dir and Path(evidence_dir).is_dir() and not busy:
+    with st.expander("Evidence rows"):
         try:
-            import pyarrow.parquet as pq
-            table = pq.read_table(save_evidence)
-            df_e = table.to_pandas().head(1000)
-            st.dataframe(df_e, use_container_width=True)
+            results_table("evidence", evidence_dir, "ev")
         except Exception as e:
-            st.warning(f"Couldn't read evidence parquet: {e}")
+            st.warning(f"Couldn't read evidence dataset: {e}")
 
 st.markdown("""
 **Notes**
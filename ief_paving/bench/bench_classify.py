@@ -0,0 +1,53 @@
+"""Rows/sec for classify_df's batch scorer vs the row-wise score_record loop.
+
+    python bench/bench_classify.py --rows 1000000
+"""
+from __future__ import annotations
+import argparse, random, time
+from pathlib import Path
+
+import pandas as pd
+import yaml
+
+from ief.classify.rules import MarketConfig, score_record, label_from_score, score_frame, labels_from_scores
+
+CFG = Path(__file__).parents[1] / "ief" / "config" / "markets" / "paving_us_v1.yaml"
+WORDS = ["acme", "lone star", "paving", "asphalt", "roofing", "quarry", "sealcoating", "bros", "services",
+         "driveway", "landscaping", "concrete", "parking lot", "inc", "llc", "ready-mix", "construction"]
+
+def synth(n: int, seed: int = 7) -> pd.DataFrame:
+    rnd = random.Random(seed)
+    return pd.DataFrame({
+        "name": [" ".join(rnd.choices(WORDS, k=3)).title() for _ in range(n)],
+        "work_types": [rnd.choice(["", "asphalt, paving", "milling", "striping"]) for _ in range(n)],
+        "source_name": [rnd.choice(["osm", "web", "txdot"]) for _ in range(n)],
+        "has_dot_flag": [rnd.random() < 0.3 for _ in range(n)],
+    })
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rows", type=int, default=1_000_000)
+    ap.add_argument("--rowwise-rows", type=int, default=100_000, help="the loop is slow; time it on a subset")
+    args = ap.parse_args()
+    cfg = yaml.safe_load(open(CFG))
+    mc = MarketConfig(include_terms=cfg["include_terms"], exclude_terms=cfg["exclude_terms"])
+    df = synth(args.rows)
+
+    t = time.perf_counter()
+    scores = score_frame(df, mc)
+    labels = labels_from_scores(scores)
+    vec_s = time.perf_counter() - t
+
+    sub = df.head(args.rowwise_rows)
+    t = time.perf_counter()
+    row_scores = [score_record(r.to_dict(), mc) for _, r in sub.iterrows()]
+    row_labels = [label_from_score(s) for s in row_scores]
+    row_s = time.perf_counter() - t
+
+    assert scores.head(len(sub)).tolist() == row_scores, "batch scores differ from score_record"
+    assert labels.head(len(sub)).tolist() == row_labels, "batch labels differ from label_from_score"
+    print(f"batch:    {args.rows:>9,} rows in {vec_s:6.2f}s  -> {args.rows / vec_s:12,.0f} rows/s")
+    print(f"row-wise: {len(sub):>9,} rows in {row_s:6.2f}s  -> {len(sub) / row_s:12,.0f} rows/s")
+
+if __name__ == "__main__":
+    main()
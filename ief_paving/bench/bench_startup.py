@@ -0,0 +1,79 @@
+"""Cold-start budget for paving_run: import cost and a tiny DOT-only run.
+
+    python bench/bench_startup.py --budget-s 1.0
+
+Fails (exit 1) if importing paving_run pulls in a source-specific dependency,
+if the median DOT-only run exceeds the budget, or if the fastest one does not
+leave `--headroom` of it spare (so a run creeping up on the budget fails
+before it crosses it; the fastest run is the steady cost, the median carries
+the machine's noise).
+"""
+from __future__ import annotations
+import argparse, os, re, statistics, subprocess, sys, tempfile, time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+from synth import write_dot_file  # noqa: E402
+
+ROOT = Path(__file__).parents[1]
+# only the stages that need these may import them
+LAZY = ["requests", "httpx", "aiohttp", "aiolimiter", "bs4", "trafilatura", "cdx_toolkit", "tldextract",
+        "phonenumbers", "duckdb", "lxml", "osmium", "rapidfuzz"]
+_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+def import_profile() -> tuple[float, list, set]:
+    """(cumulative seconds, top self-time modules, top-level packages imported)."""
+    env = dict(os.environ, PYTHONPATH=str(ROOT))
+    err = subprocess.run([sys.executable, "-X", "importtime", "-c", "import ief.flows.paving_run"],
+                         capture_output=True, text=True, env=env, check=True).stderr
+    rows = [(int(m.group(1)), int(m.group(2)), m.group(4)) for m in map(_LINE.match, err.splitlines()) if m]
+    total = next(cum for _, cum, name in rows if name == "ief.flows.paving_run")
+    top = sorted(rows, reverse=True)[:10]
+    return total / 1e6, top, {name.split(".")[0] for _, _, name in rows}
+
+def timed_run(argv: list, cwd: str) -> float:
+    env = dict(os.environ, PYTHONPATH=str(ROOT))
+    t = time.perf_counter()
+    subprocess.run([sys.executable, "-m", "ief.flows.paving_run", *argv], cwd=cwd, env=env, check=True,
+                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return time.perf_counter() - t
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--budget-s", type=float, default=1.0, help="median wall time allowed for the DOT-only run")
+    ap.add_argument("--headroom", type=float, default=0.2, help="fraction of the budget the fastest run must leave unused")
+    ap.add_argument("--rows", type=int, default=500)
+    ap.add_argument("--repeat", type=int, default=5)
+    args = ap.parse_args()
+
+    total, top, packages = import_profile()
+    print(f"import ief.flows.paving_run: {total:.3f}s")
+    for self_us, cum_us, name in top:
+        print(f"  {self_us / 1000:7.1f} ms self  {cum_us / 1000:7.1f} ms cum  {name}")
+    eager = sorted(set(LAZY) & packages)
+
+    with tempfile.TemporaryDirectory() as d:
+        write_dot_file(Path(d) / "dot" / "txdot.csv", args.rows)
+        argv = ["--states", "TX", "--dot-dir", "dot", "--osm", "no", "--web-discovery", "no",
+                "--dot-cache-dir", "", "--metrics-out", "", "--out", "out/e.csv"]
+        cold = timed_run(argv, d)  # fills the normalize memo
+        runs = [timed_run(argv, d) for _ in range(args.repeat)]
+    warm, best = statistics.median(runs), min(runs)
+    limit = args.budget_s * (1 - args.headroom)
+    print(f"DOT-only run ({args.rows} rows): first {cold:.3f}s, then median {warm:.3f}s, best {best:.3f}s "
+          f"(budget {args.budget_s:.2f}s; best must be under {limit:.2f}s)")
+
+    ok = True
+    if eager:
+        print(f"FAIL: importing paving_run loads {', '.join(eager)}")
+        ok = False
+    if warm > args.budget_s:
+        print("FAIL: DOT-only run is over budget")
+        ok = False
+    if best > limit:
+        print(f"FAIL: DOT-only run leaves less than {args.headroom:.0%} of the budget")
+        ok = False
+    sys.exit(0 if ok else 1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""Local stand-in for the web and the Overpass API, for offline benchmarks.
+
+Each contractor site gets its own loopback address (127.0.1.x, Linux) so the
+crawler's per-host pacing sees distinct hosts. Sites serve robots.txt, a
+sitemap and a handful of pages; /api/interpreter answers Overpass queries
+with synthetic elements for the requested bbox, honouring `out ... N;`.
+Latency and error rates are configurable for both.
+
+    with MockServer(sites=50) as srv:
+        srv.domains          # ["http://127.0.1.1:PORT", ...]
+        srv.overpass_url     # "http://127.0.0.1:PORT/api/interpreter"
+"""
+from __future__ import annotations
+import asyncio, json, random, re, socket, threading
+from typing import List, Optional
+
+from aiohttp import web
+
+from synth import contractor_page, osm_elements
+
+_BBOX_RE = re.compile(r"\(([-\d.]+),([-\d.]+),([-\d.]+),([-\d.]+)\)")
+_LIMIT_RE = re.compile(r"out center tags (\d+);")
+
+class MockServer:
+    def __init__(self, sites: int = 50, latency_s: float = 0.02, error_rate: float = 0.01,
+                 overpass_latency_s: float = 0.05, overpass_error_rate: float = 0.0,
+                 overpass_density: float = 40.0, jsonld_share: float = 0.5, seed: int = 1):
+        assert 0 < sites <= 250 * 250, "one loopback address per site"
+        self.sites = sites
+        self.latency_s = latency_s
+        self.error_rate = error_rate
+        self.overpass_latency_s = overpass_latency_s
+        self.overpass_error_rate = overpass_error_rate
+        self.overpass_density = overpass_density
+        self.jsonld_share = jsonld_share
+        self.rnd = random.Random(seed)
+        self.requests = 0
+        self.port = 0
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._runner: Optional[web.AppRunner] = None
+        self._thread: Optional[threading.Thread] = None
+        self._ready = threading.Event()
+
+    @staticmethod
+    def site_addr(i: int) -> str:
+        return f"127.0.{1 + i // 250}.{1 + i % 250}"
+
+    @property
+    def domains(self) -> List[str]:
+        return [f"http://{self.site_addr(i)}:{self.port}" for i in range(self.sites)]
+
+    @property
+    def overpass_url(self) -> str:
+        return f"http://127.0.0.1:{self.port}/api/interpreter"
+
+    def _site(self, request: web.Request) -> int:
+        a, b = request.host.split(":")[0].split(".")[-2:]
+        return (int(a) - 1) * 250 + int(b) - 1
+
+    async def _delay(self, mean_s: float):
+        if mean_s > 0:
+            await asyncio.sleep(self.rnd.expovariate(1 / mean_s))
+
+    async def _page(self, request: web.Request) -> web.Response:
+        self.requests += 1
+        await self._delay(self.latency_s)
+        if self.rnd.random() < self.error_rate:
+            return web.Response(status=503, headers={"Retry-After": "0"})
+        path = request.path
+        if path == "/robots.txt":
+            return web.Response(text=f"User-agent: *\nDisallow: /private\nSitemap: http://{request.host}/sitemap.xml\n")
+        if path == "/sitemap.xml":
+            locs = "".join(f"<url><loc>http://{request.host}{p}</loc></url>"
+                           for p in ["/", "/about", "/services", "/contact", "/blog/2024/spring-tips", "/gallery"])
+            return web.Response(text=f'<?xml version="1.0"?><urlset>{locs}</urlset>', content_type="application/xml")
+        if path.endswith(".pdf"):
+            return web.Response(body=b"%PDF-1.4" + b"0" * 200_000, content_type="application/pdf")
+        site = self._site(request)
+        jsonld = (site % 100) < self.jsonld_share * 100
+        return web.Response(text=contractor_page(site, path, jsonld), content_type="text/html")
+
+    async def _overpass(self, request: web.Request) -> web.Response:
+        self.requests += 1
+        await self._delay(self.overpass_latency_s)
+        if self.rnd.random() < self.overpass_error_rate:
+            return web.Response(status=504)
+        q = (await request.post()).get("data", "")
+        m = _BBOX_RE.search(q)
+        if not m:
+            return web.Response(status=400, text="no bbox")
+        elements = osm_elements(tuple(float(x) for x in m.groups()), self.overpass_density)
+        limit = _LIMIT_RE.search(q)
+        if limit:
+            elements = elements[:int(limit.group(1))]
+        return web.Response(text=json.dumps({"elements": elements}), content_type="application/json")
+
+    def _free_port(self) -> int:
+        with socket.socket() as s:
+            s.bind(("127.0.0.1", 0))
+            return s.getsockname()[1]
+
+    async def _start(self):
+        app = web.Application()
+        app.router.add_post("/api/interpreter", self._overpass)
+        app.router.add_get("/{tail:.*}", self._page)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        self.port = self._free_port()
+        for addr in ["127.0.0.1"] + [self.site_addr(i) for i in range(self.sites)]:
+            await web.TCPSite(self._runner, addr, self.port).start()
+
+    def _serve(self):
+        self._loop = asyncio.new_event_loop()
+        self._loop.run_until_complete(self._start())
+        self._ready.set()
+        self._loop.run_forever()
+        self._loop.run_until_complete(self._runner.cleanup())
+        self._loop.close()
+
+    def start(self) -> "MockServer":
+        self._thread = threading.Thread(target=self._serve, daemon=True)
+        self._thread.start()
+        self._ready.wait(30)
+        return self
+
+    def stop(self):
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join(30)
+
+    def __enter__(self) -> "MockServer":
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
@@ -0,0 +1,219 @@
+"""Offline benchmark suite; results are saved per commit so runs can be compared.
+
+    python bench/run_bench.py                          # everything, 10k/100k/1M rows
+    python bench/run_bench.py --only rows --sizes 10000 100000
+    python bench/run_bench.py --compare bench/results/<older>.json
+
+Throughputs: pages/sec for crawl_domains and tiles/sec for collect_state
+against the local mock server, rows/sec for DOT parsing, normalize_df,
+classify_df, simple_dedupe and resolve_entities on synthetic evidence;
+MB per column for evidence as object strings vs the typed schema; queries/sec
+for GridIndex radius lookups and point-in-state checks; seconds for a full
+vs an incremental --delta-dir run after 1% of the rows changed.
+"""
+from __future__ import annotations
+import argparse, asyncio, json, logging, os, platform, subprocess, sys, tempfile, time
+from pathlib import Path
+
+import yaml
+
+sys.path.insert(0, str(Path(__file__).parent))
+from synth import evidence_frame, write_dot_file  # noqa: E402
+
+from ief import metrics  # noqa: E402
+from ief.flows.paving_run import normalize_df, classify_df  # noqa: E402
+from ief.ingestion.dot_common import DEFAULT_DOT_SOURCES, parse_dot_files  # noqa: E402
+from ief.resolve.matching import simple_dedupe, resolve_entities  # noqa: E402
+
+RESULTS_DIR = Path(__file__).parent / "results"
+CFG = Path(__file__).parents[1] / "ief" / "config" / "markets" / "paving_us_v1.yaml"
+
+def _requests(source: str) -> int:
+    return int(sum(v for (name, labels), v in metrics.PROFILE.counters.items()
+                   if name == "http_requests_total" and dict(labels).get("source") == source))
+
+def bench_crawl(args) -> dict:
+    from mock_server import MockServer
+    from ief.ingestion.web_discovery import crawl_domains
+    from ief.ingestion.crawl_shards import crawl_sharded
+    with MockServer(sites=args.sites, latency_s=args.latency, error_rate=args.error_rate) as srv, \
+            tempfile.TemporaryDirectory() as state_dir:
+        metrics.reset()
+        t = time.perf_counter()
+        if args.crawl_shards:
+            rows = crawl_sharded(srv.domains, state_dir, shards=args.crawl_shards, concurrency=args.crawl_concurrency,
+                                 rate_per_host=10.0, global_rps=1000.0 * args.crawl_shards,
+                                 max_connections=100 * args.crawl_shards, extract_workers=0)
+        else:
+            rows = asyncio.run(crawl_domains(srv.domains, limit=args.sites, concurrency=args.crawl_concurrency,
+                                             rate_per_host=10.0, global_rps=1000.0, extract_workers=args.extract_workers))
+        secs = time.perf_counter() - t
+    pages = _requests("web")
+    return {"sites": args.sites, "shards": args.crawl_shards, "pages": pages, "rows": len(rows), "seconds": round(secs, 3),
+            "pages_per_s": round(pages / secs, 1), "pages_per_row": round(pages / max(len(rows), 1), 2)}
+
+def bench_overpass(args) -> dict:
+    from mock_server import MockServer
+    from ief.ingestion.osm_overpass import collect_state
+    with MockServer(sites=1, overpass_latency_s=args.latency, overpass_error_rate=0.0,
+                    overpass_density=args.osm_density) as srv:
+        metrics.reset()
+        t = time.perf_counter()
+        elements = collect_state("CO", "(paving|asphalt)", concurrency=args.osm_concurrency, url=srv.overpass_url)
+        secs = time.perf_counter() - t
+    tiles = _requests("overpass")
+    return {"tiles": tiles, "elements": len(elements), "seconds": round(secs, 3), "tiles_per_s": round(tiles / secs, 1)}
+
+def _rate(fn, n: int) -> dict:
+    t = time.perf_counter()
+    out = fn()
+    secs = time.perf_counter() - t
+    return {"rows": n, "seconds": round(secs, 3), "rows_per_s": round(n / secs), "rows_out": len(out)}
+
+def bench_rows(args) -> dict:
+    cfg = yaml.safe_load(open(CFG))
+    results = {}
+    for n in args.sizes:
+        df = evidence_frame(n)
+        norm = normalize_df(df)
+        clf = classify_df(norm.copy(), cfg)
+        res = {"normalize_df": _rate(lambda: normalize_df(df), n),
+               "classify_df": _rate(lambda: classify_df(norm.copy(), cfg), n),
+               "simple_dedupe": _rate(lambda: simple_dedupe(clf), n)}
+        if n <= args.resolve_max:
+            res["resolve_entities"] = _rate(lambda: resolve_entities(clf)[0], n)
+        results[str(n)] = res
+        logging.info("rows %d: %s", n, {k: v["rows_per_s"] for k, v in res.items()})
+    return results
+
+def bench_dot(args) -> dict:
+    results = {}
+    with tempfile.TemporaryDirectory() as d:
+        for suffix, n in [(".csv", max(args.sizes)), (".xlsx", min(args.sizes))]:
+            path = write_dot_file(Path(d) / f"txdot_bench{suffix}", n)
+            results[suffix.lstrip(".")] = _rate(lambda: parse_dot_files([(path, DEFAULT_DOT_SOURCES["TX"])], workers=1)[0], n)
+    return results
+
+def bench_memory(args) -> dict:
+    """Footprint of synthetic evidence as object-dtype strings vs the typed evidence schema."""
+    from ief.schema import as_evidence, memory_report
+    results = {}
+    for n in args.sizes:
+        raw = evidence_frame(n).astype(object)
+        t = time.perf_counter()
+        typed = as_evidence(raw)
+        secs = time.perf_counter() - t
+        rep = memory_report(raw, typed)
+        print(f"-- {n:,} rows\n{rep.to_string()}")
+        results[str(n)] = {"mb_object": rep.loc["total", "mb_before"], "mb_typed": rep.loc["total", "mb_after"],
+                           "ratio": rep.loc["total", "ratio"], "typed_rows_per_s": round(n / secs),
+                           "columns": rep.drop(index="total")[["mb_before", "mb_after"]].to_dict("index")}
+    return results
+
+def bench_geo(args) -> dict:
+    import numpy as np
+    from ief.resolve.spatial import GridIndex, in_state
+    rng = np.random.default_rng(0)
+    n = args.geo_points
+    lat, lon = rng.uniform(25.8, 36.5, n), rng.uniform(-106.6, -93.5, n)  # TX bounding box
+    t = time.perf_counter()
+    index = GridIndex(lat, lon, cell_m=args.geo_radius)
+    build = time.perf_counter() - t
+    probes = rng.integers(0, n, 5000)
+    t = time.perf_counter()
+    for i in probes:
+        index.query_radius(lat[i], lon[i], args.geo_radius)
+    query = (time.perf_counter() - t) / len(probes)
+    t = time.perf_counter()
+    ii, _ = index.pairs_within(args.geo_radius)
+    pairs = time.perf_counter() - t
+    t = time.perf_counter()
+    inside = in_state(lat, lon, "TX")
+    pip = time.perf_counter() - t
+    return {"points": n, "radius_m": args.geo_radius, "build_s": round(build, 3), "query_us": round(query * 1e6, 1),
+            "queries_per_s": round(1 / query), "pairs": len(ii), "pairs_s": round(pairs, 3),
+            "in_state_share": round(float(inside.mean()), 3), "in_state_points_per_s": round(n / pip)}
+
+def bench_delta(args) -> dict:
+    """run_delta from empty state, then again after editing 1% of rows and dropping another 1%."""
+    from ief.flows.paving_run import run_delta
+    from ief.schema import as_evidence
+    cfg = yaml.safe_load(open(CFG))
+    results = {}
+    for n in [s for s in args.sizes if s <= args.resolve_max]:
+        df = as_evidence(evidence_frame(n))
+        k = max(n // 100, 1)
+        changed = df.iloc[:-k].copy()
+        changed.loc[:k - 1, "address"] = "1 Changed Rd"
+        with tempfile.TemporaryDirectory() as d:
+            ns = argparse.Namespace(delta_dir=f"{d}/state", out=f"{d}/entities.csv", normalize_cache="",
+                                    geo_radius_m=250, save_evidence="", save_clusters="")
+            t = time.perf_counter()
+            run_delta(ns, cfg, df)
+            full = time.perf_counter() - t
+            t = time.perf_counter()
+            run_delta(ns, cfg, changed)
+            delta = time.perf_counter() - t
+        results[str(n)] = {"changed_rows": 2 * k, "full_s": round(full, 3), "delta_s": round(delta, 3),
+                           "speedup": round(full / delta, 1)}
+        logging.info("delta %d: %s", n, results[str(n)])
+    return results
+
+def _git(*cmd) -> str:
+    try:
+        return subprocess.run(["git", *cmd], capture_output=True, text=True, cwd=Path(__file__).parent).stdout.strip()
+    except Exception:
+        return ""
+
+def compare(new: dict, old: dict, prefix: str = ""):
+    """Print every throughput that moved, as new/old."""
+    for k, v in new.items():
+        o = old.get(k) if isinstance(old, dict) else None
+        if isinstance(v, dict):
+            compare(v, o or {}, f"{prefix}{k}.")
+        elif k.endswith("_per_s") and isinstance(o, (int, float)) and o:
+            ratio = v / o
+            flag = "  REGRESSION" if ratio < 0.9 else ""
+            print(f"{prefix}{k}: {o} -> {v} ({ratio:.2f}x){flag}")
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--only", nargs="+", default=["crawl", "overpass", "dot", "rows", "memory", "geo", "delta"],
+                    choices=["crawl", "overpass", "dot", "rows", "memory", "geo", "delta"])
+    ap.add_argument("--sizes", nargs="+", type=int, default=[10_000, 100_000, 1_000_000])
+    ap.add_argument("--resolve-max", type=int, default=100_000, help="largest size to run resolve_entities on")
+    ap.add_argument("--sites", type=int, default=100)
+    ap.add_argument("--latency", type=float, default=0.02, help="mean mock response latency (s)")
+    ap.add_argument("--error-rate", type=float, default=0.01)
+    ap.add_argument("--crawl-concurrency", type=int, default=50)
+    ap.add_argument("--extract-workers", type=int, default=2)
+    ap.add_argument("--crawl-shards", type=int, default=0, help="crawl through crawl_sharded with this many processes")
+    ap.add_argument("--osm-density", type=float, default=600.0, help="synthetic elements per square degree")
+    ap.add_argument("--osm-concurrency", type=int, default=4)
+    ap.add_argument("--geo-points", type=int, default=500_000)
+    ap.add_argument("--geo-radius", type=float, default=250.0, help="metres, for radius queries and proximity pairs")
+    ap.add_argument("--out", type=str, default="", help="result file (default bench/results/<commit>.json)")
+    ap.add_argument("--compare", type=str, default="", help="earlier result file to compare against")
+    args = ap.parse_args()
+    logging.basicConfig(level=logging.WARNING, format="%(levelname)s %(message)s")
+
+    commit = _git("rev-parse", "--short", "HEAD") or "unknown"
+    dirty = bool(_git("status", "--porcelain", "--untracked-files=no"))
+    result = {"commit": commit, "dirty": dirty, "date": time.strftime("%Y-%m-%dT%H:%M:%S"),
+              "python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count(),
+              "args": vars(args)}
+    for name in args.only:
+        print(f"== {name}", flush=True)
+        result[name] = {"crawl": bench_crawl, "overpass": bench_overpass, "dot": bench_dot, "rows": bench_rows,
+                        "memory": bench_memory, "geo": bench_geo, "delta": bench_delta}[name](args)
+        print(json.dumps(result[name], indent=1))
+
+    out = Path(args.out) if args.out else RESULTS_DIR / f"{commit}{'-dirty' if dirty else ''}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(result, indent=2))
+    print(f"Saved {out}")
+    if args.compare:
+        compare(result, json.loads(Path(args.compare).read_text()))
+
+if __name__ == "__main__":
+    main()
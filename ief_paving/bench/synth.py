@@ -0,0 +1,105 @@
+"""Deterministic synthetic inputs for the benchmarks: DOT files, OSM elements,
+evidence frames and contractor web pages."""
+from __future__ import annotations
+import json, random
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+import pandas as pd
+
+FIRST = ["Lone Star", "Great Lakes", "Front Range", "Acme", "Summit", "Blue Ridge", "Eagle", "Pioneer",
+         "Precision", "Allied", "Capital", "Heritage", "Keystone", "Liberty", "Metro", "Northern"]
+TRADE = ["Paving", "Asphalt", "Sealcoating", "Roofing", "Concrete", "Landscaping", "Construction", "Ready-Mix"]
+SUFFIX = ["Inc", "LLC", "Co", "Corp", "", "Bros", "& Sons"]
+CITIES = {"TX": ["Austin", "Dallas", "Houston", "El Paso"], "MI": ["Detroit", "Lansing", "Flint"],
+          "CO": ["Denver", "Boulder", "Pueblo"]}
+WORK = ["HMAC Paving", "Concrete Paving", "Seal Coat", "Milling", "Roofing", "Striping"]
+
+SYLLABLES = ["ka", "lo", "mer", "tin", "vo", "ran", "del", "ash", "bri", "cor", "den", "fal", "gor", "hal",
+             "jen", "kin", "lar", "mon", "nor", "pel", "quin", "ros", "sten", "tor", "val", "wes", "yar", "zen"]
+
+def _word(r: random.Random) -> str:
+    return "".join(r.choice(SYLLABLES) for _ in range(3)).title()
+
+def contractor(rnd: random.Random, i: int, state: str) -> Dict[str, str]:
+    # ~1 in 4 names repeats an earlier firm with noise, so dedupe has something to do
+    base = i if rnd.random() > 0.25 else rnd.randrange(max(i, 1))
+    r = random.Random(base)
+    name = f"{_word(r)} {r.choice(FIRST)} {r.choice(TRADE)} {r.choice(SUFFIX)}".strip()
+    if base != i and rnd.random() < 0.5:
+        name = name.upper()
+    return {
+        "name": name,
+        "address": f"{r.randrange(100, 9999)} {r.choice(['Main', 'Oak', 'Elm', 'Industrial'])} St",
+        "city": r.choice(CITIES.get(state, ["Springfield"])),
+        "state": state,
+        "postal_code": f"{r.randrange(10000, 99999)}",
+        "phone": f"({r.randrange(201, 989)}) 555-{base % 10000:04d}" if r.random() < 0.8 else "",
+        "website": f"www.{name.split()[0].lower()}{base % 97}.com" if r.random() < 0.6 else "",
+        "work_types": r.choice(WORK),
+    }
+
+def evidence_frame(n: int, seed: int = 7, states=("TX", "MI", "CO")) -> pd.DataFrame:
+    """Evidence rows shaped like paving_run's concatenated sources."""
+    rnd = random.Random(seed)
+    rows = []
+    for i in range(n):
+        st = states[i % len(states)]
+        row = contractor(rnd, i, st)
+        row["source_name"] = rnd.choice(["osm", "web", {"TX": "txdot", "MI": "mdot", "CO": "cdot"}[st]])
+        row["has_dot_flag"] = row["source_name"] not in ("osm", "web")
+        rows.append(row)
+    return pd.DataFrame(rows)
+
+DOT_HEADERS = {"name": "Firm Name", "address": "Street Address", "city": "City", "state": "State",
+               "postal_code": "Zip Code", "phone": "Phone Number", "website": "Web Site", "work_types": "Work Category"}
+
+def write_dot_file(path: str|Path, n: int, state: str = "TX", seed: int = 11) -> Path:
+    """A DOT prequalification list (.csv or .xlsx) with the headers the sniffing rules expect."""
+    rnd = random.Random(seed)
+    df = pd.DataFrame([contractor(rnd, i, state) for i in range(n)]).rename(columns=DOT_HEADERS)
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    if path.suffix.lower() == ".xlsx":
+        df.to_excel(path, index=False)
+    else:
+        df.to_csv(path, index=False)
+    return path
+
+def osm_elements(bbox: Tuple[float, float, float, float], per_sq_deg: float, seed: int = 3) -> List[dict]:
+    """Overpass-shaped elements (nodes, and ways with a center) scattered over a bbox."""
+    s, w, n, e = bbox
+    rnd = random.Random(f"{seed}|{bbox}")
+    count = int(per_sq_deg * (n - s) * (e - w))
+    out = []
+    for i in range(count):
+        lat, lon = rnd.uniform(s, n), rnd.uniform(w, e)
+        oid = int(abs(lat) * 1e5) * 1000003 + int(abs(lon) * 1e5)
+        tags = {"name": f"{rnd.choice(FIRST)} {rnd.choice(['Paving', 'Asphalt', 'Sealcoating'])}",
+                "addr:city": "Springfield", "phone": f"+1512555{rnd.randrange(10000):04d}"}
+        if i % 3:
+            out.append({"type": "node", "id": oid, "lat": lat, "lon": lon, "tags": tags})
+        else:
+            out.append({"type": "way", "id": oid, "center": {"lat": lat, "lon": lon}, "tags": tags})
+    return out
+
+def contractor_page(site: int, path: str, jsonld: bool) -> str:
+    """An HTML page for a mock contractor site; JSON-LD sites carry a LocalBusiness block."""
+    r = random.Random(site)
+    row = contractor(r, site, "TX")
+    ld = ""
+    if jsonld:
+        ld = '<script type="application/ld+json">' + json.dumps({
+            "@context": "https://schema.org", "@type": "HomeAndConstructionBusiness", "name": row["name"],
+            "telephone": row["phone"] or "(512) 555-0100",
+            "address": {"@type": "PostalAddress", "streetAddress": row["address"], "addressLocality": row["city"],
+                        "addressRegion": "TX", "postalCode": row["postal_code"]}}) + "</script>"
+    body = {
+        "/": f"<h1>{row['name']}</h1><p>Family owned since {1950 + site % 70}.</p>",
+        "/contact": f"<p>Call us at {row['phone'] or '(512) 555-0100'} or visit {row['address']}, {row['city']}.</p>",
+        "/services": "<article><p>We provide asphalt paving, sealcoating, milling and overlay for every "
+                     "driveway and parking lot in the region, with crews ready for commercial and residential jobs.</p></article>",
+        "/about": "<p>Our team has decades of experience. " + "Quality work, on time. " * 20 + "</p>",
+    }.get(path, "<p>Page</p>" * 50)
+    return (f"<!doctype html><html><head><title>{row['name']}</title>{ld}</head>"
+            f"<body><nav><a href='/contact'>Contact</a> <a href='/services'>Services</a></nav>{body}</body></html>")
@@ -1,14 +1,22 @@
 from __future__ import annotations
+import re
 from dataclasses import dataclass
-from typing import List, Dict
+from typing import List, Dict, Optional
+
+import numpy as np
+import pandas as pd
 
 @dataclass
 class MarketConfig:
     include_terms: List[str]
     exclude_terms: List[str]
 
+def _text(v) -> str:
+    return v if isinstance(v, str) else ''
+
 def score_record(rec: Dict, cfg: MarketConfig) -> float:
-    name = (rec.get('name') or '') + ' ' + (rec.get('work_types') or '') + ' ' + (rec.get('source_name') or '')
+    # missing values (None, NaN) count as empty text, as in score_frame
+    name = _text(rec.get('name')) + ' ' + _text(rec.get('work_types')) + ' ' + _text(rec.get('source_name'))
     name_low = name.lower()
     score = 0.0
     if any(t in name_low for t in cfg.include_terms):
@@ -22,4 +30,39 @@ def score_record(rec: Dict, cfg: MarketConfig) -> float:
 def label_from_score(s: float) -> str:
     if s > 0.5: return 'include'
     if s < 0.2: return 'exclude'
-    return 'review'
\ No newline at end of file
+    return 'review'
+
+def compile_terms(terms: List[str]) -> Optional[re.Pattern]:
+    """One alternation regex equivalent to `any(t in text for t in terms)`.
+
+    Longer terms go first so overlapping prefixes don't shadow each other;
+    for a yes/no "contains any" test the order doesn't change the answer.
+    """
+    terms = [t for t in terms if t]
+    if not terms:
+        return None
+    return re.compile("|".join(re.escape(t) for t in sorted(set(terms), key=len, reverse=True)))
+
+def _text_col(df: pd.DataFrame, col: str) -> pd.Series:
+    if col not in df.columns:
+        return pd.Series('', index=df.index, dtype=object)
+    return df[col].astype(object).fillna('').astype(str)
+
+def score_frame(df: pd.DataFrame, cfg: MarketConfig) -> pd.Series:
+    """Column-at-a-time equivalent of `score_record` for a whole frame."""
+    text = (_text_col(df, 'name') + ' ' + _text_col(df, 'work_types') + ' ' + _text_col(df, 'source_name')).str.lower()
+    score = np.zeros(len(df))
+    inc = compile_terms(cfg.include_terms)
+    if inc is not None:
+        score = np.where(text.str.contains(inc, regex=True).to_numpy(dtype=bool), score + 0.6, score)
+    exc = compile_terms(cfg.exclude_terms)
+    if exc is not None:
+        score = np.where(text.str.contains(exc, regex=True).to_numpy(dtype=bool), score - 0.9, score)
+    if 'has_dot_flag' in df.columns:
+        # astype(bool) mirrors Python truthiness, NaN included
+        score = np.where(df['has_dot_flag'].astype(bool).to_numpy(), score + 0.4, score)
+    return pd.Series(np.clip(score, -1.0, 1.0), index=df.index)
+
+def labels_from_scores(scores: pd.Series) -> pd.Series:
+    s = scores.to_numpy()
+    return pd.Series(np.select([s > 0.5, s < 0.2], ['include', 'exclude'], 'review'), index=scores.index)
@@ -1,141 +1,609 @@
 from __future__ import annotations
-import argparse, yaml
+import argparse, asyncio, copy, json, logging, re, tempfile, yaml
+from typing import Dict, Iterator, List
 from pathlib import Path
 import pandas as pd
 
-from ief.ingestion.osm_overpass import collect_state
-from ief.ingestion.commoncrawl_index import query_commoncrawl_keywords
-from ief.ingestion.web_discovery import crawl_domains
-from ief.ingestion.dot_tx import parse_txdot
-from ief.ingestion.dot_mi import parse_mdot
-from ief.ingestion.dot_co import parse_cdot
-from ief.normalize.cleaning import normalize_name, to_e164, root_domain
-from ief.classify.rules import MarketConfig, score_record, label_from_score
-from ief.resolve.matching import simple_dedupe
-from ief.storage.db import write_csv, write_parquet
-
-def load_cfg() -> dict:
-    cfgp = Path(__file__).parents[1] / "config" / "markets" / "paving_us_v1.yaml"
+from ief.ingestion.dot_common import DEFAULT_DOT_SOURCES, parse_dot_files, parse_dot_jobs, iter_dot_file
+from ief.normalize.cleaning import normalize_name, to_e164, root_domain, normalize_unique, NormalizeMemo
+from ief.classify.rules import MarketConfig, score_frame, labels_from_scores
+from ief.resolve.matching import simple_dedupe, resolve_entities
+from ief.storage.db import evidence_ids, write_csv, write_parquet
+from ief.metrics import PROFILE
+from ief.schema import ENTITY_COLUMNS, EVIDENCE_SCHEMA, as_evidence, concat_evidence
+# Source- and mode-specific modules (requests/httpx/bs4/trafilatura, duckdb,
+# pyarrow) are imported inside the functions that use them, so a DOT-only run
+# starts without them. bench/bench_startup.py keeps this honest.
+
+MARKETS_DIR = Path(__file__).parents[1] / "config" / "markets"
+DEFAULT_MARKET = "paving_us_v1"
+
+def load_cfg(market: str|Path = DEFAULT_MARKET) -> dict:
+    """Market YAML by path, or by name under config/markets."""
+    cfgp = Path(market)
+    if not cfgp.is_file():
+        cfgp = MARKETS_DIR / f"{market}.yaml"
     with open(cfgp, "r") as f:
-        return yaml.safe_load(f)
+        cfg = yaml.load(f, Loader=getattr(yaml, "CSafeLoader", yaml.SafeLoader))
+    cfg.setdefault("market_id", cfgp.stem)
+    return cfg
+
+def _osm_rows(elements, state: str|None = None) -> list:
+    from ief.ingestion.osm_extract import element_latlon
+    rows = []
+    for el in elements:
+        tags = el.get("tags", {}) or {}
+        name = tags.get("name") or ""
+        addr = " ".join([tags.get(k, "") for k in ["addr:housenumber","addr:street","addr:unit","addr:city","addr:state","addr:postcode"]]).strip()
+        lat, lon = element_latlon(el)
+        rows.append({
+            "source_name": "osm",
+            "name": name,
+            "address": addr,
+            "city": tags.get("addr:city"),
+            "state": tags.get("addr:state") or state,
+            "postal_code": tags.get("addr:postcode"),
+            "phone": tags.get("phone") or tags.get("contact:phone"),
+            "website": tags.get("website") or tags.get("contact:website"),
+            "work_types": "",
+            "lat": lat,
+            "lon": lon,
+        })
+    return rows
 
-def ingest_osm(states, name_regex) -> pd.DataFrame:
+def ingest_osm(states, name_regex, extract: str|None = None, **collect_kwargs) -> pd.DataFrame:
+    """Overpass per state, or a single streaming pass over a local OSM extract."""
+    from ief.ingestion.osm_overpass import collect_state
+    from ief.ingestion.osm_extract import collect_extract
     rows = []
+    if extract:
+        by_state = collect_extract(extract, name_regex, states)
+        for st in states:
+            rows.extend(_osm_rows(by_state[st], st))
+        return as_evidence(pd.DataFrame(rows))
     for st in states:
-        elements = collect_state(st, name_regex)
-        for el in elements:
-            tags = el.get("tags", {}) or {}
-            name = tags.get("name") or ""
-            addr = " ".join([tags.get(k, "") for k in ["addr:housenumber","addr:street","addr:unit","addr:city","addr:state","addr:postcode"]]).strip()
-            rows.append({
-                "source_name": "osm",
-                "name": name,
-                "address": addr,
-                "city": tags.get("addr:city"),
-                "state": tags.get("addr:state"),
-                "postal_code": tags.get("addr:postcode"),
-                "phone": tags.get("phone") or tags.get("contact:phone"),
-                "website": tags.get("website") or tags.get("contact:website"),
-                "work_types": "",
-            })
-    return pd.DataFrame(rows)
-
-def ingest_dot(states, dot_dir: Path) -> pd.DataFrame:
-    frames = []
-    # Web discovery (domains via CommonCrawl + focused crawl)
-    if args.web_discovery.lower().startswith('y'):
-        keywords = cfg['include_terms']
-        domains = query_commoncrawl_keywords(keywords, limit=1500)
-        if domains:
-            import asyncio
-            web_rows = asyncio.run(crawl_domains(domains, limit=800))
-            import pandas as pd
-            if web_rows:
-                frames.append(pd.DataFrame(web_rows))
-        else:
-            print('CommonCrawl query returned 0 domains (library unavailable or no matches). Skipping web discovery.')
-    if "TX" in states:
-        for p in dot_dir.glob("*tx*.*"):
-            frames.append(parse_txdot(p))
-    if "MI" in states:
-        for p in dot_dir.glob("*mi*.*"):
-            frames.append(parse_mdot(p))
-    if "CO" in states:
-        for p in dot_dir.glob("*co*.*"):
-            frames.append(parse_cdot(p))
-    if frames:
-        df = pd.concat(frames, ignore_index=True)
-        df["has_dot_flag"] = True
-        return df
-    return pd.DataFrame(columns=["name","address","city","state","postal_code","phone","website","work_types","source_name","has_dot_flag"])
-
-def normalize_df(df: pd.DataFrame) -> pd.DataFrame:
+        rows.extend(_osm_rows(collect_state(st, name_regex, **collect_kwargs), st))
+    return as_evidence(pd.DataFrame(rows))
+
+def union_regex(regexes: List[str]) -> str:
+    """One Overpass name filter covering several markets (POSIX ERE: plain groups)."""
+    regexes = list(dict.fromkeys(regexes))
+    return regexes[0] if len(regexes) == 1 else "|".join(f"({r})" for r in regexes)
+
+def non_capturing(regex: str) -> str:
+    """`regex` with its plain groups made (?:...), so pandas' str.contains doesn't
+    warn about match groups it won't use."""
+    return re.sub(r"(?<!\\)\((?!\?)", "(?:", regex)
+
+def split_by_name(df: pd.DataFrame, cfgs: List[dict]) -> Dict[str, pd.DataFrame]:
+    """OSM rows fetched with the union regex, re-filtered per market."""
+    names = df["name"].astype(object).fillna("").astype(str) if len(df) else pd.Series([], dtype=object)
+    return {cfg["market_id"]: df[names.str.contains(non_capturing(cfg["platform_categories"]["osm_name_regex"]),
+                                                    case=False, regex=True)]
+            for cfg in cfgs}
+
+def _dot_jobs(states, dot_dir: Path, sources: dict|None) -> list:
+    sources = sources or DEFAULT_DOT_SOURCES
+    jobs, seen = [], set()
+    for st in states:
+        spec = sources.get(st)
+        if not spec:
+            continue
+        for pattern in spec.get("globs", []):
+            for p in sorted(dot_dir.glob(pattern)):
+                if p.is_file() and (p, st) not in seen:
+                    seen.add((p, st))
+                    jobs.append((p, spec))
+    return jobs
+
+def ingest_dot(states, dot_dir: Path, sources: dict|None = None, cache_dir: str|None = None,
+               workers: int|None = None) -> pd.DataFrame:
+    frames = parse_dot_files(_dot_jobs(states, dot_dir, sources), cache_dir=cache_dir, workers=workers)
+    return as_evidence(concat_evidence(frames), has_dot_flag=True)
+
+def ingest_dot_markets(states, dot_dir: Path, cfgs: List[dict], cache_dir: str|None = None,
+                       workers: int|None = None) -> Dict[str, pd.DataFrame]:
+    """DOT evidence per market; a file + column spec used by several markets is parsed once."""
+    jobs = {cfg["market_id"]: _dot_jobs(states, dot_dir, cfg.get("dot_sources")) for cfg in cfgs}
+    key = lambda job: (str(job[0]), json.dumps(job[1], sort_keys=True))
+    unique = {key(job): job for market_jobs in jobs.values() for job in market_jobs}
+    parsed = dict(zip(unique, parse_dot_jobs(list(unique.values()), cache_dir=cache_dir, workers=workers)))
+    out = {}
+    for mid, market_jobs in jobs.items():
+        frames = [parsed[key(job)] for job in market_jobs if parsed[key(job)] is not None]
+        out[mid] = as_evidence(concat_evidence(frames), has_dot_flag=True)
+    return out
+
+def normalize_df(df: pd.DataFrame, memo: NormalizeMemo|None = None) -> pd.DataFrame:
     df = df.copy()
     for col in ["name","phone","website","address","city","state","postal_code","work_types","source_name"]:
         if col not in df.columns:
             df[col] = ""
-    df["name"] = df["name"].map(normalize_name)
-    df["phone"] = df["phone"].map(to_e164)
-    df["website_root"] = df["website"].map(root_domain)
+    for col in ["lat", "lon"]:
+        df[col] = pd.to_numeric(df[col], errors="coerce") if col in df.columns else float("nan")
+    df["name"] = normalize_unique(df["name"], normalize_name)
+    df["phone"] = normalize_unique(df["phone"], to_e164, memo, "phone")
+    df["website_root"] = normalize_unique(df["website"], root_domain, memo, "domain")
     return df
 
+def save_memo(memo: NormalizeMemo):
+    memo.save()
+    PROFILE.count("normalize_memo_lookups_total", memo.hits, result="hit")
+    PROFILE.count("normalize_memo_lookups_total", memo.misses, result="miss")
+
+def count_sources(df: pd.DataFrame, market: str = DEFAULT_MARKET):
+    if "source_name" in df.columns:
+        for src, n in df["source_name"].astype(object).fillna("").value_counts().items():
+            PROFILE.count("evidence_rows_total", int(n), source=src or "unknown", market=market)
+
+def entity_columns(entities: pd.DataFrame) -> pd.DataFrame:
+    """Resolved entities with the published ENTITY_COLUMNS, in order."""
+    return entities[[c for c in ENTITY_COLUMNS if c in entities.columns]]
+
 def classify_df(df: pd.DataFrame, cfg: dict) -> pd.DataFrame:
     mc = MarketConfig(include_terms=cfg["include_terms"], exclude_terms=cfg["exclude_terms"])
-    scores = []
-    labels = []
-    for _, r in df.iterrows():
-        s = score_record(r.to_dict(), mc)
-        scores.append(s)
-        labels.append(label_from_score(s))
+    scores = score_frame(df, mc)
     df["market_fit_score"] = scores
-    df["fit_label"] = labels
+    df["fit_label"] = labels_from_scores(scores)
     return df
 
-def main():
+# Streaming mode: every source yields bounded batches; only these compact
+# columns of kept rows stay in memory for resolution.
+STREAM_KEY_COLS = ["row_id", "source_name", "name", "phone", "website_root", "state", "postal_code", "address",
+                   "lat", "lon", "has_dot_flag", "market_fit_score"]
+SPOOL_SCHEMA = {"row_id": "int", **EVIDENCE_SCHEMA, "website_root": "string",
+                "market_fit_score": "float", "fit_label": "category"}
+
+def _batches(rows: list, batch_size: int) -> Iterator[pd.DataFrame]:
+    for i in range(0, len(rows), batch_size):
+        yield as_evidence(pd.DataFrame(rows[i:i + batch_size]))
+
+def iter_evidence_batches(args, cfg: dict, batch_size: int) -> Iterator[pd.DataFrame]:
+    from ief.ingestion.osm_overpass import collect_state
+    from ief.ingestion.osm_extract import iter_extract, states_for
+    if args.web_discovery.lower().startswith('y'):
+        yield from _batches(discover_web(args, [cfg])[cfg["market_id"]], batch_size)
+    dot_dir = Path(args.dot_dir)
+    if dot_dir.exists():
+        for path, spec in _dot_jobs(args.states, dot_dir, cfg.get("dot_sources")):
+            try:
+                for chunk in iter_dot_file(path, spec, chunksize=batch_size):
+                    yield as_evidence(chunk, has_dot_flag=True)
+            except ValueError as e:
+                logging.warning("Could not parse DOT file %s: %s", path, e)
+    if args.osm.lower().startswith("y") or args.osm_extract:
+        name_regex = cfg["platform_categories"]["osm_name_regex"]
+        if args.osm_extract:
+            buf = []
+            for el in iter_extract(args.osm_extract, name_regex):
+                for st in states_for(el, args.states):
+                    buf.extend(_osm_rows([el], st))
+                if len(buf) >= batch_size:
+                    yield as_evidence(pd.DataFrame(buf))
+                    buf = []
+            if buf:
+                yield as_evidence(pd.DataFrame(buf))
+        else:
+            for st in args.states:
+                elements = collect_state(st, name_regex, concurrency=args.osm_concurrency,
+                                         checkpoint_dir=args.osm_checkpoint_dir or None,
+                                         max_age_days=cfg.get("refresh_cadence_days", 21))
+                yield from _batches(_osm_rows(elements, st), batch_size)
+
+def run_streaming(args, cfg: dict):
+    """Normalize/classify batch by batch, spooling rows to Parquet; peak memory
+    tracks the batch size plus the compact resolution keys."""
+    from ief.storage.db import ParquetAppender, EvidenceDataset
+    memo = NormalizeMemo(args.normalize_cache or None)
+    evidence_out = ParquetAppender(args.save_evidence, EVIDENCE_SCHEMA) if args.save_evidence else None
+    lake = EvidenceDataset(args.evidence_dir) if args.evidence_dir else None
+    spool_dir = tempfile.TemporaryDirectory(dir=Path(args.out).parent if Path(args.out).parent.exists() else None)
+    spool = ParquetAppender(Path(spool_dir.name) / "classified.parquet", SPOOL_SCHEMA)
+    keys, next_id = [], 0
+    try:
+        with PROFILE.stage("stream_ingest_classify") as st:
+            for batch in iter_evidence_batches(args, cfg, args.batch_size):
+                if batch.empty:
+                    continue
+                count_sources(batch, cfg["market_id"])
+                if evidence_out is not None:
+                    evidence_out.write(batch)
+                if lake is not None:
+                    lake.write(batch)
+                clf = classify_df(normalize_df(batch, memo), cfg)
+                clf["row_id"] = range(next_id, next_id + len(clf))
+                next_id += len(clf)
+                kept = clf[clf["fit_label"] != "exclude"]
+                spool.write(kept)
+                keys.append(kept.reindex(columns=STREAM_KEY_COLS))
+            save_memo(memo)
+            spool.close()
+            if evidence_out is not None:
+                evidence_out.close()
+            if lake is not None:
+                lake.close()
+            st.rows_in, st.rows_out = next_id, sum(len(k) for k in keys)
+        if not keys or next_id == 0:
+            print("No evidence rows produced. Provide DOT files or enable OSM with internet.")
+            return
+        keyframe = pd.concat(keys, ignore_index=True)
+        # per-batch categories don't survive the concat
+        keyframe["source_name"] = keyframe["source_name"].astype("category")
+        del keys
+        with PROFILE.stage("resolve", rows_in=len(keyframe)) as st:
+            if args.resolver == "fuzzy":
+                reps, members = resolve_entities(keyframe, geo_radius_m=args.geo_radius_m)
+                if args.save_clusters:
+                    write_parquet(members, args.save_clusters)
+            else:
+                reps = simple_dedupe(keyframe)
+            st.rows_out = len(reps)
+        with PROFILE.stage("write", rows_in=len(reps)):
+            # pull the full columns for the chosen representatives back from the spool
+            import pyarrow.dataset as ds
+            full = ds.dataset(spool.path).to_table(filter=ds.field("row_id").isin(reps["row_id"].tolist())).to_pandas()
+            full = full.set_index("row_id").drop(columns=[c for c in reps.columns if c in full.columns and c != "row_id"])
+            dedup = reps.set_index("row_id").join(full).reset_index(drop=True)
+            if args.resolver == "fuzzy":
+                dedup = entity_columns(dedup)
+            write_csv(dedup, args.out)
+        print(f"Wrote {len(dedup)} entities from {next_id} evidence rows to {args.out}")
+    finally:
+        spool_dir.cleanup()
+
+def run_with_store(args, cfg: dict, evidence: pd.DataFrame):
+    """Incremental path: upsert evidence, process only unseen rows in DuckDB, export views."""
+    from ief.storage.db import EntityStore
+    from ief.storage.delta import config_fingerprint
+    memo = NormalizeMemo(args.normalize_cache or None)
+    store = EntityStore(args.store, memo)
+    try:
+        store.check_config(config_fingerprint(cfg, resolver=args.resolver, geo_radius_m=args.geo_radius_m))
+        with PROFILE.stage("store_upsert", rows_in=len(evidence)) as st:
+            added = store.upsert_evidence(evidence)
+            st.rows_out = added
+        with PROFILE.stage("store_normalize_classify") as st:
+            normalized = store.normalize_pending(cfg)
+            save_memo(memo)
+            st.rows_out = normalized
+        if args.resolver == "fuzzy":
+            with PROFILE.stage("resolve") as st:
+                candidates = store.resolution_candidates()
+                st.rows_in = len(candidates)
+                if not candidates.empty:
+                    _, members = resolve_entities(candidates, geo_radius_m=args.geo_radius_m)
+                    store.upsert_clusters(members)
+            print(f"Store: {added} new evidence rows, {normalized} normalized, {len(candidates)} re-resolved")
+        else:
+            print(f"Store: {added} new evidence rows, {normalized} normalized")
+        with PROFILE.stage("write"):
+            store.export("entities", args.out)
+            if args.save_evidence:
+                store.export("evidence", args.save_evidence)
+            if args.save_clusters:
+                store.export("cluster_members", args.save_clusters)
+        print(f"Wrote {store.count('entities')} entities to {args.out}")
+    finally:
+        store.close()
+
+def delta_path(out: str|Path) -> Path:
+    """Where a delta run writes its changeset: next to the snapshot."""
+    p = Path(out)
+    return p.with_name(f"{p.stem}_changes{p.suffix}")
+
+def run_delta(args, cfg: dict, evidence: pd.DataFrame):
+    """Incremental path without a database, against the state of the last run in --delta-dir.
+
+    Only evidence rows whose fingerprint (evidence_id) is new are normalized and
+    classified; only clusters they touch (or that lost rows) are re-resolved,
+    the rest keep their previous members and entity rows. A new row that only
+    matches an old cluster by a name token outside its postal code, or by
+    distance, is not linked to it until a full run. Writes the full snapshot to --out and the
+    added/updated/removed entities next to it.
+    """
+    from ief.storage.delta import DeltaState, changeset, config_fingerprint, entity_fingerprints, touched_clusters
+    state = DeltaState(args.delta_dir)
+    config_fp = config_fingerprint(cfg, geo_radius_m=args.geo_radius_m)
+    prev = state.rows(config_fp)
+    if prev is None:
+        prev = pd.DataFrame(columns=["evidence_id", "cluster_id"])
+    prev_entities = state.entities()
+    evidence = evidence.assign(evidence_id=evidence_ids(evidence)).drop_duplicates("evidence_id")
+    live = prev["evidence_id"].isin(evidence["evidence_id"])
+    kept, removed = prev[live], prev.loc[~live, "cluster_id"]
+    new = evidence[~evidence["evidence_id"].isin(prev["evidence_id"])]
+
+    memo = NormalizeMemo(args.normalize_cache or None)
+    with PROFILE.stage("normalize", rows_in=len(new)) as st:
+        norm = normalize_df(new, memo)
+        save_memo(memo)
+        st.rows_out = len(norm)
+    with PROFILE.stage("classify", rows_in=len(norm)) as st:
+        clf = classify_df(norm, cfg)
+        fresh = clf[clf["fit_label"] != "exclude"]
+        st.rows_out = len(fresh)
+    with PROFILE.stage("resolve") as st:
+        touched = touched_clusters(kept, fresh, removed)
+        redo = kept["cluster_id"].isin(touched)
+        # in evidence_id order, so representatives don't depend on which run saw a row first
+        candidates = pd.concat([kept[redo].drop(columns="cluster_id"), fresh], ignore_index=True) \
+            .sort_values("evidence_id", kind="stable", ignore_index=True)
+        st.rows_in = len(candidates)
+        entities, members = resolve_entities(candidates, geo_radius_m=args.geo_radius_m)
+        st.rows_out = len(entities)
+    # same representative rows and columns as a full run; entity_fp is state only
+    entities = entity_columns(entities)
+    entities["entity_fp"] = entity_fingerprints(entities)
+    rows = pd.concat([kept[~redo], members, clf[clf["fit_label"] == "exclude"]], ignore_index=True)
+    untouched = set(kept.loc[~redo, "cluster_id"].dropna())
+    parts = [p for p in (prev_entities[prev_entities["cluster_id"].isin(untouched)], entities) if len(p)]
+    snapshot = pd.concat(parts or [entities], ignore_index=True).sort_values("cluster_id", kind="stable", ignore_index=True)
+    changes = changeset(prev_entities, snapshot)
+    print(f"Delta: {len(new)} new and {len(removed)} removed evidence rows, {len(candidates)} re-resolved")
+
+    with PROFILE.stage("write", rows_in=len(snapshot)):
+        write_csv(snapshot.drop(columns="entity_fp"), args.out)
+        write_csv(changes.drop(columns="entity_fp"), delta_path(args.out))
+        if args.save_evidence:
+            write_parquet(evidence.drop(columns="evidence_id"), args.save_evidence)
+        if args.save_clusters:
+            write_parquet(rows[rows["cluster_id"].notna()], args.save_clusters)
+        state.save(rows, snapshot, config_fp)
+    counts = changes["change"].value_counts()
+    print(f"Wrote {len(snapshot)} entities to {args.out}; changes in {delta_path(args.out)}: "
+          f"{counts.get('added', 0)} added, {counts.get('updated', 0)} updated, {counts.get('removed', 0)} removed")
+
+def _market_domains(args, cfg: dict) -> List[str]:
+    from ief.ingestion.commoncrawl_index import query_commoncrawl_keywords, query_cc_index
+    keywords = cfg['include_terms']
+    limit = max(1500, 2 * args.crawl_max_domains)
+    if args.cc_index_dir:
+        domains = query_cc_index(args.cc_index_dir, keywords, limit=limit)
+    else:
+        domains = query_commoncrawl_keywords(keywords, limit=limit, cache_dir=args.cc_cache_dir or None,
+                                             max_age_days=cfg.get("refresh_cadence_days", 21))
+    return domains[:args.crawl_max_domains]
+
+def discover_web(args, cfgs: List[dict]) -> Dict[str, list]:
+    """Domains via CommonCrawl per market, then one focused crawl of their union (resumable).
+
+    A domain found for several markets is fetched once; its rows go to every
+    market that found it. Returns crawled rows keyed by market_id.
+    """
+    from ief.ingestion.web_discovery import base_url, crawl_domains
+    from ief.ingestion.crawl_frontier import CrawlFrontier
+    from ief.ingestion import crawl_shards
+    sharded = args.crawl_shards > 0
+    state_dir = args.crawl_state_dir or ("out/crawl" if sharded else "")
+    markets_file = Path(state_dir) / "markets.json" if state_dir else None
+    # a resumed crawl keeps its original domain lists instead of re-querying
+    by_market: Dict[str, List[str]] = {}
+    if args.resume and markets_file is not None and markets_file.exists():
+        by_market = json.loads(markets_file.read_text())
+    elif args.resume and state_dir and len(cfgs) == 1:
+        # crawl state from before per-market domain lists were recorded
+        if sharded:
+            known = crawl_shards.known_domains(state_dir)
+        else:
+            frontier = CrawlFrontier(state_dir, max_attempts=args.crawl_max_attempts)
+            known = frontier.known_domains()
+            frontier.close()
+        by_market = {cfgs[0]["market_id"]: known} if known else {}
+    if not all(cfg["market_id"] in by_market for cfg in cfgs):
+        by_market = {cfg["market_id"]: _market_domains(args, cfg) for cfg in cfgs}
+    by_market = {cfg["market_id"]: by_market[cfg["market_id"]] for cfg in cfgs}
+    domains = list(dict.fromkeys(d for market_domains in by_market.values() for d in market_domains))
+    if not domains:
+        print('CommonCrawl query returned 0 domains (library unavailable or no matches). Skipping web discovery.')
+        return {cfg["market_id"]: [] for cfg in cfgs}
+    if markets_file is not None:
+        markets_file.parent.mkdir(parents=True, exist_ok=True)
+        markets_file.write_text(json.dumps(by_market))
+    if len(cfgs) > 1:
+        logging.info("Web discovery: %d domains for %d markets (%d found by more than one)", len(domains), len(cfgs),
+                     sum(map(len, by_market.values())) - len(domains))
+    crawl_kwargs = dict(concurrency=args.crawl_concurrency, max_connections=args.max_connections,
+                        http2=args.http2.lower().startswith("y"),
+                        rate_per_host=args.rate_per_host, global_rps=args.global_rps,
+                        cache_path=args.http_cache, cache_max_mb=args.http_cache_mb,
+                        cache_max_age_days=min(c.get("refresh_cadence_days", 21) for c in cfgs),
+                        extract_workers=args.extract_workers, max_page_bytes=args.max_page_kb * 1024)
+    if sharded:
+        rows = crawl_shards.crawl_sharded(domains, state_dir, shards=args.crawl_shards, resume=args.resume,
+                                          max_attempts=args.crawl_max_attempts, **crawl_kwargs)
+    else:
+        frontier = CrawlFrontier(state_dir, max_attempts=args.crawl_max_attempts) if state_dir else None
+        try:
+            rows = asyncio.run(crawl_domains(domains, limit=len(domains), frontier=frontier,
+                                             resume=args.resume, **crawl_kwargs))
+        finally:
+            if frontier is not None:
+                frontier.close()
+    if len(cfgs) == 1:
+        return {cfgs[0]["market_id"]: rows}
+    sites = {cfg["market_id"]: {base_url(d) for d in by_market[cfg["market_id"]]} for cfg in cfgs}
+    return {mid: [r for r in rows if r.get("website") in wanted] for mid, wanted in sites.items()}
+
+def main(argv: list|None = None):
     parser = argparse.ArgumentParser()
     parser.add_argument("--states", nargs="+", default=["TX","MI","CO"])
+    parser.add_argument("--market", nargs="+", default=[DEFAULT_MARKET], help="market YAMLs (name under config/markets or a path); several run together, sharing fetches")
     parser.add_argument("--dot-dir", type=str, default="data/dot")
+    parser.add_argument("--dot-cache-dir", type=str, default="out/cache/dot", help="Parquet snapshots of parsed DOT files ('' to disable)")
+    parser.add_argument("--dot-workers", type=int, default=None, help="processes parsing DOT files (default: CPU count)")
     parser.add_argument("--osm", type=str, default="yes", help="yes/no to use Overpass")
     parser.add_argument("--out", type=str, default="out/paving_entities.csv")
-    parser.add_argument("--save-evidence", type=str, default="")
+    parser.add_argument("--save-evidence", type=str, default="", help="raw evidence as one Parquet file")
+    parser.add_argument("--evidence-dir", type=str, default="", help="raw evidence as a Parquet dataset partitioned by run_date/state/source_name")
+    parser.add_argument("--normalize-cache", type=str, default="out/cache/normalize_memo.json", help="cross-run memo of phone/domain normalization ('' to disable)")
+    parser.add_argument("--resolver", type=str, default="fuzzy", choices=["fuzzy", "exact"], help="entity resolution: blocked fuzzy matching or exact keys")
+    parser.add_argument("--geo-radius-m", type=float, default=250, help="fuzzy resolver: also compare rows this close that share a name token (0 = off)")
+    parser.add_argument("--store", type=str, default="", help="DuckDB file keeping evidence/entities across runs; only new rows are processed")
+    parser.add_argument("--delta-dir", type=str, default="", help="state of the last delta run: only new/changed evidence is processed, and a _changes file of added/updated/removed entities is written next to --out")
+    parser.add_argument("--stream", action="store_true", help="bounded-memory mode: process evidence in batches")
+    parser.add_argument("--batch-size", type=int, default=50_000, help="rows per batch in --stream mode")
+    parser.add_argument("--save-clusters", type=str, default="", help="path to write cluster membership (Parquet)")
     parser.add_argument("--web-discovery", type=str, default="no", help="yes/no to use CommonCrawl + focused crawl")
-    args = parser.parse_args()
+    parser.add_argument("--crawl-concurrency", type=int, default=20, help="domains crawled at once")
+    parser.add_argument("--max-connections", type=int, default=100, help="connection pool size shared by the crawl")
+    parser.add_argument("--http2", type=str, default="no", help="yes/no to negotiate HTTP/2 (needs the h2 package)")
+    parser.add_argument("--rate-per-host", type=float, default=1.0, help="starting req/sec per host (adapts up/down)")
+    parser.add_argument("--global-rps", type=float, default=50.0, help="crawl-wide req/sec budget")
+    parser.add_argument("--http-cache", type=str, default="out/cache/http_cache.sqlite", help="on-disk response cache ('' to disable)")
+    parser.add_argument("--http-cache-mb", type=int, default=512, help="size bound for the response cache")
+    parser.add_argument("--osm-extract", type=str, default="", help="local .osm/.osm.bz2/.pbf extract to use instead of Overpass")
+    parser.add_argument("--osm-concurrency", type=int, default=2, help="Overpass tiles fetched at once")
+    parser.add_argument("--osm-checkpoint-dir", type=str, default="out/cache/overpass", help="resume log for Overpass tiles ('' to disable)")
+    parser.add_argument("--cc-index-dir", type=str, default="", help="local CC columnar URL index shards (Parquet) instead of the CDX API")
+    parser.add_argument("--cc-cache-dir", type=str, default="out/cc_cache", help="cache of per-collection CDX domain sets ('' to disable)")
+    parser.add_argument("--max-page-kb", type=int, default=2048, help="per-page download budget; larger HTML is truncated")
+    parser.add_argument("--crawl-state-dir", type=str, default="out/crawl", help="persistent crawl frontier + streamed results ('' to disable)")
+    parser.add_argument("--resume", action="store_true", help="continue the previous crawl: skip done domains, retry failed ones")
+    parser.add_argument("--crawl-max-attempts", type=int, default=3, help="attempts per domain before it stays failed")
+    parser.add_argument("--crawl-max-domains", type=int, default=800, help="cap on domains crawled per run")
+    parser.add_argument("--crawl-shards", type=int, default=0, help="crawl in this many processes, domains hash-partitioned between them (0 = one process)")
+    parser.add_argument("--extract-workers", type=int, default=None, help="processes parsing crawled HTML (default: CPU count, 0 = inline)")
+    parser.add_argument("--metrics-out", type=str, default="out/run_profile.json", help="JSON run profile: stage timings, counters, latency histograms ('' to disable)")
+    parser.add_argument("--prometheus-out", type=str, default="", help="also write the run profile in Prometheus text format")
+    parser.add_argument("--profile", type=str, default="", choices=["", "cprofile", "pyinstrument"], help="dump a profile of each top-level stage")
+    parser.add_argument("--profile-dir", type=str, default="out/profile", help="where --profile dumps go")
+    args = parser.parse_args(argv)
+    if args.delta_dir and (args.store or args.stream or args.resolver != "fuzzy"):
+        parser.error("--delta-dir works with the in-memory fuzzy resolver; not with --store, --stream or --resolver exact")
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s %(message)s")
+    logging.getLogger("httpx").setLevel(logging.WARNING)
 
-    cfg = load_cfg()
-    frames = []
-    # Web discovery (domains via CommonCrawl + focused crawl)
-    if args.web_discovery.lower().startswith('y'):
-        keywords = cfg['include_terms']
-        domains = query_commoncrawl_keywords(keywords, limit=1500)
-        if domains:
-            import asyncio
-            web_rows = asyncio.run(crawl_domains(domains, limit=800))
-            import pandas as pd
-            if web_rows:
-                frames.append(pd.DataFrame(web_rows))
-        else:
-            print('CommonCrawl query returned 0 domains (library unavailable or no matches). Skipping web discovery.')
+    if args.profile:
+        PROFILE.enable_profiler(args.profile, args.profile_dir)
+    try:
+        run(args, [load_cfg(m) for m in args.market])
+    finally:
+        if args.metrics_out:
+            PROFILE.write_json(args.metrics_out)
+        if args.prometheus_out:
+            PROFILE.write_prometheus(args.prometheus_out)
+
+OUTPUT_ARGS = ["out", "save_evidence", "save_clusters", "store", "evidence_dir", "delta_dir"]
+
+def market_args(args, cfg: dict, multi: bool):
+    """`args` for one market; with several markets each output path gets a _<market_id> suffix."""
+    if not multi:
+        return args
+    margs = copy.copy(args)
+    for name in OUTPUT_ARGS:
+        value = getattr(args, name)
+        if value:
+            p = Path(value)
+            setattr(margs, name, str(p.with_name(f"{p.stem}_{cfg['market_id']}{p.suffix}")))
+    return margs
+
+def _staged(name: str, fn, *a, **kw):
+    with PROFILE.stage(name) as st:
+        out = fn(*a, **kw)
+        st.rows_out = sum(map(len, out.values()))
+    return out
+
+async def ingest_all(args, cfgs: List[dict]) -> Dict[str, pd.DataFrame]:
+    """Evidence per market from every enabled source, sources running concurrently.
 
+    Each source is blocking (its own event loop, process pool or file
+    parsing), so each gets a thread; the wall time is that of the slowest
+    source. Work shared by markets is done once per source: one crawl of the
+    union of their domains, one parse per DOT file and column spec, one OSM
+    fetch with a combined name filter.
+    """
+    tasks = []
+    if args.web_discovery.lower().startswith('y'):
+        # Web discovery (domains via CommonCrawl + focused crawl)
+        tasks.append(asyncio.to_thread(
+            _staged, "web", lambda: {mid: as_evidence(pd.DataFrame(rows))
+                                     for mid, rows in discover_web(args, cfgs).items()}))
     dot_dir = Path(args.dot_dir)
     if dot_dir.exists():
-        frames.append(ingest_dot(args.states, dot_dir))
+        tasks.append(asyncio.to_thread(_staged, "dot", ingest_dot_markets, args.states, dot_dir, cfgs,
+                                       cache_dir=args.dot_cache_dir or None, workers=args.dot_workers))
+    if args.osm.lower().startswith("y") or args.osm_extract:
+        regex = union_regex([cfg["platform_categories"]["osm_name_regex"] for cfg in cfgs])
+        tasks.append(asyncio.to_thread(
+            _staged, "osm", lambda: split_by_name(
+                ingest_osm(args.states, regex, extract=args.osm_extract or None,
+                           concurrency=args.osm_concurrency, checkpoint_dir=args.osm_checkpoint_dir or None,
+                           max_age_days=min(c.get("refresh_cadence_days", 21) for c in cfgs)), cfgs)))
+    with PROFILE.stage("ingest") as st:
+        results = await asyncio.gather(*tasks)  # web, dot, osm order
+        out = {}
+        for cfg in cfgs:
+            out[cfg["market_id"]] = concat_evidence(r[cfg["market_id"]] for r in results)
+        st.rows_out = sum(map(len, out.values()))
+    return out
 
-    if args.osm.lower().startswith("y"):
-        frames.append(ingest_osm(args.states, cfg["platform_categories"]["osm_name_regex"]))
+def run(args, cfgs: List[dict]):
+    multi = len(cfgs) > 1
+    if args.stream:
+        for cfg in cfgs:
+            with PROFILE.labels(market=cfg["market_id"]):
+                run_streaming(market_args(args, cfg, multi), cfg)
+        return
+    # Python 3.11's asyncio.run reprs the finished main task when it restores
+    # the SIGINT handler, rendering its result; keep the frames out of it
+    evidence: Dict[str, pd.DataFrame] = {}
+    async def ingest():
+        evidence.update(await ingest_all(args, cfgs))
+    asyncio.run(ingest())
+    # per-market stages repeat once per market; the label tells them apart
+    for cfg in cfgs:
+        with PROFILE.labels(market=cfg["market_id"]):
+            process_market(market_args(args, cfg, multi), cfg, evidence[cfg["market_id"]])
 
-    evidence = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+def process_market(args, cfg: dict, evidence: pd.DataFrame):
+    """Everything after ingestion, for one market's evidence."""
+    market = cfg["market_id"]
     if evidence.empty:
-        print("No evidence rows produced. Provide DOT files or enable OSM with internet.")
+        print(f"No evidence rows produced for {market}. Provide DOT files or enable OSM with internet.")
+        return
+    count_sources(evidence, market)
+    logging.info("Evidence (%s): %d rows, %.1f MB in memory", market, len(evidence),
+                 evidence.memory_usage(deep=True).sum() / 2**20)
+    if args.evidence_dir:
+        from ief.storage.db import EvidenceDataset
+        with PROFILE.stage("write_evidence", rows_in=len(evidence)) as st:
+            lake = EvidenceDataset(args.evidence_dir)
+            lake.write(evidence)
+            lake.close()
+            st.rows_out = lake.rows
+
+    if args.store:
+        run_with_store(args, cfg, evidence)
+        return
+    if args.delta_dir:
+        run_delta(args, cfg, evidence)
         return
 
-    norm = normalize_df(evidence)
-    clf = classify_df(norm, cfg)
-    pruned = clf[clf["fit_label"] != "exclude"].copy()
-    dedup = simple_dedupe(pruned)
+    # keyed and de-duplicated like the store, so every path resolves the same rows
+    evidence = evidence.assign(evidence_id=evidence_ids(evidence)).drop_duplicates("evidence_id")
+    memo = NormalizeMemo(args.normalize_cache or None)
+    with PROFILE.stage("normalize", rows_in=len(evidence)) as st:
+        norm = normalize_df(evidence, memo)
+        save_memo(memo)
+        st.rows_out = len(norm)
+    with PROFILE.stage("classify", rows_in=len(norm)) as st:
+        clf = classify_df(norm, cfg)
+        pruned = clf[clf["fit_label"] != "exclude"].copy()
+        st.rows_out = len(pruned)
+    with PROFILE.stage("resolve", rows_in=len(pruned)) as st:
+        if args.resolver == "fuzzy":
+            dedup, members = resolve_entities(pruned, geo_radius_m=args.geo_radius_m)
+            dedup = entity_columns(dedup)
+            if args.save_clusters:
+                write_parquet(members, args.save_clusters)
+        else:
+            dedup = simple_dedupe(pruned).drop(columns="evidence_id")
+        st.rows_out = len(dedup)
 
-    write_csv(dedup, args.out)
-    if args.save_evidence:
-        write_parquet(evidence, args.save_evidence)
+    with PROFILE.stage("write", rows_in=len(dedup)):
+        write_csv(dedup, args.out)
+        if args.save_evidence:
+            write_parquet(evidence.drop(columns="evidence_id"), args.save_evidence)
     print(f"Wrote {len(dedup)} entities to {args.out}")
 
 if __name__ == "__main__":
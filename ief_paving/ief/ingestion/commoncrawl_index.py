@@ -1,36 +1,108 @@
 from __future__ import annotations
-from typing import Iterable, List, Dict
-import re
-import tldextract
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Iterable, List, Dict, Set
+from urllib.parse import urlsplit
+import hashlib, json, logging, re, time
+from ..normalize.cleaning import tld_extractor
+
+DEFAULT_COLLECTIONS = ["CC-MAIN-2025-10","CC-MAIN-2025-06","CC-MAIN-2024-50"]
 
 def _clean_domain(url: str) -> str:
     try:
-        ext = tldextract.extract(url if '://' in url else f'https://{url}')
+        ext = tld_extractor()(url if '://' in url else f'https://{url}')
         return ext.registered_domain.lower()
     except Exception:
         return ""
 
-def query_commoncrawl_keywords(keywords: List[str], collections: List[str]|None=None, limit: int=2000) -> List[str]:
+def _domains_from_urls(urls: Iterable[str]) -> Set[str]:
+    """Registered domains for urls; tldextract runs once per distinct host, not per hit."""
+    hosts = set()
+    for url in urls:
+        if not url: continue
+        try:
+            hosts.add(urlsplit(url if '://' in url else f'https://{url}').hostname or "")
+        except ValueError:
+            continue
+    hosts.discard("")
+    return {d for d in map(_clean_domain, hosts) if d}
+
+def _cache_file(cache_dir: str|Path, coll: str, keywords: List[str], limit: int) -> Path:
+    key = json.dumps([coll, sorted(keywords), limit])
+    return Path(cache_dir) / f"cc_{hashlib.sha256(key.encode()).hexdigest()[:24]}.json"
+
+def _query_collection(coll: str, q: str, limit: int) -> Set[str]:
+    import cdx_toolkit  # type: ignore
+    cc = cdx_toolkit.CDXFetcher(source='cc', index=coll)
+    return _domains_from_urls(hit.get('url') for hit in cc.iter(q=q, limit=limit, filter=['status:200']))
+
+def query_commoncrawl_keywords(keywords: List[str], collections: List[str]|None=None, limit: int=2000,
+                               cache_dir: str|Path|None=None, max_age_days: float=21) -> List[str]:
     """Return a list of candidate domains whose URLs/text likely match keywords.
     Requires `cdx_toolkit` if you want real results. If unavailable at runtime,
     this function returns an empty list (safe fallback).
+
+    Collections are queried concurrently; with `cache_dir`, each collection's
+    domain set is reused for `max_age_days` (collections are immutable, so the
+    age only bounds cache growth).
     """
     try:
-        import cdx_toolkit  # type: ignore
+        import cdx_toolkit  # type: ignore  # noqa: F401
     except Exception:
         return []
-    collections = collections or ["CC-MAIN-2025-10","CC-MAIN-2025-06","CC-MAIN-2024-50"]
+    collections = collections or DEFAULT_COLLECTIONS
     q = " ".join(keywords)
-    domains = set()
+    per_coll = limit//len(collections)
+    domains: Set[str] = set()
+    todo = []
     for coll in collections:
-        try:
-            cc = cdx_toolkit.CDXFetcher(source='cc', index=coll)
-            for hit in cc.iter(q=q, limit=limit//len(collections), filter=['status:200']):
-                url = hit.get('url')
-                if not url: continue
-                dom = _clean_domain(url)
-                if dom:
-                    domains.add(dom)
-        except Exception:
-            continue
-    return sorted(domains)
\ No newline at end of file
+        cf = _cache_file(cache_dir, coll, keywords, per_coll) if cache_dir else None
+        if cf is not None and cf.exists() and time.time() - cf.stat().st_mtime < max_age_days * 86400:
+            domains.update(json.loads(cf.read_text()))
+        else:
+            todo.append((coll, cf))
+    with ThreadPoolExecutor(max_workers=max(len(todo), 1)) as pool:
+        futs = [(coll, cf, pool.submit(_query_collection, coll, q, per_coll)) for coll, cf in todo]
+        for coll, cf, fut in futs:
+            try:
+                found = fut.result()
+            except Exception as e:
+                logging.warning("CommonCrawl query of %s failed: %s", coll, e)
+                continue
+            domains |= found
+            if cf is not None:
+                cf.parent.mkdir(parents=True, exist_ok=True)
+                cf.write_text(json.dumps(sorted(found)))
+    logging.info("CommonCrawl: %d domains (%d of %d collections from cache)",
+                 len(domains), len(collections) - len(todo), len(collections))
+    return sorted(domains)
+
+def _keyword_regex(keywords: List[str]) -> str:
+    # "chip seal" should also match chip-seal / chip_seal / chipseal in paths and host names
+    return "|".join(re.escape(k.lower()).replace(r"\ ", "[-_ ]?") for k in keywords)
+
+def query_cc_index(index_dir: str|Path, keywords: List[str], limit: int=2000) -> List[str]:
+    """Candidate domains from locally downloaded CC columnar URL index shards (Parquet).
+
+    Reads only url_host_registered_domain / url_host_name / url_path /
+    fetch_status; the status filter is pushed down to the Parquet row groups.
+    """
+    import duckdb
+    files = [str(p) for p in Path(index_dir).rglob("*.parquet")]
+    if not files:
+        logging.warning("No Parquet shards under %s", index_dir)
+        return []
+    con = duckdb.connect()
+    try:
+        rows = con.execute("""
+            SELECT DISTINCT lower(url_host_registered_domain) AS domain
+            FROM read_parquet(?, hive_partitioning = true, union_by_name = true)
+            WHERE fetch_status = 200
+              AND url_host_registered_domain IS NOT NULL
+              AND (regexp_matches(lower(url_path), ?) OR regexp_matches(lower(url_host_name), ?))
+            LIMIT ?""", [files, _keyword_regex(keywords), _keyword_regex(keywords), limit]).fetchall()
+    finally:
+        con.close()
+    domains = sorted(r[0] for r in rows if r[0])
+    logging.info("CC index %s: %d domains from %d shards", index_dir, len(domains), len(files))
+    return domains
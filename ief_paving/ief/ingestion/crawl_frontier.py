@@ -0,0 +1,88 @@
+from __future__ import annotations
+import json, sqlite3, time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+PENDING, IN_PROGRESS, DONE, FAILED = "pending", "in_progress", "done", "failed"
+
+class CrawlFrontier:
+    """Persistent per-domain crawl state plus a JSON-lines stream of extracted rows.
+
+    Lives in `state_dir` (frontier.sqlite + results.jsonl). A fresh run resets
+    both; a resumed run skips domains already done and retries failed or
+    interrupted ones until they have used `max_attempts`.
+    """
+    def __init__(self, state_dir: str|Path, max_attempts: int = 3):
+        self.dir = Path(state_dir)
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self.max_attempts = max_attempts
+        self.results_path = self.dir / "results.jsonl"
+        self.con = sqlite3.connect(str(self.dir / "frontier.sqlite"), isolation_level=None)
+        self.con.execute("PRAGMA journal_mode=WAL")
+        self.con.execute("""CREATE TABLE IF NOT EXISTS domains (
+            domain TEXT PRIMARY KEY, seq INTEGER, status TEXT, attempts INTEGER DEFAULT 0,
+            error TEXT DEFAULT '', updated_at REAL)""")
+        self._results = None
+
+    def known_domains(self) -> List[str]:
+        return [r[0] for r in self.con.execute("SELECT domain FROM domains ORDER BY seq")]
+
+    def seed(self, domains: List[str], resume: bool = False) -> List[str]:
+        """Register domains and return the ones this run should crawl, in order."""
+        if not resume:
+            self.con.execute("DELETE FROM domains")
+            self.results_path.unlink(missing_ok=True)
+        now = time.time()
+        self.con.execute("BEGIN")
+        self.con.executemany("INSERT OR IGNORE INTO domains (domain, seq, status, updated_at) VALUES (?, ?, ?, ?)",
+                             [(d, i, PENDING, now) for i, d in enumerate(domains)])
+        # a domain still in progress was interrupted mid-crawl (possibly by itself,
+        # e.g. a page that kills the process); it has used up its attempts too
+        self.con.execute("UPDATE domains SET status = ?, error = ?, updated_at = ? WHERE status = ? AND attempts >= ?",
+                         (FAILED, "interrupted", now, IN_PROGRESS, self.max_attempts))
+        self.con.execute("COMMIT")
+        todo = {r[0] for r in self.con.execute(
+            "SELECT domain FROM domains WHERE status = ? OR (status IN (?, ?) AND attempts < ?)",
+            (PENDING, IN_PROGRESS, FAILED, self.max_attempts))}
+        return [d for d in domains if d in todo]
+
+    def _set(self, domain: str, status: str, error: str = "", attempt: bool = False):
+        self.con.execute(
+            f"UPDATE domains SET status = ?, error = ?, updated_at = ?{', attempts = attempts + 1' if attempt else ''} WHERE domain = ?",
+            (status, error, time.time(), domain))
+
+    def start(self, domain: str):
+        self._set(domain, IN_PROGRESS, attempt=True)
+
+    def done(self, domain: str, row: Optional[Dict] = None):
+        if row:
+            # results first, then state: a crash in between only re-crawls the domain
+            self._results = self._results or open(self.results_path, "a")
+            self._results.write(json.dumps(row) + "\n")
+            self._results.flush()
+        self._set(domain, DONE)
+
+    def failed(self, domain: str, reason: str):
+        self._set(domain, FAILED, error=reason[:500])
+
+    def results(self) -> List[Dict]:
+        """Every row extracted so far, de-duplicated by domain (last write wins)."""
+        if self._results:
+            self._results.flush()
+        if not self.results_path.exists():
+            return []
+        rows: Dict[str, Dict] = {}
+        with open(self.results_path) as f:
+            for line in f:
+                if line.strip():
+                    row = json.loads(line)
+                    rows[row.get("website", "")] = row
+        return list(rows.values())
+
+    def summary(self) -> Dict[str, int]:
+        return dict(self.con.execute("SELECT status, count(*) FROM domains GROUP BY status").fetchall())
+
+    def close(self):
+        if self._results:
+            self._results.close()
+        self.con.close()
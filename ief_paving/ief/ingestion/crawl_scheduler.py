@@ -0,0 +1,142 @@
+from __future__ import annotations
+import asyncio, time, logging
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from email.utils import parsedate_to_datetime
+from typing import Dict, List, Optional
+from urllib import robotparser
+
+from aiolimiter import AsyncLimiter
+
+from ..metrics import PROFILE
+
+THROTTLE_STATUSES = (429, 503)
+
+@dataclass
+class HostState:
+    interval: float
+    min_interval: float
+    next_at: float = 0.0
+    ok_streak: int = 0
+    requests: int = 0
+    throttles: int = 0
+    errors: int = 0
+    wait_s: float = 0.0
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Retry-After is either delta-seconds or an HTTP-date."""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except Exception:
+        return None
+
+class CrawlScheduler:
+    """Per-host pacing plus a global request rate and open-connection budget.
+
+    Hosts start at `rate_per_host` req/s (never faster than robots.txt
+    Crawl-delay / Request-rate allow), speed up towards `max_rate_per_host`
+    after a streak of fast successful responses, and back off on 429/503
+    (honoring Retry-After) or on errors.
+    """
+    def __init__(self, rate_per_host: float = 1.0, max_rate_per_host: float = 4.0, global_rps: float = 50.0,
+                 max_open: int = 100, fast_latency_s: float = 0.5, speedup_after: int = 3,
+                 max_interval_s: float = 60.0, max_retry_after_s: float = 120.0):
+        self.base_interval = 1.0 / rate_per_host if rate_per_host > 0 else 0.0
+        self.floor_interval = 1.0 / max_rate_per_host if max_rate_per_host > 0 else 0.0
+        self.fast_latency_s = fast_latency_s
+        self.speedup_after = speedup_after
+        self.max_interval_s = max_interval_s
+        self.max_retry_after_s = max_retry_after_s
+        self.global_limiter = AsyncLimiter(global_rps, 1) if global_rps > 0 else None
+        self.open_slots = asyncio.Semaphore(max_open)
+        self.hosts: Dict[str, HostState] = {}
+
+    def _host(self, host: str) -> HostState:
+        if host not in self.hosts:
+            self.hosts[host] = HostState(interval=max(self.base_interval, self.floor_interval),
+                                         min_interval=self.floor_interval)
+        return self.hosts[host]
+
+    def configure_host(self, host: str, rp: robotparser.RobotFileParser, user_agent: str):
+        """Apply Crawl-delay / Request-rate from a parsed robots.txt."""
+        st = self._host(host)
+        floor = self.floor_interval
+        try:
+            delay = rp.crawl_delay(user_agent)
+            if delay:
+                floor = max(floor, float(delay))
+            rate = rp.request_rate(user_agent)
+            if rate and rate.requests:
+                floor = max(floor, rate.seconds / rate.requests)
+        except Exception:
+            pass
+        st.min_interval = min(floor, self.max_interval_s)
+        st.interval = max(st.interval, st.min_interval)
+
+    @asynccontextmanager
+    async def slot(self, host: str):
+        loop = asyncio.get_running_loop()
+        st = self._host(host)
+        t0 = loop.time()
+        while True:
+            now = loop.time()
+            if st.next_at <= now:
+                st.next_at = now + st.interval
+                break
+            # re-check after waking: a throttle may have pushed next_at further out
+            await asyncio.sleep(st.next_at - now)
+        if self.global_limiter is not None:
+            await self.global_limiter.acquire()
+        async with self.open_slots:
+            waited = loop.time() - t0
+            st.wait_s += waited
+            PROFILE.observe("ratelimit_wait_seconds", waited, source="web")
+            st.requests += 1
+            yield
+
+    def record(self, host: str, status: int, latency_s: float, retry_after: Optional[str] = None):
+        """Feed a response (status 0 = transport error) back into the host's pacing."""
+        st = self._host(host)
+        if status in THROTTLE_STATUSES:
+            st.throttles += 1
+            st.ok_streak = 0
+            st.interval = min(max(st.interval * 2, st.min_interval), self.max_interval_s)
+            delay = parse_retry_after(retry_after)
+            delay = min(delay if delay is not None else st.interval, self.max_retry_after_s)
+            st.next_at = max(st.next_at, asyncio.get_running_loop().time() + delay)
+            logging.info("Throttled by %s (HTTP %s); pausing %.1fs", host, status, delay)
+        elif status == 0 or status >= 500:
+            st.errors += 1
+            st.ok_streak = 0
+            st.interval = min(max(st.interval * 1.5, st.min_interval), self.max_interval_s)
+        elif latency_s <= self.fast_latency_s:
+            st.ok_streak += 1
+            if st.ok_streak >= self.speedup_after:
+                st.ok_streak = 0
+                st.interval = max(st.interval * 0.75, st.min_interval)
+        else:
+            st.ok_streak = 0
+
+    def report(self) -> List[Dict]:
+        return [
+            {"host": h, "requests": st.requests, "wait_s": round(st.wait_s, 3), "throttles": st.throttles,
+             "errors": st.errors, "final_rate": round(1.0 / st.interval, 3) if st.interval else None}
+            for h, st in self.hosts.items()
+        ]
+
+    def log_report(self, top: int = 10):
+        rows = self.report()
+        if not rows:
+            return
+        total_wait = sum(r["wait_s"] for r in rows)
+        throttles = sum(r["throttles"] for r in rows)
+        logging.info("Crawl scheduler: %d hosts, %d requests, %.1fs total host wait, %d throttle events",
+                     len(rows), sum(r["requests"] for r in rows), total_wait, throttles)
+        for r in sorted(rows, key=lambda r: (r["throttles"], r["wait_s"]), reverse=True)[:top]:
+            logging.info("  %s: %d req, waited %.1fs, %d throttled, %d errors, rate %.2f/s",
+                         r["host"], r["requests"], r["wait_s"], r["throttles"], r["errors"], r["final_rate"] or 0)
@@ -0,0 +1,177 @@
+from __future__ import annotations
+import hashlib, json, logging, time
+import multiprocessing as mp
+from multiprocessing.connection import wait
+from pathlib import Path
+from typing import Dict, List, Sequence
+
+# Sharded web crawl: domains are hash-partitioned across worker processes,
+# each running crawl_domains with its own event loop, connection pool, host
+# limiters, response cache and frontier under <state_dir>/shard-KKofNN/.
+# A shard streams its rows into its own Parquet file; the parent restarts a
+# shard that dies (resuming from its frontier) and merges the files at the end.
+
+FLUSH_ROWS = 200
+
+def shard_of(domain: str, shards: int) -> int:
+    """Stable shard for a domain (same across runs and processes)."""
+    return int.from_bytes(hashlib.blake2b(domain.lower().encode(), digest_size=8).digest(), "big") % shards
+
+def partition(domains: List[str], shards: int) -> List[List[str]]:
+    parts: List[List[str]] = [[] for _ in range(shards)]
+    for d in dict.fromkeys(domains):
+        parts[shard_of(d, shards)].append(d)
+    return parts
+
+def shard_dir(state_dir: str|Path, shard: int, shards: int) -> Path:
+    return Path(state_dir) / f"shard-{shard:02d}of{shards:02d}"
+
+def _shard_cache(cache_path: str, shard: int, shards: int) -> str:
+    # one SQLite file per shard: no cross-process write locks, and a domain
+    # always lands on the same shard (and cache) for a given shard count
+    if not cache_path:
+        return ""
+    p = Path(cache_path)
+    return str(p.with_name(f"{p.stem}.shard{shard:02d}of{shards:02d}{p.suffix}"))
+
+def known_domains(state_dir: str|Path) -> List[str]:
+    """Domain list of the last sharded crawl in `state_dir` (for --resume)."""
+    p = Path(state_dir) / "shards.json"
+    return json.loads(p.read_text())["domains"] if p.exists() else []
+
+def _run_shard(shard: int, shards: int, domains: List[str], state_dir: str, resume: bool, max_attempts: int,
+               crawl_kwargs: dict):
+    """Worker process entry point."""
+    import asyncio
+    import pandas as pd
+    from ..metrics import PROFILE
+    from ..schema import EVIDENCE_SCHEMA
+    from ..storage.db import ParquetAppender
+    from .crawl_frontier import CrawlFrontier
+    from .web_discovery import crawl_domains
+    logging.basicConfig(level=logging.INFO, format=f"%(asctime)s %(levelname)s [shard {shard}] %(message)s")
+    out_dir = shard_dir(state_dir, shard, shards)
+    frontier = CrawlFrontier(out_dir, max_attempts=max_attempts)
+    part = ParquetAppender(out_dir / "rows.parquet.part", EVIDENCE_SCHEMA)
+    buf: List[Dict] = []
+
+    def _flush():
+        if buf:
+            part.write(pd.DataFrame(buf))
+            buf.clear()
+
+    def _on_result(row: Dict):
+        buf.append(row)
+        if len(buf) >= FLUSH_ROWS:
+            _flush()
+
+    if resume:
+        # rows from before the restart are in the frontier's results log
+        buf.extend(frontier.results())
+    try:
+        asyncio.run(crawl_domains(domains, limit=len(domains), frontier=frontier, resume=resume,
+                                  on_result=_on_result, **crawl_kwargs))
+        _flush()
+        part.close()
+        part.path.replace(out_dir / "rows.parquet")
+        PROFILE.write_json(out_dir / "profile.json")
+    finally:
+        frontier.close()
+
+def crawl_sharded(domains: List[str], state_dir: str|Path, shards: int = 4, resume: bool = False,
+                  max_attempts: int = 3, max_restarts: int = 2, **crawl_kwargs) -> List[Dict]:
+    """crawl_domains over `shards` processes; returns the merged rows.
+
+    Hosts never span shards, so per-host politeness is unchanged; the
+    crawl-wide budgets (`global_rps`, `max_connections`, `cache_max_mb`)
+    are split evenly between shards. HTML is parsed inline in each shard
+    unless `extract_workers` says otherwise.
+    """
+    from ..metrics import PROFILE
+    root = Path(state_dir)
+    root.mkdir(parents=True, exist_ok=True)
+    manifest = root / "shards.json"
+    if resume and manifest.exists():
+        # frontiers live per shard, so a resumed crawl keeps its original split
+        recorded = json.loads(manifest.read_text())["shards"]
+        if recorded != shards:
+            logging.warning("Resuming a %d-shard crawl; ignoring shards=%d", recorded, shards)
+            shards = recorded
+    else:
+        manifest.write_text(json.dumps({"shards": shards, "domains": list(dict.fromkeys(domains))}))
+    parts = partition(domains, shards)
+    kwargs = dict(crawl_kwargs)
+    kwargs["global_rps"] = kwargs.get("global_rps", 50.0) / shards
+    kwargs["max_connections"] = max(kwargs.get("max_connections", 100) // shards, 10)
+    kwargs["cache_max_mb"] = max(kwargs.get("cache_max_mb", 512) // shards, 16)
+    kwargs.setdefault("extract_workers", 0)
+    if kwargs["extract_workers"] is None:
+        kwargs["extract_workers"] = 0
+    cache_path = kwargs.pop("cache_path", "")
+    ctx = mp.get_context("spawn")  # clean event loop and pools; safe from threaded parents
+    procs: Dict[int, mp.process.BaseProcess] = {}
+    restarts = [0] * shards
+    failed: List[int] = []
+
+    def _start(k: int, resume_k: bool):
+        if not resume_k:
+            for name in ("rows.parquet", "profile.json"):
+                (shard_dir(root, k, shards) / name).unlink(missing_ok=True)
+        p = ctx.Process(target=_run_shard, name=f"crawl-shard-{k}",
+                        args=(k, shards, parts[k], str(root), resume_k, max_attempts,
+                              dict(kwargs, cache_path=_shard_cache(cache_path, k, shards))))
+        p.start()
+        procs[k] = p
+
+    t0 = time.perf_counter()
+    scheduled = [k for k in range(shards) if parts[k]]
+    for k in scheduled:
+        _start(k, resume)
+    logging.info("Sharded crawl: %d domains over %d shards (%s)", sum(map(len, parts)), len(procs),
+                 ", ".join(str(len(p)) for p in parts))
+    while procs:
+        wait([p.sentinel for p in procs.values()])
+        for k, p in list(procs.items()):
+            if p.is_alive():
+                continue
+            p.join()
+            del procs[k]
+            if p.exitcode == 0:
+                continue
+            if restarts[k] < max_restarts:
+                restarts[k] += 1
+                logging.warning("Crawl shard %d exited with %s; restarting (%d/%d)", k, p.exitcode, restarts[k], max_restarts)
+                PROFILE.count("crawl_shard_restarts_total", shard=k)
+                _start(k, True)
+            else:
+                logging.error("Crawl shard %d failed %d times; its rows so far are kept", k, restarts[k] + 1)
+                failed.append(k)
+    return merge_shards(root, shards, failed, time.perf_counter() - t0, only=scheduled)
+
+def merge_shards(state_dir: str|Path, shards: int, failed: Sequence[int] = (), wall_s: float = 0.0,
+                 only: Sequence[int]|None = None) -> List[Dict]:
+    """Concatenate shard Parquet files (or the results log of a shard that never
+    finished) into <state_dir>/web_rows.parquet; rows are deduplicated by website.
+
+    `only` limits the merge to the shards that ran; the others may hold files
+    from an earlier crawl of a different domain list.
+    """
+    import pandas as pd
+    from ..metrics import PROFILE
+    from ..schema import as_evidence, concat_evidence
+    frames = []
+    for k in (range(shards) if only is None else only):
+        d = shard_dir(state_dir, k, shards)
+        if (d / "rows.parquet").exists() and k not in failed:
+            frames.append(pd.read_parquet(d / "rows.parquet"))
+        elif (d / "results.jsonl").exists():
+            with open(d / "results.jsonl") as f:
+                frames.append(as_evidence(pd.DataFrame([json.loads(line) for line in f if line.strip()])))
+        if (d / "profile.json").exists():
+            PROFILE.merge(json.loads((d / "profile.json").read_text()))
+    merged = concat_evidence(frames)
+    merged = merged.drop_duplicates("website", keep="last").reset_index(drop=True)
+    merged.to_parquet(Path(state_dir) / "web_rows.parquet", index=False)
+    logging.info("Sharded crawl: %d rows from %d shards in %.1fs", len(merged),
+                 shards if only is None else len(only), wall_s)
+    return merged.astype(object).where(merged.notna(), None).to_dict("records")
@@ -1,32 +1,7 @@
 from __future__ import annotations
 from pathlib import Path
 import pandas as pd
-from .dot_common import _normalize_cols, load_any
+from .dot_common import DEFAULT_DOT_SOURCES, parse_dot_file
 
-def parse_cdot(path: Path) -> pd.DataFrame:
-    df = load_any(path)
-    df = _normalize_cols(df)
-    mapping = {}
-    for c in df.columns:
-        cl = c.lower()
-        if any(k in cl for k in ["contractor","vendor","firm","name","company"]):
-            mapping["name"] = c
-        elif "address" in cl or "street" in cl:
-            mapping["address"] = c
-        elif "city" in cl:
-            mapping["city"] = c
-        elif cl == "state":
-            mapping["state"] = c
-        elif "zip" in cl or "postal" in cl:
-            mapping["postal_code"] = c
-        elif "phone" in cl:
-            mapping["phone"] = c
-        elif "web" in cl or "url" in cl:
-            mapping["website"] = c
-        elif any(k in cl for k in ["classification","work","category","code"]):
-            mapping["work_types"] = c
-    out = pd.DataFrame()
-    for k, v in mapping.items():
-        out[k] = df[v]
-    out["source_name"] = "cdot"
-    return out
\ No newline at end of file
+def parse_cdot(path: Path, spec: dict|None = None) -> pd.DataFrame:
+    return parse_dot_file(path, spec or DEFAULT_DOT_SOURCES["CO"])
\ No newline at end of file
@@ -1,12 +1,35 @@
 from __future__ import annotations
+import hashlib, json, logging, multiprocessing, os
+from concurrent.futures import ProcessPoolExecutor
 import pandas as pd
 from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+# Column-sniffing rules per state. Each column header (lower-cased) is checked
+# against the rules in order and assigned to the first field it matches; if
+# several columns match a field the last one wins. The defaults are the
+# `dot_sources` of the default market YAML; other markets override them there.
+DEFAULT_MARKET_YAML = Path(__file__).parents[1] / "config" / "markets" / "paving_us_v1.yaml"
+# a file without a column for these is skipped rather than yielding nameless rows
+REQUIRED_FIELDS = ["name"]
+
+def _default_sources() -> Dict[str, dict]:
+    import yaml
+    with open(DEFAULT_MARKET_YAML) as f:
+        # libyaml when available: the pure-Python loader is a visible slice of startup
+        return yaml.load(f, Loader=getattr(yaml, "CSafeLoader", yaml.SafeLoader))["dot_sources"]
+
+DEFAULT_DOT_SOURCES: Dict[str, dict] = _default_sources()
+CSV_CHUNKSIZE = 200_000
 
 def _normalize_cols(df: pd.DataFrame) -> pd.DataFrame:
     df = df.copy()
-    df.columns = [c.strip().lower().replace('\n', ' ') for c in df.columns]
+    df.columns = [_normalize_col(c) for c in df.columns]
     return df
 
+def _normalize_col(c) -> str:
+    return str(c).strip().lower().replace('\n', ' ')
+
 def load_any(path: Path) -> pd.DataFrame:
     path = Path(path)
     if path.suffix.lower() in [".csv", ".txt"]:
@@ -17,4 +40,139 @@ def load_any(path: Path) -> pd.DataFrame:
         return pd.read_parquet(path)
     # naive HTML table read
     tables = pd.read_html(path.read_text())
-    return tables[0]
\ No newline at end of file
+    return tables[0]
+
+def resolve_columns(columns: List[str], rules: List[dict]) -> Dict[str, str]:
+    """Map output field -> source column using a state's column rules."""
+    mapping: Dict[str, str] = {}
+    for c in columns:
+        cl = _normalize_col(c)
+        for rule in rules:
+            if cl in rule.get("equals", []) or any(k in cl for k in rule.get("contains", [])):
+                mapping[rule["field"]] = c
+                break
+    return mapping
+
+def _check_required(mapping: Dict[str, str], columns: List[str]):
+    missing = [f for f in REQUIRED_FIELDS if f not in mapping]
+    if missing:
+        raise ValueError(f"no column for {', '.join(missing)} among {list(columns)}")
+
+def _read_columns(path: Path) -> List[str]:
+    suffix = path.suffix.lower()
+    if suffix in [".csv", ".txt"]:
+        return list(pd.read_csv(path, nrows=0).columns)
+    if suffix in [".xlsx", ".xls"]:
+        return list(pd.read_excel(path, nrows=0).columns)
+    if suffix in [".parquet"]:
+        import pyarrow.parquet as pq
+        return list(pq.read_schema(path).names)
+    return []
+
+def _as_str(df: pd.DataFrame) -> pd.DataFrame:
+    return df.astype(object).where(df.isna(), df.astype(str))
+
+def _load_mapped(path: Path, rules: List[dict], chunksize: int) -> Tuple[pd.DataFrame, Dict[str, str]]:
+    """Read only the columns the rules need (chunked for CSV), as strings."""
+    suffix = path.suffix.lower()
+    columns = _read_columns(path)
+    if not columns:
+        df = load_any(path)
+        mapping = resolve_columns(list(df.columns), rules)
+        _check_required(mapping, list(df.columns))
+        return _as_str(df[list(dict.fromkeys(mapping.values()))]), mapping
+    mapping = resolve_columns(columns, rules)
+    _check_required(mapping, columns)
+    usecols = list(dict.fromkeys(mapping.values()))
+    if suffix in [".csv", ".txt"]:
+        chunks = pd.read_csv(path, usecols=usecols, dtype=str, chunksize=chunksize)
+        df = pd.concat(chunks, ignore_index=True) if usecols else pd.DataFrame()
+    elif suffix in [".xlsx", ".xls"]:
+        df = pd.read_excel(path, usecols=usecols, dtype=str)
+    else:
+        df = _as_str(pd.read_parquet(path, columns=usecols))
+    return df, mapping
+
+def parse_dot_file(path: Path, spec: dict, chunksize: int = CSV_CHUNKSIZE) -> pd.DataFrame:
+    df, mapping = _load_mapped(Path(path), spec["columns"], chunksize)
+    out = pd.DataFrame(index=df.index)
+    for k, v in mapping.items():
+        out[k] = df[v]
+    out["source_name"] = spec["source_name"]
+    return out
+
+def iter_dot_file(path: Path, spec: dict, chunksize: int = CSV_CHUNKSIZE) -> Iterator[pd.DataFrame]:
+    """Like parse_dot_file, but yields CSV/Parquet files in chunks of at most `chunksize` rows."""
+    path = Path(path)
+    suffix = path.suffix.lower()
+    if suffix not in [".csv", ".txt", ".parquet"]:
+        yield parse_dot_file(path, spec, chunksize)
+        return
+    columns = _read_columns(path)
+    mapping = resolve_columns(columns, spec["columns"])
+    _check_required(mapping, columns)
+    usecols = list(dict.fromkeys(mapping.values()))
+    if suffix == ".parquet":
+        import pyarrow.parquet as pq
+        chunks = (_as_str(b.to_pandas()) for b in pq.ParquetFile(path).iter_batches(batch_size=chunksize, columns=usecols))
+    else:
+        chunks = pd.read_csv(path, usecols=usecols, dtype=str, chunksize=chunksize)
+    for df in chunks:
+        out = pd.DataFrame({k: df[v] for k, v in mapping.items()}, index=df.index)
+        out["source_name"] = spec["source_name"]
+        yield out
+
+def _content_key(path: Path, spec: dict) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    h.update(json.dumps(spec, sort_keys=True).encode())
+    return h.hexdigest()[:32]
+
+def _parse_and_cache(path: Path, spec: dict, cache_file: Optional[Path]) -> pd.DataFrame:
+    df = parse_dot_file(path, spec)
+    if cache_file is not None:
+        cache_file.parent.mkdir(parents=True, exist_ok=True)
+        tmp = cache_file.with_suffix(".tmp")
+        df.to_parquet(tmp, index=False)
+        tmp.replace(cache_file)
+    return df
+
+def parse_dot_files(jobs: List[Tuple[Path, dict]], cache_dir: str|Path|None = None,
+                    workers: Optional[int] = None) -> List[pd.DataFrame]:
+    """Parse DOT files, reusing Parquet snapshots keyed by file content + spec.
+
+    Files that changed (or were never seen) are parsed in a process pool.
+    """
+    return [f for f in parse_dot_jobs(jobs, cache_dir, workers) if f is not None]
+
+def parse_dot_jobs(jobs: List[Tuple[Path, dict]], cache_dir: str|Path|None = None,
+                   workers: Optional[int] = None) -> List[Optional[pd.DataFrame]]:
+    """Like parse_dot_files, but one entry per job (None where parsing failed)."""
+    frames: List[Optional[pd.DataFrame]] = [None] * len(jobs)
+    todo = []
+    for i, (path, spec) in enumerate(jobs):
+        cache_file = Path(cache_dir) / f"dot_{_content_key(path, spec)}.parquet" if cache_dir else None
+        if cache_file is not None and cache_file.exists():
+            frames[i] = pd.read_parquet(cache_file)
+        else:
+            todo.append((i, path, spec, cache_file))
+    workers = min(workers or os.cpu_count() or 1, len(todo))
+    if workers > 1:
+        # spawn: this may run on an ingest thread, and forking a threaded process can deadlock
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+            futs = [(i, path, pool.submit(_parse_and_cache, path, spec, cf)) for i, path, spec, cf in todo]
+            for i, path, fut in futs:
+                try:
+                    frames[i] = fut.result()
+                except Exception as e:
+                    logging.warning("Could not parse DOT file %s: %s", path, e)
+    else:
+        for i, path, spec, cf in todo:
+            try:
+                frames[i] = _parse_and_cache(path, spec, cf)
+            except Exception as e:
+                logging.warning("Could not parse DOT file %s: %s", path, e)
+    logging.info("DOT files: %d parsed, %d from cache", len(todo), len(jobs) - len(todo))
+    return frames
@@ -0,0 +1,95 @@
+from __future__ import annotations
+import sqlite3, time, logging
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+
+from ..metrics import PROFILE
+
+# Only definitive answers are worth keeping; 5xx/429 must always be retried.
+CACHEABLE_STATUSES = (200, 404, 410)
+
+@dataclass
+class CachedResponse:
+    url: str
+    status: int
+    content_type: str
+    etag: str
+    last_modified: str
+    body: str
+    fetched_at: float
+
+class ResponseCache:
+    """On-disk (SQLite) HTTP response cache keyed by URL.
+
+    Entries younger than `max_age_days` are served as-is; older ones carry
+    their ETag / Last-Modified so the caller can revalidate conditionally.
+    Total body size is bounded by `max_bytes`, evicting least recently used.
+    """
+    def __init__(self, path: str|Path, max_age_days: float = 21, max_bytes: int = 512 * 1024 * 1024):
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_age_s = max_age_days * 86400
+        self.max_bytes = max_bytes
+        self.hits = self.revalidated = self.misses = self.stores = self.evicted = 0
+        self.con = sqlite3.connect(str(path), isolation_level=None, check_same_thread=False)
+        self.con.execute("PRAGMA journal_mode=WAL")
+        self.con.execute("PRAGMA synchronous=NORMAL")
+        self.con.execute("""CREATE TABLE IF NOT EXISTS responses (
+            url TEXT PRIMARY KEY, status INTEGER, content_type TEXT, etag TEXT, last_modified TEXT,
+            body TEXT, size INTEGER, fetched_at REAL, accessed_at REAL)""")
+        self.con.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses(accessed_at)")
+        self.total_bytes = self.con.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    def lookup(self, url: str) -> Optional[CachedResponse]:
+        row = self.con.execute(
+            "SELECT url, status, content_type, etag, last_modified, body, fetched_at FROM responses WHERE url = ?",
+            (url,)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.con.execute("UPDATE responses SET accessed_at = ? WHERE url = ?", (time.time(), url))
+        return CachedResponse(*row)
+
+    def is_fresh(self, entry: CachedResponse) -> bool:
+        return time.time() - entry.fetched_at < self.max_age_s
+
+    def mark_revalidated(self, url: str):
+        """A 304 came back: the cached body is good for another cadence."""
+        self.revalidated += 1
+        self.con.execute("UPDATE responses SET fetched_at = ? WHERE url = ?", (time.time(), url))
+
+    def store(self, url: str, status: int, content_type: str, etag: str, last_modified: str, body: str):
+        size = len(body.encode("utf-8", "ignore"))
+        if size > self.max_bytes:
+            return
+        now = time.time()
+        old = self.con.execute("SELECT size FROM responses WHERE url = ?", (url,)).fetchone()
+        self.con.execute(
+            "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (url, status, content_type or "", etag or "", last_modified or "", body, size, now, now))
+        self.total_bytes += size - (old[0] if old else 0)
+        self.stores += 1
+        if self.total_bytes > self.max_bytes:
+            self._evict(int(self.max_bytes * 0.9))
+
+    def _evict(self, target: int):
+        freed = []
+        for url, size in self.con.execute("SELECT url, size FROM responses ORDER BY accessed_at"):
+            if self.total_bytes <= target:
+                break
+            freed.append((url,))
+            self.total_bytes -= size
+        self.con.executemany("DELETE FROM responses WHERE url = ?", freed)
+        self.evicted += len(freed)
+
+    def stats(self) -> dict:
+        return {"hits": self.hits, "revalidated": self.revalidated, "misses": self.misses,
+                "stores": self.stores, "evicted": self.evicted, "bytes": self.total_bytes}
+
+    def close(self):
+        for result in ("hits", "revalidated", "misses"):
+            PROFILE.count("http_cache_lookups_total", getattr(self, result), result=result)
+        logging.info("HTTP cache: %(hits)d fresh hits, %(revalidated)d revalidated (304), %(misses)d misses, "
+                     "%(stores)d stored, %(evicted)d evicted, %(bytes)d bytes on disk", self.stats())
+        self.con.close()
@@ -0,0 +1,162 @@
+from __future__ import annotations
+import bz2, gzip, re, logging
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+from .osm_overpass import STATE_BBOX
+from ..resolve.spatial import in_state
+
+# Offline alternative to Overpass: scan a local OSM extract (.osm / .osm.bz2 /
+# .osm.gz XML, or .pbf when pyosmium is installed) and return the same element
+# dicts as `collect_state`. Memory is bounded by the number of *matched*
+# elements, not the file size: matched nodes are emitted on the first pass,
+# and way/relation centers are resolved with follow-up passes that only keep
+# the coordinates they need.
+
+def _open(path: Path):
+    name = path.name.lower()
+    if name.endswith(".bz2"):
+        return bz2.open(path, "rb")
+    if name.endswith(".gz"):
+        return gzip.open(path, "rb")
+    return open(path, "rb")
+
+def _iter_xml(path: Path) -> Iterator[Tuple]:
+    """Yield ('node', id, tags, lat, lon) / ('way', id, tags, refs) / ('relation', id, tags, members)."""
+    from lxml import etree
+    with _open(path) as f:
+        for _, el in etree.iterparse(f, events=("end",), tag=("node", "way", "relation")):
+            tags = {t.get("k"): t.get("v") for t in el.iterchildren("tag")}
+            oid = int(el.get("id"))
+            if el.tag == "node":
+                yield ("node", oid, tags, float(el.get("lat")), float(el.get("lon")))
+            elif el.tag == "way":
+                yield ("way", oid, tags, [int(nd.get("ref")) for nd in el.iterchildren("nd")])
+            else:
+                yield ("relation", oid, tags, [(m.get("type"), int(m.get("ref"))) for m in el.iterchildren("member")])
+            # drop the parsed element and any already-processed siblings
+            el.clear()
+            while el.getprevious() is not None:
+                del el.getparent()[0]
+
+def _iter_pbf(path: Path) -> Iterator[Tuple]:
+    try:
+        import osmium  # type: ignore
+    except Exception as e:
+        raise RuntimeError("Reading .pbf extracts requires pyosmium (pip install osmium)") from e
+    kinds = {"n": "node", "w": "way", "r": "relation"}
+    for obj in osmium.FileProcessor(str(path)):
+        tags = {t.k: t.v for t in obj.tags}
+        if obj.is_node():
+            loc = obj.location
+            if loc.valid():
+                yield ("node", obj.id, tags, loc.lat, loc.lon)
+        elif obj.is_way():
+            yield ("way", obj.id, tags, [n.ref for n in obj.nodes])
+        elif obj.is_relation():
+            yield ("relation", obj.id, tags, [(kinds.get(m.type, m.type), m.ref) for m in obj.members])
+
+def _iter_elements(path: Path) -> Iterator[Tuple]:
+    return _iter_pbf(path) if path.name.lower().endswith(".pbf") else _iter_xml(path)
+
+def _center(points: List[Tuple[float, float]]) -> Optional[Dict[str, float]]:
+    """Bounding-box center, which is what Overpass `out center` reports."""
+    if not points:
+        return None
+    lats = [p[0] for p in points]
+    lons = [p[1] for p in points]
+    return {"lat": (min(lats) + max(lats)) / 2, "lon": (min(lons) + max(lons)) / 2}
+
+def iter_extract(path: str|Path, name_regex: str) -> Iterator[dict]:
+    """Stream Overpass-shaped element dicts whose `name` matches `name_regex` (case-insensitive)."""
+    path = Path(path)
+    pat = re.compile(name_regex, re.I)
+    ways: Dict[int, Tuple[dict, List[int]]] = {}
+    relations: Dict[int, Tuple[dict, List[Tuple[str, int]]]] = {}
+
+    # pass 1: matched nodes go straight out; matched ways/relations are remembered
+    for kind, oid, tags, *rest in _iter_elements(path):
+        name = tags.get("name")
+        if not name or not pat.search(name):
+            continue
+        if kind == "node":
+            yield {"type": "node", "id": oid, "lat": rest[0], "lon": rest[1], "tags": tags}
+        elif kind == "way":
+            ways[oid] = (tags, rest[0])
+        else:
+            relations[oid] = (tags, rest[0])
+    if not ways and not relations:
+        return
+
+    # pass 2: node lists of ways that are only referenced as relation members
+    member_ways: Dict[int, List[int]] = {oid: refs for oid, (_, refs) in ways.items()}
+    wanted_ways: Set[int] = {ref for _, members in relations.values() for typ, ref in members if typ == "way"}
+    wanted_ways -= member_ways.keys()
+    if wanted_ways:
+        for kind, oid, _tags, *rest in _iter_elements(path):
+            if kind == "way" and oid in wanted_ways:
+                member_ways[oid] = rest[0]
+
+    # pass 3: coordinates for just the nodes we need
+    wanted_nodes: Set[int] = {ref for refs in member_ways.values() for ref in refs}
+    wanted_nodes |= {ref for _, members in relations.values() for typ, ref in members if typ == "node"}
+    coords: Dict[int, Tuple[float, float]] = {}
+    for kind, oid, _tags, *rest in _iter_elements(path):
+        if kind == "node" and oid in wanted_nodes:
+            coords[oid] = (rest[0], rest[1])
+
+    def _points(refs):
+        return [coords[r] for r in refs if r in coords]
+
+    # elements whose nodes are all missing (cut off at the extract's edge) have no
+    # center; nothing downstream can place them, so they are dropped here
+    dropped = {"way": 0, "relation": 0}
+    for oid, (tags, refs) in ways.items():
+        center = _center(_points(refs))
+        if center is None:
+            dropped["way"] += 1
+            continue
+        yield {"type": "way", "id": oid, "tags": tags, "center": center}
+    for oid, (tags, members) in relations.items():
+        pts: List[Tuple[float, float]] = []
+        for typ, ref in members:
+            if typ == "node" and ref in coords:
+                pts.append(coords[ref])
+            elif typ == "way":
+                pts.extend(_points(member_ways.get(ref, [])))
+        center = _center(pts)
+        if center is None:
+            dropped["relation"] += 1
+            continue
+        yield {"type": "relation", "id": oid, "tags": tags, "center": center}
+    if any(dropped.values()):
+        logging.warning("OSM extract %s: dropped %d ways and %d relations whose nodes have no coordinates in the extract",
+                        path, dropped["way"], dropped["relation"])
+
+def element_latlon(el: dict) -> Tuple[Optional[float], Optional[float]]:
+    if "lat" in el:
+        return el["lat"], el["lon"]
+    c = el.get("center") or {}
+    return c.get("lat"), c.get("lon")
+
+def states_for(el: dict, states: List[str]) -> List[str]:
+    """States whose outline contains the element (bounding box first, then the polygon)."""
+    lat, lon = element_latlon(el)
+    if lat is None:
+        return []
+    return [st for st in states
+            if STATE_BBOX[st][0] <= lat <= STATE_BBOX[st][2] and STATE_BBOX[st][1] <= lon <= STATE_BBOX[st][3]
+            and in_state([lat], [lon], st)[0]]
+
+def collect_extract(path: str|Path, name_regex: str, states: List[str]) -> Dict[str, List[dict]]:
+    """One pass over the extract, bucketed by state outline (like per-state Overpass runs)."""
+    for st in states:
+        assert st in STATE_BBOX, f"Unsupported state {st}"
+    out: Dict[str, List[dict]] = {st: [] for st in states}
+    n = 0
+    for el in iter_extract(path, name_regex):
+        for st in states_for(el, states):
+            out[st].append(el)
+        n += 1
+    logging.info("OSM extract %s: %d matching elements", path, n)
+    return out
@@ -1,10 +1,21 @@
 from __future__ import annotations
-import time, logging
-from typing import Iterable, List, Tuple
+import time, logging, json, hashlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
 import requests
+from requests.adapters import HTTPAdapter
+
+from ..metrics import PROFILE
 
 OSM_TIMEOUT_S = 60
 OVERPASS_URL = "https://overpass-api.de/api/interpreter"
+# A tile returning this many elements was cut off by `out ... N;` and gets split.
+MAX_ELEMENTS_PER_TILE = 2000
+MIN_TILE_DEG = 0.125
+# longest Retry-After we honor before trying a tile again
+MAX_RETRY_AFTER_S = 120.0
 
 STATE_BBOX = {
     "TX": (25.83, -106.65, 36.50, -93.51),
@@ -12,6 +23,8 @@ STATE_BBOX = {
     "CO": (36.99, -109.06, 41.00, -102.04),
 }
 
+Tile = Tuple[float, float, float, float]
+
 def grid(bbox: Tuple[float,float,float,float], step: float=2.0) -> Iterable[Tuple[float,float,float,float]]:
     south, west, north, east = bbox
     lat = south
@@ -24,35 +37,195 @@ def grid(bbox: Tuple[float,float,float,float], step: float=2.0) -> Iterable[Tupl
             lon += step
         lat += step
 
-def build_query(name_regex: str, bbox: Tuple[float,float,float,float]) -> str:
+def quadrants(tile: Tile) -> List[Tile]:
+    s, w, n, e = tile
+    mlat, mlon = (s + n) / 2, (w + e) / 2
+    return [(s, w, mlat, mlon), (s, mlon, mlat, e), (mlat, w, n, mlon), (mlat, mlon, n, e)]
+
+def build_query(name_regex: str, bbox: Tuple[float,float,float,float], max_elements: Optional[int] = None) -> str:
     s, w, n, e = bbox
+    limit = f" {max_elements}" if max_elements else ""
     return f"""    [out:json][timeout:{OSM_TIMEOUT_S}];
     (
       node["name"~"{name_regex}", i]({s},{w},{n},{e});
       way["name"~"{name_regex}", i]({s},{w},{n},{e});
       relation["name"~"{name_regex}", i]({s},{w},{n},{e});
     );
-    out center tags;
+    out center tags{limit};
     """
 
-def fetch_overpass(name_regex: str, bbox: Tuple[float,float,float,float]) -> dict:
-    q = build_query(name_regex, bbox)
-    r = requests.post(OVERPASS_URL, data={"data": q}, timeout=OSM_TIMEOUT_S+10)
+class TileTooDense(Exception):
+    """Overpass gave up on the tile (timeout / out of memory); retry it smaller."""
+
+def make_session(pool_size: int = 4) -> requests.Session:
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+def fetch_overpass(name_regex: str, bbox: Tuple[float,float,float,float], session: Optional[requests.Session] = None,
+                   url: str = OVERPASS_URL, max_elements: Optional[int] = None) -> dict:
+    q = build_query(name_regex, bbox, max_elements)
+    t0 = time.monotonic()
+    try:
+        r = (session or requests).post(url, data={"data": q}, timeout=OSM_TIMEOUT_S+10)
+    except requests.Timeout as e:
+        PROFILE.count("http_requests_total", source="overpass", status=0)
+        raise TileTooDense(str(e))
+    finally:
+        PROFILE.observe("http_request_seconds", time.monotonic() - t0, source="overpass")
+    PROFILE.count("http_requests_total", source="overpass", status=r.status_code)
+    if r.status_code == 504:
+        raise TileTooDense("gateway timeout")
     r.raise_for_status()
-    return r.json()
+    data = r.json()
+    # Overpass reports query timeouts as a 200 with a "runtime error" remark
+    if "runtime error" in (data.get("remark") or ""):
+        raise TileTooDense(data["remark"])
+    return data
 
-def collect_state(state: str, name_regex: str) -> List[dict]:
-    assert state in STATE_BBOX, f"Unsupported state {state}"
-    out = []
-    for i, tile in enumerate(grid(STATE_BBOX[state], step=2.0)):
-        backoff = 1.0
-        while True:
-            try:
-                data = fetch_overpass(name_regex, tile)
-                out.extend(data.get("elements", []))
+class TileCheckpoint:
+    """Append-only JSON-lines log of finished (or split) tiles for one state+regex."""
+    def __init__(self, path: Path, max_age_days: float = 21):
+        self.path = Path(path)
+        self.done: Dict[Tuple, dict] = {}
+        if self.path.exists():
+            with open(self.path) as f:
+                lines = [json.loads(l) for l in f if l.strip()]
+            if lines and time.time() - lines[0].get("created", 0) < max_age_days * 86400:
+                for rec in lines[1:]:
+                    self.done[self.key(rec["tile"])] = rec
+            else:
+                self.path.unlink()
+        if not self.path.exists():
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._append({"created": time.time()})
+
+    @staticmethod
+    def key(tile) -> Tuple:
+        return tuple(round(x, 6) for x in tile)
+
+    def _append(self, rec: dict):
+        with open(self.path, "a") as f:
+            f.write(json.dumps(rec) + "\n")
+
+    def record(self, tile: Tile, status: str, elements: Optional[List[dict]] = None):
+        rec = {"tile": list(tile), "status": status, "elements": elements or []}
+        self.done[self.key(tile)] = rec
+        self._append(rec)
+
+def _fetch_tile(name_regex: str, tile: Tile, session: requests.Session, url: str, max_elements: int,
+                min_tile_deg: float, max_retries: int) -> Tuple[str, List[dict]]:
+    """("done" | "split" | "incomplete" | "failed", elements) for one tile.
+
+    Only density splits a tile (an Overpass timeout or a full `max_elements`
+    answer). Rate limits, server and network errors retry the same tile,
+    honoring Retry-After; splitting would only multiply the requests.
+    """
+    can_split = (tile[2] - tile[0]) > min_tile_deg or (tile[3] - tile[1]) > min_tile_deg
+    backoff = 1.0
+    for attempt in range(max_retries + 1):
+        try:
+            elements = fetch_overpass(name_regex, tile, session=session, url=url,
+                                      max_elements=max_elements).get("elements", [])
+        except TileTooDense as e:
+            if can_split:
+                return "split", []
+            logging.warning("Overpass gave up on minimum-size tile %s: %s", tile, e)
+            return "failed", []
+        except Exception as e:
+            if attempt == max_retries:
+                logging.warning("Overpass error on tile %s: %s; giving up after %d attempts", tile, e, attempt + 1)
                 break
-            except Exception as e:
-                logging.warning("Overpass error on tile %s: %s; backing off %.1fs", i, e, backoff)
-                time.sleep(backoff)
-                backoff = min(backoff*1.8, 30)
-    return out
\ No newline at end of file
+            delay = backoff
+            if isinstance(e, requests.HTTPError) and e.response is not None:
+                from .crawl_scheduler import parse_retry_after
+                delay = parse_retry_after(e.response.headers.get("Retry-After")) or backoff
+            delay = min(delay, MAX_RETRY_AFTER_S)
+            logging.warning("Overpass error on tile %s: %s; retrying in %.1fs", tile, e, delay)
+            time.sleep(delay)
+            backoff = min(backoff*1.8, 30)
+            continue
+        if len(elements) >= max_elements:
+            if can_split:
+                return "split", []
+            logging.warning("Overpass: minimum-size tile %s hit the %d-element cap; its results are truncated",
+                            tile, max_elements)
+            return "incomplete", elements
+        return "done", elements
+    return "failed", []
+
+def collect_state(state: str, name_regex: str, concurrency: int = 2, step: float = 4.0,
+                  max_elements: int = MAX_ELEMENTS_PER_TILE, min_tile_deg: float = MIN_TILE_DEG,
+                  max_retries: int = 4, checkpoint_dir: str|Path|None = None, max_age_days: float = 21,
+                  session: Optional[requests.Session] = None, url: str = OVERPASS_URL) -> List[dict]:
+    """Collect name-matched elements for a state on an adaptive quadtree.
+
+    Starts from coarse `step`-degree tiles (so sparse areas cost one query) and
+    splits any tile that times out or hits `max_elements` into quadrants
+    (minimum-size tiles at the cap are kept, logged as "incomplete"). Up to
+    `concurrency` tiles are in flight on a shared session. With a
+    `checkpoint_dir`, finished tiles are logged and a rerun resumes from them.
+    Elements are deduplicated by OSM type/id across overlapping tile edges
+    and clipped to the state outline.
+    """
+    assert state in STATE_BBOX, f"Unsupported state {state}"
+    session = session or make_session(concurrency)
+    ckpt = None
+    if checkpoint_dir:
+        tag = hashlib.sha1(f"{name_regex}|{max_elements}".encode()).hexdigest()[:10]
+        ckpt = TileCheckpoint(Path(checkpoint_dir) / f"overpass_{state}_{tag}.jsonl", max_age_days)
+    out: Dict[Tuple[str, int], dict] = {}
+    pending = deque(grid(STATE_BBOX[state], step=step))
+    failed = incomplete = 0
+
+    def _finish(tile: Tile, status: str, elements: List[dict]):
+        nonlocal failed, incomplete
+        if status == "split":
+            pending.extend(quadrants(tile))
+        elif status == "failed":
+            failed += 1
+            return
+        elif status == "incomplete":
+            incomplete += 1
+        for el in elements:
+            out.setdefault((el.get("type"), el.get("id")), el)
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        inflight = {}
+        while pending or inflight:
+            while pending and len(inflight) < concurrency:
+                tile = pending.popleft()
+                rec = ckpt.done.get(ckpt.key(tile)) if ckpt else None
+                if rec is not None:
+                    _finish(tile, rec["status"], rec["elements"])
+                    continue
+                fut = pool.submit(_fetch_tile, name_regex, tile, session, url, max_elements, min_tile_deg, max_retries)
+                inflight[fut] = tile
+            if not inflight:
+                continue
+            finished, _ = wait(inflight, return_when=FIRST_COMPLETED)
+            for fut in finished:
+                tile = inflight.pop(fut)
+                status, elements = fut.result()
+                if ckpt and status != "failed":
+                    ckpt.record(tile, status, elements)
+                _finish(tile, status, elements)
+    if failed:
+        logging.warning("Overpass: %d tiles in %s could not be fetched; rerun to retry them", failed, state)
+    if incomplete:
+        logging.warning("Overpass: %d minimum-size tiles in %s were truncated at %d elements", incomplete, state, max_elements)
+    return clip_to_state(list(out.values()), state)
+
+def clip_to_state(elements: List[dict], state: str) -> List[dict]:
+    """Drop elements outside the state outline (tiles cover its bounding box); keep ones without coordinates."""
+    import numpy as np
+    from ..resolve.spatial import in_state
+    coords = [el.get("center") or el for el in elements]
+    lat = np.array([c.get("lat", np.nan) for c in coords], dtype=float)
+    lon = np.array([c.get("lon", np.nan) for c in coords], dtype=float)
+    keep = np.isnan(lat) | np.isnan(lon) | in_state(lat, lon, state)
+    if not keep.all():
+        logging.info("Overpass: dropped %d of %d elements outside %s", int((~keep).sum()), len(elements), state)
+    return [el for el, k in zip(elements, keep) if k]
@@ -1,62 +1,238 @@
 from __future__ import annotations
-import asyncio, re, json
-from typing import List, Dict, Tuple
+import asyncio, codecs, html as htmllib, re, json, logging, multiprocessing, os, time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, List, Dict, Tuple, Optional
 from urllib.parse import urljoin, urlparse
 from urllib import robotparser
 
 import httpx
-from aiolimiter import AsyncLimiter
 from bs4 import BeautifulSoup
 import trafilatura
 import phonenumbers
 
-# Simple polite fetcher with robots.txt compliance
+from .crawl_scheduler import CrawlScheduler, THROTTLE_STATUSES
+from .http_cache import ResponseCache, CACHEABLE_STATUSES
+from .crawl_frontier import CrawlFrontier
+from ..metrics import PROFILE
+
+DEFAULT_HEADERS = {"User-Agent": "IEF-Discovery/0.1 (+https://example.com/contact)"}
+# Bodies with any other content type are dropped as soon as the headers arrive.
+ACCEPT_TYPES = ("text/", "application/xml", "application/xhtml+xml", "application/rss+xml")
+MAX_PAGE_BYTES = 2 * 1024 * 1024
+
+@dataclass
+class FetchedResponse:
+    """What the crawler keeps of a response: never more than the byte budget."""
+    status_code: int
+    headers: httpx.Headers
+    text: str = ""
+    truncated: bool = False
+
+def make_client(timeout: float = 15.0, http2: bool = False, max_connections: int = 100,
+                max_keepalive: int = 20, keepalive_expiry: float = 30.0) -> httpx.AsyncClient:
+    """One pooled, keep-alive client meant to be shared by every crawl task."""
+    if http2:
+        try:
+            import h2  # type: ignore  # noqa: F401
+        except Exception:
+            logging.warning("http2 requested but the 'h2' package is missing; falling back to HTTP/1.1")
+            http2 = False
+    limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_keepalive,
+                          keepalive_expiry=keepalive_expiry)
+    return httpx.AsyncClient(timeout=timeout, headers=DEFAULT_HEADERS, follow_redirects=True,
+                             limits=limits, http2=http2)
+
+# Simple polite fetcher with robots.txt compliance.
+# A single instance is meant to live for the whole crawl so the connection pool,
+# robots cache and per-host limiters are shared across domains.
 class PoliteFetcher:
-    def __init__(self, rate_per_host: float = 1.0, timeout: float = 15.0):
+    def __init__(self, rate_per_host: float = 1.0, timeout: float = 15.0, client: httpx.AsyncClient|None = None,
+                 http2: bool = False, max_connections: int = 100, max_keepalive: int = 20,
+                 scheduler: CrawlScheduler|None = None, global_rps: float = 50.0, max_retries: int = 2,
+                 cache: ResponseCache|None = None, max_page_bytes: int = MAX_PAGE_BYTES):
         self.timeout = timeout
-        self.limiters = {}
+        self.max_page_bytes = max_page_bytes
+        self.stats = {"bytes": 0, "aborted": 0, "truncated": 0, "largest": 0}
+        self.cache = cache
+        self.max_retries = max_retries
         self.robot_cache: Dict[str, robotparser.RobotFileParser] = {}
-        self.headers = {"User-Agent": "IEF-Discovery/0.1 (+https://example.com/contact)"}
+        self.headers = dict(DEFAULT_HEADERS)
+        self.scheduler = scheduler or CrawlScheduler(rate_per_host=rate_per_host, global_rps=global_rps,
+                                                     max_open=max_connections)
+        self.page_requests = 0
+        self._own_client = client is None
+        self.client = client or make_client(timeout, http2=http2, max_connections=max_connections,
+                                            max_keepalive=max_keepalive)
+
+    async def aclose(self):
+        if self._own_client:
+            await self.client.aclose()
+
+    async def __aenter__(self) -> "PoliteFetcher":
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.aclose()
+
+    async def _request(self, url: str, headers: Dict[str, str]|None = None) -> FetchedResponse|None:
+        """GET through the scheduler, retrying 429/503 after the host's back-off."""
+        host = urlparse(url).netloc
+        for attempt in range(self.max_retries + 1):
+            async with self.scheduler.slot(host):
+                t0 = time.monotonic()
+                try:
+                    async with self.client.stream("GET", url, headers=headers, timeout=self.timeout) as r:
+                        resp = await self._read(r)
+                except Exception:
+                    self.scheduler.record(host, 0, time.monotonic() - t0)
+                    PROFILE.count("http_requests_total", source="web", status=0)
+                    return None
+            latency = time.monotonic() - t0
+            self.scheduler.record(host, resp.status_code, latency, resp.headers.get("retry-after"))
+            PROFILE.count("http_requests_total", source="web", status=resp.status_code)
+            PROFILE.observe("http_request_seconds", latency, source="web")
+            if resp.status_code in THROTTLE_STATUSES and attempt < self.max_retries:
+                continue
+            return resp
+        return None
+
+    async def _read(self, r: httpx.Response) -> FetchedResponse:
+        """Body of a streamed 200 response, decoded incrementally and capped at max_page_bytes."""
+        resp = FetchedResponse(r.status_code, r.headers)
+        if r.status_code != 200:
+            return resp
+        ctype = r.headers.get("content-type", "").lower()
+        if ctype and not ctype.startswith(ACCEPT_TYPES):
+            self.stats["aborted"] += 1
+            return resp
+        decoder = codecs.getincrementaldecoder(r.charset_encoding or "utf-8")(errors="replace")
+        parts: List[str] = []
+        size = 0
+        # aiter_bytes decompresses gzip/br chunk by chunk; the budget applies to decoded bytes
+        async for chunk in r.aiter_bytes():
+            chunk = chunk[:self.max_page_bytes - size]
+            size += len(chunk)
+            parts.append(decoder.decode(chunk))
+            if size >= self.max_page_bytes:
+                resp.truncated = True
+                break
+        parts.append(decoder.decode(b"", final=True))
+        resp.text = "".join(parts)
+        if resp.truncated:
+            # cut at the last complete tag so the parser never sees half an element
+            cut = resp.text.rfind(">")
+            resp.text = resp.text[:cut + 1] if cut > 0 else resp.text
+            self.stats["truncated"] += 1
+        self.stats["bytes"] += size
+        PROFILE.count("http_body_bytes_total", size, source="web")
+        self.stats["largest"] = max(self.stats["largest"], size)
+        return resp
 
-    def _limiter(self, host: str) -> AsyncLimiter:
-        if host not in self.limiters:
-            # rate_per_host req/sec => 1 per second minimum spacing
-            self.limiters[host] = AsyncLimiter(1, 1)
-        return self.limiters[host]
+    def log_stats(self):
+        st = self.stats
+        logging.info("Fetched %.1f MB of bodies (largest %.0f KB, budget %.0f KB/page); %d aborted by content type, %d truncated",
+                     st["bytes"] / 1e6, st["largest"] / 1024, self.max_page_bytes / 1024, st["aborted"], st["truncated"])
+
+    async def _fetch(self, url: str) -> Optional[Tuple[int, str, str]]:
+        """(status, content_type, text) for url, via the response cache when one is configured."""
+        entry = self.cache.lookup(url) if self.cache else None
+        if entry is not None and self.cache.is_fresh(entry):
+            self.cache.hits += 1
+            return entry.status, entry.content_type, entry.body
+        headers = {}
+        if entry is not None:
+            if entry.etag:
+                headers["If-None-Match"] = entry.etag
+            if entry.last_modified:
+                headers["If-Modified-Since"] = entry.last_modified
+        r = await self._request(url, headers or None)
+        if r is None:
+            # network failure: a stale copy beats nothing
+            return (entry.status, entry.content_type, entry.body) if entry is not None else None
+        if r.status_code == 304 and entry is not None:
+            self.cache.mark_revalidated(url)
+            return entry.status, entry.content_type, entry.body
+        ctype = r.headers.get("content-type", "")
+        text = r.text
+        if self.cache is not None and r.status_code in CACHEABLE_STATUSES:
+            self.cache.store(url, r.status_code, ctype, r.headers.get("etag", ""), r.headers.get("last-modified", ""), text)
+        return r.status_code, ctype, text
 
     async def allowed(self, url: str) -> bool:
         parsed = urlparse(url)
         base = f"{parsed.scheme}://{parsed.netloc}"
         if base not in self.robot_cache:
             rp = robotparser.RobotFileParser()
-            try:
-                async with httpx.AsyncClient(timeout=self.timeout, headers=self.headers, follow_redirects=True) as client:
-                    r = await client.get(urljoin(base, "/robots.txt"))
-                    if r.status_code == 200:
-                        rp.parse(r.text.splitlines())
-                    else:
-                        rp.parse([])
-            except Exception:
+            r = await self._fetch(urljoin(base, "/robots.txt"))
+            if r is not None and r[0] == 200:
+                rp.parse(r[2].splitlines())
+            else:
                 rp.parse([])
+            self.scheduler.configure_host(parsed.netloc, rp, self.headers["User-Agent"])
             self.robot_cache[base] = rp
         return self.robot_cache[base].can_fetch(self.headers["User-Agent"], url)
 
-    async def get(self, url: str) -> str:
-        parsed = urlparse(url)
-        limiter = self._limiter(parsed.netloc)
+    async def get(self, url: str, content_types: Tuple[str, ...] = ("text",)) -> str:
         if not await self.allowed(url):
             return ""
-        async with limiter:
-            try:
-                async with httpx.AsyncClient(timeout=self.timeout, headers=self.headers, follow_redirects=True) as client:
-                    r = await client.get(url)
-                    if r.status_code == 200 and r.headers.get("content-type","").startswith("text"):
-                        return r.text
-            except Exception:
-                return ""
+        self.page_requests += 1
+        r = await self._fetch(url)
+        if r is not None and r[0] == 200 and r[1].startswith(content_types):
+            return r[2]
         return ""
 
-SERVICE_PATHS = ["/", "/about", "/services", "/service", "/contact", "/areas-served", "/sitemap.xml"]
+    async def site_maps(self, base: str) -> List[str]:
+        """Sitemap URLs declared in robots.txt (`Sitemap:` lines)."""
+        await self.allowed(urljoin(base, "/"))
+        return list(self.robot_cache[base].site_maps() or [])
+
+# Fallback candidates when a site has no usable sitemap, in fetch order.
+SERVICE_PATHS = ["/", "/about", "/services", "/service", "/contact", "/areas-served"]
+SITEMAP_TYPES = ("text/xml", "application/xml", "text/plain")
+# Path keywords that tend to hold a phone number or a list of work types.
+PAGE_KEYWORDS = {"contact": 4, "about": 3, "service": 3, "paving": 2, "asphalt": 2, "sealcoat": 2,
+                 "driveway": 1, "parking": 1, "area": 1, "location": 1, "commercial": 1, "residential": 1}
+_SKIP_PATHS = re.compile(r"/(blog|news|tag|category|author|wp-content|feed|privacy|terms|careers?)(/|$)|\.(pdf|jpe?g|png|gif|zip)$", re.I)
+_LOC_RE = re.compile(r"<loc>\s*(.*?)\s*</loc>", re.I | re.S)
+TARGET_SCORE = 2
+
+def parse_sitemap(xml: str, max_urls: int = 5000) -> Tuple[List[str], List[str]]:
+    """(page urls, child sitemap urls) from a sitemap or sitemap index."""
+    locs = [htmllib.unescape(m.group(1)) for _, m in zip(range(max_urls), _LOC_RE.finditer(xml))]
+    if re.search(r"<sitemapindex", xml[:2000], re.I):
+        return [], locs
+    return locs, []
+
+def rank_pages(urls: List[str], base: str, k: int) -> List[str]:
+    """Top-k same-site URLs by path keywords; shallower paths break ties.
+    A path listed under both www. and the bare host is kept once."""
+    host = urlparse(base).netloc.lower().removeprefix("www.")
+    scored, seen = [], set()
+    for u in urls:
+        parsed = urlparse(u)
+        if parsed.netloc.lower().removeprefix("www.") != host:
+            continue
+        path = parsed.path.lower()
+        if path in ("", "/") or path in seen or _SKIP_PATHS.search(path):
+            continue
+        seen.add(path)
+        score = sum(w for kw, w in PAGE_KEYWORDS.items() if kw in path)
+        if score:
+            scored.append((-score, path.count("/"), len(path), u))
+    return [u for *_, u in sorted(scored)[:k]]
+
+async def sitemap_pages(base: str, fetcher: PoliteFetcher, k: int, max_children: int = 3) -> List[str]:
+    """Best candidate pages from robots-declared sitemaps (or /sitemap.xml), one index level deep."""
+    maps = await fetcher.site_maps(base) or [urljoin(base, "/sitemap.xml")]
+    urls: List[str] = []
+    for sm in maps[:max_children]:
+        pages, children = parse_sitemap(await fetcher.get(sm, SITEMAP_TYPES))
+        urls += pages
+        # indexes usually list page sitemaps first; skip compressed ones
+        for child in [c for c in children if not c.endswith(".gz")][:max_children]:
+            urls += parse_sitemap(await fetcher.get(child, SITEMAP_TYPES))[0]
+    return rank_pages(urls, base, k)
 
 def extract_structured(html: str, base_url: str) -> Dict:
     out: Dict = {"name": "", "address": "", "city": "", "state": "", "postal_code": "", "phone": "", "website": base_url, "work_types": ""}
@@ -121,38 +297,162 @@ def extract_structured(html: str, base_url: str) -> Dict:
     out["work_types"] = ", ".join(sorted(set(kws)))
     return out
 
-async def crawl_domain(domain: str) -> Dict:
-    fetcher = PoliteFetcher()
-    base = f"https://{domain}"
-    best = {}
-    for p in SERVICE_PATHS:
-        html = await fetcher.get(urljoin(base, p))
+class ExtractionPool:
+    """Runs extract_structured in worker processes, fed from a bounded queue.
+
+    Fetch tasks `await extract(...)`; when `queue_size` pages are already waiting
+    the put blocks, so fetchers stall instead of piling HTML up in memory.
+    workers=0 parses inline on the event loop (handy for debugging).
+    """
+    def __init__(self, workers: int|None = None, queue_size: int|None = None):
+        self.workers = (os.cpu_count() or 1) if workers is None else workers
+        self.queue_size = queue_size or max(self.workers * 2, 1)
+        self.executor: ProcessPoolExecutor|None = None
+        self.queue: asyncio.Queue|None = None
+        self._consumers: List[asyncio.Task] = []
+
+    async def __aenter__(self) -> "ExtractionPool":
+        if self.workers > 0:
+            # spawn: the crawl may run on an ingest thread, and forking a threaded process can deadlock
+            self.executor = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"))
+            self.queue = asyncio.Queue(maxsize=self.queue_size)
+            self._consumers = [asyncio.create_task(self._consume()) for _ in range(self.workers)]
+        return self
+
+    async def __aexit__(self, *exc):
+        for t in self._consumers:
+            t.cancel()
+        await asyncio.gather(*self._consumers, return_exceptions=True)
+        if self.executor is not None:
+            self.executor.shutdown(wait=True, cancel_futures=True)
+
+    async def _consume(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            html, base_url, fut = await self.queue.get()
+            try:
+                if not fut.cancelled():
+                    fut.set_result(await loop.run_in_executor(self.executor, extract_structured, html, base_url))
+            except Exception as e:
+                if not fut.done():
+                    fut.set_exception(e)
+            finally:
+                self.queue.task_done()
+
+    async def extract(self, html: str, base_url: str) -> Dict:
+        if self.executor is None:
+            return extract_structured(html, base_url)
+        fut = asyncio.get_running_loop().create_future()
+        await self.queue.put((html, base_url, fut))
+        return await fut
+
+def _score(data: Dict) -> int:
+    # Prefer pages that yield phone + some keywords
+    return (1 if data.get("phone") else 0) + (1 if data.get("work_types") else 0)
+
+def base_url(domain: str) -> str:
+    """Site root crawled for a domain; also the `website` of its row."""
+    return domain.rstrip("/") if "://" in domain else f"https://{domain}"
+
+async def crawl_domain(domain: str, fetcher: PoliteFetcher|None = None, extractor: ExtractionPool|None = None,
+                       max_pages: int = 6, fanout: int = 3, target_score: int = TARGET_SCORE) -> Dict:
+    """Best record for a domain from a planned handful of pages.
+
+    The homepage goes first; if it is not enough, candidates ranked from the
+    sitemap (or the stock SERVICE_PATHS) are fetched `fanout` at a time until
+    the merged record reaches `target_score` or `max_pages` pages were tried.
+    """
+    if fetcher is None:
+        async with PoliteFetcher() as own:
+            return await crawl_domain(domain, own, extractor, max_pages, fanout, target_score)
+    base = base_url(domain)
+    pages: List[Dict] = []
+
+    async def _page(url: str) -> Optional[Dict]:
+        html = await fetcher.get(url)
         if not html:
-            continue
-        data = extract_structured(html, base)
-        # Prefer pages that yield phone + some keywords
-        score = (1 if data.get("phone") else 0) + (1 if data.get("work_types") else 0)
-        if not best or score > best.get("_score", 0):
-            data["_score"] = score
-            best = data
-    if best:
+            return None
+        return await extractor.extract(html, base) if extractor else extract_structured(html, base)
+
+    def _best() -> Dict:
+        # best page, with blanks filled from the others (phone on /contact, work types on /services)
+        best = dict(max(pages, key=_score))
+        if home and home.get("name"):
+            best["name"] = home["name"]  # the homepage title is the likeliest business name
+        for p in pages:
+            for k, v in p.items():
+                if v and not best.get(k):
+                    best[k] = v
+        best["_score"] = _score(best)
+        return best
+
+    home = await _page(urljoin(base, "/"))
+    if home:
+        pages.append(home)
+    if not home or _score(_best()) < target_score:
+        candidates = await sitemap_pages(base, fetcher, max_pages - 1)
+        if not candidates:
+            candidates = [urljoin(base, p) for p in SERVICE_PATHS[1:]][:max_pages - 1]
+        for i in range(0, len(candidates), fanout):
+            pages += [p for p in await asyncio.gather(*(_page(u) for u in candidates[i:i + fanout])) if p]
+            if pages and _score(_best()) >= target_score:
+                break
+    if pages:
+        best = _best()
         best["source_name"] = "web"
         return best
     return {}
 
-async def crawl_domains(domains: List[str], limit: int = 1000) -> List[Dict]:
+async def crawl_domains(domains: List[str], limit: int = 1000, concurrency: int = 20, http2: bool = False,
+                        max_connections: int = 100, max_keepalive: int = 20, timeout: float = 15.0,
+                        rate_per_host: float = 1.0, global_rps: float = 50.0, cache_path: str = "",
+                        cache_max_age_days: float = 21, cache_max_mb: int = 512,
+                        extract_workers: int|None = None, extract_queue: int|None = None,
+                        max_page_bytes: int = MAX_PAGE_BYTES, frontier: CrawlFrontier|None = None, resume: bool = False,
+                        on_result: Callable[[Dict], None]|None = None) -> List[Dict]:
+    """Crawl domains concurrently. With a `frontier`, per-domain state and rows are
+    persisted as they finish and `resume=True` continues an interrupted crawl.
+    `on_result` sees each extracted row as soon as its domain is done."""
     out: List[Dict] = []
-    sem = asyncio.Semaphore(20)
-    async def _one(d):
-        async with sem:
-            try:
-                data = await crawl_domain(d)
+    sem = asyncio.Semaphore(concurrency)
+    todo = domains[:limit]
+    if frontier is not None:
+        todo = frontier.seed(todo, resume=resume)
+        logging.info("Crawl frontier: %d of %d domains to crawl", len(todo), len(domains[:limit]))
+    cache = ResponseCache(cache_path, max_age_days=cache_max_age_days, max_bytes=cache_max_mb * 1024 * 1024) if cache_path else None
+    async with PoliteFetcher(rate_per_host=rate_per_host, timeout=timeout, http2=http2, global_rps=global_rps,
+                             max_connections=max_connections, max_keepalive=max_keepalive, cache=cache,
+                             max_page_bytes=max_page_bytes) as fetcher, \
+               ExtractionPool(extract_workers, extract_queue) as extractor:
+        async def _one(d):
+            async with sem:
+                if frontier is not None:
+                    frontier.start(d)
+                try:
+                    data = await crawl_domain(d, fetcher, extractor)
+                except Exception as e:
+                    logging.warning("Crawl of %s failed: %r", d, e)
+                    if frontier is not None:
+                        frontier.failed(d, repr(e))
+                    return
                 if data:
                     out.append(data)
-            except Exception:
-                pass
-    tasks = []
-    for d in domains[:limit]:
-        tasks.append(asyncio.create_task(_one(d)))
-    await asyncio.gather(*tasks)
-    return out
\ No newline at end of file
+                if frontier is not None:
+                    frontier.done(d, data)
+                if data and on_result is not None:
+                    on_result(data)
+        tasks = []
+        for d in todo:
+            tasks.append(asyncio.create_task(_one(d)))
+        await asyncio.gather(*tasks)
+        fetcher.scheduler.log_report()
+        fetcher.log_stats()
+        useful = sum(1 for r in out if r.get("_score", 0) > 0)
+        logging.info("Web crawl: %d page requests, %d useful records (%.1f requests/record)",
+                     fetcher.page_requests, useful, fetcher.page_requests / max(useful, 1))
+    if cache is not None:
+        cache.close()
+    if frontier is not None:
+        logging.info("Crawl frontier: %s", frontier.summary())
+        return frontier.results()
+    return out
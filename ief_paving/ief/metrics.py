@@ -0,0 +1,250 @@
+from __future__ import annotations
+import bisect, json, logging, os, sys, threading, time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Run-wide instrumentation: stage timings, labelled counters and latency
+# histograms. Modules record into the process-wide PROFILE; paving_run writes
+# it out as JSON (and optionally Prometheus text) at the end of a run.
+
+LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+Labels = Tuple[Tuple[str, str], ...]
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process; 0.0 where it can't be read."""
+    if resource is None:
+        try:
+            import psutil  # type: ignore
+            return getattr(psutil.Process().memory_info(), "peak_wset", 0) / 1e6
+        except Exception:
+            return 0.0
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # bytes on macOS, KiB elsewhere
+    return rss / 1e6 if sys.platform == "darwin" else rss / 1024
+
+def _labels(labels: Dict[str, object]) -> Labels:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+class Histogram:
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Upper bucket bound holding the q-quantile (coarse, but cheap)."""
+        if not self.count:
+            return None
+        rank, seen = q * self.count, 0
+        for bound, n in zip(self.buckets + (float("inf"),), self.counts):
+            seen += n
+            if seen >= rank:
+                return bound
+        return None
+
+class Stage:
+    def __init__(self, name: str, rows_in: Optional[int], labels: Dict[str, str]):
+        self.name = name
+        self.labels = labels
+        self.rows_in = rows_in
+        self.rows_out: Optional[int] = None
+        self.wall_s = 0.0
+        self.rss_mb = 0.0
+
+class RunProfile:
+    """Stage timings, counters and histograms for one pipeline run (thread-safe)."""
+    def __init__(self):
+        self.started = time.time()
+        self.stages: List[Stage] = []
+        self.counters: Dict[Tuple[str, Labels], float] = {}
+        self.histograms: Dict[Tuple[str, Labels], Histogram] = {}
+        self.profiler: str = ""          # "", "cprofile" or "pyinstrument"
+        self.profile_dir: Optional[Path] = None
+        self._lock = threading.Lock()
+        self._local = threading.local()  # stage nesting depth and labels per thread
+
+    def count(self, name: str, n: float = 1, **labels):
+        key = (name, _labels(labels))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + n
+
+    def observe(self, name: str, value: float, **labels):
+        key = (name, _labels(labels))
+        with self._lock:
+            h = self.histograms.get(key)
+            if h is None:
+                h = self.histograms[key] = Histogram()
+            h.observe(value)
+
+    def merge(self, other: dict):
+        """Fold another process's `to_dict()` counters and histograms into this profile."""
+        for c in other.get("counters", []):
+            self.count(c["name"], c["value"], **c["labels"])
+        for h in other.get("histograms", []):
+            key = (h["name"], _labels(h["labels"]))
+            with self._lock:
+                hist = self.histograms.get(key)
+                if hist is None:
+                    hist = self.histograms[key] = Histogram()
+                hist.counts = [a + b for a, b in zip(hist.counts, h["buckets"].values())]
+                hist.sum += h["sum"]
+                hist.count += h["count"]
+
+    def enable_profiler(self, kind: str, out_dir: str|Path):
+        self.profiler = kind
+        self.profile_dir = Path(out_dir)
+        self.profile_dir.mkdir(parents=True, exist_ok=True)
+
+    @contextmanager
+    def labels(self, **labels):
+        """Label the stages started in this block on this thread, e.g. `market=...`
+        when the same stages run once per market."""
+        prev = getattr(self._local, "labels", {})
+        self._local.labels = {**prev, **{k: str(v) for k, v in labels.items()}}
+        try:
+            yield
+        finally:
+            self._local.labels = prev
+
+    @contextmanager
+    def stage(self, name: str, rows_in: Optional[int] = None) -> Iterator[Stage]:
+        """Time a pipeline stage; set `.rows_out` on the yielded Stage. The outermost
+        stage on each thread is also profiled when a profiler is enabled."""
+        st = Stage(name, rows_in, dict(getattr(self._local, "labels", {})))
+        # profilers only see the thread that started them, so stages running on
+        # worker threads (the ingest sources) get their own dumps
+        depth = getattr(self._local, "depth", 0)
+        self._local.depth = depth + 1
+        prof = self._start_profiler() if self.profiler and depth == 0 else None
+        t0 = time.perf_counter()
+        try:
+            yield st
+        finally:
+            st.wall_s = time.perf_counter() - t0
+            st.rss_mb = peak_rss_mb()
+            self._local.depth = depth
+            with self._lock:
+                self.stages.append(st)
+            if prof is not None:
+                self._stop_profiler(prof, "_".join([name, *st.labels.values()]))
+            logging.info("Stage %s%s: %.2fs, rows %s -> %s, peak RSS %.0f MB",
+                         name, "".join(f" [{k}={v}]" for k, v in st.labels.items()), st.wall_s, st.rows_in if st.rows_in is not None else "-",
+                         st.rows_out if st.rows_out is not None else "-", st.rss_mb)
+
+    def _start_profiler(self):
+        if self.profiler == "pyinstrument":
+            try:
+                from pyinstrument import Profiler  # type: ignore
+            except Exception:
+                logging.warning("pyinstrument is not installed; falling back to cProfile")
+                self.profiler = "cprofile"
+            else:
+                prof = Profiler(async_mode="enabled")
+                prof.start()
+                return prof
+        import cProfile
+        prof = cProfile.Profile()
+        try:
+            prof.enable()
+        except ValueError:
+            # another profiler already active (e.g. running under python -m cProfile)
+            return None
+        return prof
+
+    def _stop_profiler(self, prof, name: str):
+        if self.profiler == "pyinstrument":
+            prof.stop()
+            (self.profile_dir / f"{name}.html").write_text(prof.output_html())
+        else:
+            prof.disable()
+            prof.dump_stats(str(self.profile_dir / f"{name}.prof"))
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            counters = [{"name": n, "labels": dict(l), "value": v} for (n, l), v in sorted(self.counters.items())]
+            hists = [{"name": n, "labels": dict(l), "count": h.count, "sum": round(h.sum, 6),
+                      "p50": h.quantile(0.5), "p95": h.quantile(0.95),
+                      "buckets": dict(zip([str(b) for b in h.buckets] + ["+Inf"], h.counts))}
+                     for (n, l), h in sorted(self.histograms.items())]
+            stages = [{"name": s.name, "labels": s.labels, "wall_s": round(s.wall_s, 4), "rows_in": s.rows_in,
+                       "rows_out": s.rows_out, "peak_rss_mb": round(s.rss_mb, 1)} for s in self.stages]
+        return {"started": self.started, "wall_s": round(time.time() - self.started, 3), "pid": os.getpid(),
+                "peak_rss_mb": round(peak_rss_mb(), 1), "stages": stages, "counters": counters,
+                "histograms": hists}
+
+    def write_json(self, path: str|Path):
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(self.to_dict(), indent=2))
+
+    def write_prometheus(self, path: str|Path, prefix: str = "ief_"):
+        """Prometheus text exposition format (for a node_exporter textfile collector).
+
+        Stages that ran more than once with the same name and labels are summed
+        into one series; each metric family gets its # HELP and # TYPE lines.
+        """
+        def esc(v: str) -> str:
+            return str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        def fmt(labels: Dict[str, str], extra: str = "") -> str:
+            parts = [f'{k}="{esc(v)}"' for k, v in labels.items()] + ([extra] if extra else [])
+            return "{" + ",".join(parts) + "}" if parts else ""
+        lines = []
+        def family(name: str, kind: str, help_: str):
+            lines.extend([f"# HELP {prefix}{name} {help_}", f"# TYPE {prefix}{name} {kind}"])
+        d = self.to_dict()
+        family("run_wall_seconds", "gauge", "Wall time of the run so far.")
+        lines.append(f"{prefix}run_wall_seconds {d['wall_s']}")
+        family("peak_rss_megabytes", "gauge", "Peak resident set size of the process.")
+        lines.append(f"{prefix}peak_rss_megabytes {d['peak_rss_mb']}")
+        stages: Dict[Labels, Dict[str, float]] = {}
+        for s in d["stages"]:
+            agg = stages.setdefault(_labels({"stage": s["name"], **s["labels"]}), {})
+            for k in ("wall_s", "rows_in", "rows_out"):
+                if s[k] is not None:
+                    agg[k] = agg.get(k, 0) + s[k]
+        for key, name, help_ in (("wall_s", "stage_wall_seconds", "Wall time spent in a pipeline stage."),
+                                 ("rows_in", "stage_rows_in", "Rows entering a pipeline stage."),
+                                 ("rows_out", "stage_rows_out", "Rows leaving a pipeline stage.")):
+            series = [(labels, agg[key]) for labels, agg in stages.items() if key in agg]
+            if series:
+                family(name, "gauge", help_)
+                lines.extend(f"{prefix}{name}{fmt(dict(labels))} {round(v, 4)}" for labels, v in series)
+        seen = set()
+        for c in d["counters"]:
+            if c["name"] not in seen:
+                seen.add(c["name"])
+                family(c["name"], "counter", c["name"].replace("_", " ") + ".")
+            lines.append(f"{prefix}{c['name']}{fmt(c['labels'])} {c['value']}")
+        for h in d["histograms"]:
+            if h["name"] not in seen:
+                seen.add(h["name"])
+                family(h["name"], "histogram", h["name"].replace("_", " ") + ".")
+            cum = 0
+            for bound, n in h["buckets"].items():
+                cum += n
+                le = 'le="%s"' % bound
+                lines.append(f"{prefix}{h['name']}_bucket{fmt(h['labels'], le)} {cum}")
+            lines.append(f"{prefix}{h['name']}_sum{fmt(h['labels'])} {h['sum']}")
+            lines.append(f"{prefix}{h['name']}_count{fmt(h['labels'])} {h['count']}")
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text("\n".join(lines) + "\n")
+
+PROFILE = RunProfile()
+
+def reset() -> RunProfile:
+    """Clear the process-wide profile in place (for runs started from a long-lived process)."""
+    PROFILE.__init__()
+    return PROFILE
@@ -1,7 +1,22 @@
 from __future__ import annotations
-import re
-import phonenumbers
-import tldextract
+import re, json, logging
+from collections import OrderedDict
+from functools import lru_cache
+from pathlib import Path
+from typing import Callable, Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+# phonenumbers and tldextract are imported on first use: a run whose values
+# all come from the NormalizeMemo never loads them.
+
+@lru_cache(maxsize=None)
+def tld_extractor():
+    """tldextract over its bundled public-suffix snapshot: no network fetch,
+    no dependence on a writable cache directory."""
+    import tldextract
+    return tldextract.TLDExtract(suffix_list_urls=(), cache_dir=None)
 
 def normalize_name(name: str) -> str:
     if not isinstance(name, str): return ''
@@ -11,6 +26,7 @@ def normalize_name(name: str) -> str:
 
 def to_e164(phone: str) -> str:
     if not isinstance(phone, str) or not phone.strip(): return ''
+    import phonenumbers
     try:
         num = phonenumbers.parse(phone, 'US')
         if phonenumbers.is_valid_number(num):
@@ -21,6 +37,64 @@ def to_e164(phone: str) -> str:
 
 def root_domain(url: str) -> str:
     if not isinstance(url, str) or not url.strip(): return ''
-    ext = tldextract.extract(url if '://' in url else f'https://{url}')
+    ext = tld_extractor()(url if '://' in url else f'https://{url}')
     if not ext.registered_domain: return ''
-    return ext.registered_domain.lower()
\ No newline at end of file
+    return ext.registered_domain.lower()
+
+class NormalizeMemo:
+    """Bounded memo of expensive normalizer results, persisted as JSON between runs.
+
+    One LRU table per kind ("phone", "domain"); each keeps at most
+    `max_entries` values, dropping the least recently used on save.
+    """
+    def __init__(self, path: str|Path|None = None, max_entries: int = 500_000):
+        self.path = Path(path) if path else None
+        self.max_entries = max_entries
+        self.tables: Dict[str, OrderedDict] = {}
+        self.hits = self.misses = 0
+        if self.path and self.path.exists():
+            try:
+                with open(self.path) as f:
+                    self.tables = {k: OrderedDict(v) for k, v in json.load(f).items()}
+            except Exception as e:
+                logging.warning("Ignoring unreadable normalize memo %s: %s", self.path, e)
+
+    def lookup(self, kind: str, values, fn: Callable[[str], str]) -> list:
+        table = self.tables.setdefault(kind, OrderedDict())
+        out = []
+        for v in values:
+            if v in table:
+                table.move_to_end(v)
+                self.hits += 1
+            else:
+                table[v] = fn(v)
+                self.misses += 1
+            out.append(table[v])
+        return out
+
+    def save(self):
+        if not self.path:
+            return
+        for table in self.tables.values():
+            while len(table) > self.max_entries:
+                table.popitem(last=False)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_suffix(self.path.suffix + ".tmp")
+        with open(tmp, "w") as f:
+            json.dump(self.tables, f)
+        tmp.replace(self.path)
+
+def normalize_unique(s: pd.Series, fn: Callable[[str], str], memo: Optional[NormalizeMemo] = None,
+                     kind: str = "") -> pd.Series:
+    """`s.map(fn)`, but fn runs once per distinct value (and once per run with a memo)."""
+    codes, uniques = pd.factorize(s)
+    # only string inputs are memoized; everything else normalizes to '' anyway
+    keys = [u if isinstance(u, str) else None for u in uniques]
+    if memo is not None and kind:
+        str_keys = [k for k in keys if k is not None]
+        done = dict(zip(str_keys, memo.lookup(kind, str_keys, fn)))
+        results = [done[k] if k is not None else fn(u) for k, u in zip(keys, uniques)]
+    else:
+        results = [fn(u) for u in uniques]
+    lookup = np.array(results + [fn(None)], dtype=object)
+    return pd.Series(lookup[codes], index=s.index)
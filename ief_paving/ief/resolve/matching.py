@@ -1,4 +1,8 @@
 from __future__ import annotations
+import re
+from typing import Iterator, List, Sequence, Tuple
+
+import numpy as np
 import pandas as pd
 
 def simple_dedupe(df: pd.DataFrame) -> pd.DataFrame:
@@ -11,4 +15,231 @@ def simple_dedupe(df: pd.DataFrame) -> pd.DataFrame:
     df = df.sort_values(by=['phone', 'website_root'], ascending=False)
     deduped = df.drop_duplicates(subset=['__key', 'name'], keep='first')
     deduped = deduped.drop(columns='__key', errors='ignore')
-    return deduped
\ No newline at end of file
+    return deduped
+
+# Tokens too generic to say two contractors are the same business.
+NAME_STOPWORDS = {
+    "inc", "llc", "ltd", "co", "corp", "corporation", "company", "the", "and", "of", "dba",
+    "paving", "asphalt", "concrete", "construction", "contractors", "contracting", "services", "service",
+}
+FINGERPRINT_COLS = ["source_name", "name", "phone", "website_root", "postal_code", "address"]
+COALESCE_COLS = ["phone", "website", "website_root", "address", "city", "state", "postal_code"]
+REP_COMPLETENESS_COLS = ["phone", "website_root", "postal_code", "address", "name"]
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+# Rows whose non-empty values differ here are different businesses, whatever their names.
+VETO_COLS = ["phone", "website_root"]
+
+class UnionFind:
+    """Union-find where the smaller root wins. With `keys` (one array per veto
+    column), each cluster holds at most one non-empty value per key: a union of
+    clusters with different values is refused."""
+    def __init__(self, n: int, keys: Sequence[Sequence[str]] = ()):
+        self.parent = list(range(n))
+        self.keys = [list(k) for k in keys]  # indexed by root
+
+    def find(self, x: int) -> int:
+        parent = self.parent
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    def union(self, a: int, b: int) -> bool:
+        """Merge the clusters of a and b; False if a veto key conflicts."""
+        ra, rb = self.find(a), self.find(b)
+        if ra == rb:
+            return True
+        for vals in self.keys:
+            if vals[ra] and vals[rb] and vals[ra] != vals[rb]:
+                return False
+        # smaller root wins so labels don't depend on pair order
+        if rb < ra:
+            ra, rb = rb, ra
+        self.parent[rb] = ra
+        for vals in self.keys:
+            vals[ra] = vals[ra] or vals[rb]
+        return True
+
+def match_key(name: str) -> str:
+    """Lower-cased name tokens without corporate suffixes, used for fuzzy scoring."""
+    toks = _TOKEN_RE.findall(name.lower()) if isinstance(name, str) else []
+    return " ".join(t for t in toks if t not in {"inc", "llc", "ltd", "co", "corp", "the", "dba"})
+
+def _col(df: pd.DataFrame, col: str) -> pd.Series:
+    if col not in df.columns:
+        return pd.Series("", index=df.index, dtype=object)
+    return df[col].astype(object).fillna("").astype(str)
+
+def _windows(positions: np.ndarray, keys: np.ndarray, max_block: int) -> Iterator[np.ndarray]:
+    """Split an oversized block into overlapping windows over name order (sorted neighbourhood)."""
+    if len(positions) <= max_block:
+        yield positions
+        return
+    ordered = positions[np.argsort(keys[positions], kind="stable")]
+    step = max(max_block // 2, 1)
+    for start in range(0, len(ordered) - step, step):
+        yield ordered[start:start + max_block]
+
+def _blocks(keyed: pd.Series, max_block: int, names: np.ndarray) -> Iterator[np.ndarray]:
+    keyed = keyed[keyed != ""]
+    if keyed.empty:
+        return
+    for positions in keyed.groupby(keyed, sort=False).indices.values():
+        if len(positions) > 1:
+            yield from _windows(keyed.index.to_numpy()[positions], names, max_block)
+
+def _token_blocks(names: np.ndarray, regions: np.ndarray, max_block: int, max_token_freq: int) -> Iterator[np.ndarray]:
+    """Rows sharing a distinctive name token within one region (rows with a None region are skipped)."""
+    tok_rows = [(t, regions[i], i) for i, n in enumerate(names) if regions[i] is not None
+                for t in set(n.split()) if len(t) >= 3 and t not in NAME_STOPWORDS]
+    if not tok_rows:
+        return
+    toks = pd.DataFrame(tok_rows, columns=["tok", "region", "row"])
+    # a token shared by thousands of rows carries no identity signal, in any one region either
+    toks = toks[toks["tok"].map(toks["tok"].value_counts()) <= max_token_freq]
+    rows = toks["row"].to_numpy()
+    for positions in toks.groupby(["tok", "region"], sort=False).indices.values():
+        if len(positions) > 1:
+            yield from _windows(rows[positions], names, max_block)
+
+def _match_block(names: np.ndarray, block: np.ndarray, cutoff: float,
+                 empty_matches: bool) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Candidate pairs (a, b, score) in a block whose names score >= cutoff."""
+    from rapidfuzz import fuzz, process
+    block_names = names[block]
+    scores = process.cdist(block_names, block_names, scorer=fuzz.token_sort_ratio,
+                           score_cutoff=cutoff, dtype=np.uint8)
+    ii, jj = np.nonzero(np.triu(scores, 1))
+    a, b, sc = block[ii], block[jj], scores[ii, jj]
+    if empty_matches:
+        # a shared phone/website with no usable name on one side is still the same
+        # business; scored 0 so these merge after every named match
+        empty = np.flatnonzero(block_names == "")
+        if len(empty):
+            ei, ej = np.meshgrid(empty, np.arange(len(block)), indexing="ij")
+            keep = (ei != ej).ravel()
+            a = np.concatenate([a, block[ei.ravel()[keep]]])
+            b = np.concatenate([b, block[ej.ravel()[keep]]])
+            sc = np.concatenate([sc, np.zeros(int(keep.sum()), dtype=np.uint8)])
+    return a, b, sc
+
+def _geo_pairs(df: pd.DataFrame, names: np.ndarray, radius_m: float) -> Tuple[np.ndarray, np.ndarray]:
+    """Pairs of rows within `radius_m` of each other that share a distinctive name token."""
+    from .spatial import GridIndex
+    lat = pd.to_numeric(df["lat"], errors="coerce").to_numpy(dtype=float)
+    lon = pd.to_numeric(df["lon"], errors="coerce").to_numpy(dtype=float)
+    ii, jj = GridIndex(lat, lon, cell_m=max(radius_m, 50.0)).pairs_within(radius_m)
+    if len(ii) == 0:
+        return ii, jj
+    toks = {}
+    for i in np.unique(np.concatenate([ii, jj])):
+        toks[i] = {t for t in names[i].split() if len(t) >= 3 and t not in NAME_STOPWORDS}
+    keep = np.fromiter((not toks[a].isdisjoint(toks[b]) for a, b in zip(ii, jj)), dtype=bool, count=len(ii))
+    return ii[keep], jj[keep]
+
+def _fingerprints(df: pd.DataFrame) -> np.ndarray:
+    return pd.util.hash_pandas_object(pd.DataFrame({c: _col(df, c) for c in FINGERPRINT_COLS}), index=False).to_numpy()
+
+def cluster_ids(df: pd.DataFrame, labels: np.ndarray) -> np.ndarray:
+    """Stable id per cluster: the smallest content hash among its members."""
+    fp = _fingerprints(df)
+    smallest = pd.Series(fp).groupby(labels).transform("min").to_numpy()
+    return np.array([f"c{v:016x}" for v in smallest], dtype=object)
+
+def resolve_entities(df: pd.DataFrame, name_threshold: float = 88, key_name_threshold: float = 60,
+                     max_block: int = 200, max_token_freq: int = 5000,
+                     geo_radius_m: float = 250) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """Fuzzy entity resolution with blocking and union-find clustering.
+
+    Candidate pairs only come from blocks: rows sharing a phone or website root
+    merge if their names score >= `key_name_threshold`; rows sharing a postal
+    code, or a distinctive name token within the same state or 3-digit postal
+    prefix, need >= `name_threshold`. Blocks larger
+    than `max_block` are scanned as overlapping windows in name order, so the
+    work stays roughly linear in the number of rows. When rows carry `lat`/`lon`,
+    rows within `geo_radius_m` that share a distinctive name token are also
+    compared, at `key_name_threshold` (0 turns this off).
+
+    Rows with different non-empty phones or website roots are never merged,
+    directly or through other rows. Pairs are merged best score first.
+
+    Nothing depends on row order: rows are processed sorted by `evidence_id`
+    (a content hash of the FINGERPRINT_COLS when absent). The representative
+    is the most complete member, then the best fit score, then the lowest
+    `evidence_id`; its blank COALESCE_COLS take the first non-blank value in
+    that same member ranking. EntityStore's `entities` view follows the same
+    rules in SQL.
+
+    Returns (entities, members): one representative row per cluster with
+    `cluster_id`, `member_count` and `sources`, and every input row tagged
+    with its `cluster_id`.
+    """
+    df = df.reset_index(drop=True)
+    n = len(df)
+    if n == 0:
+        empty = df.assign(cluster_id=pd.Series(dtype=object))
+        return empty.assign(member_count=pd.Series(dtype=int), sources=pd.Series(dtype=object)), empty
+    if "evidence_id" in df.columns:
+        tie = _col(df, "evidence_id").to_numpy()
+    else:
+        tie = np.array([f"{v:016x}" for v in _fingerprints(df)], dtype=object)
+    perm = np.argsort(tie, kind="stable")
+    df = df.iloc[perm].reset_index(drop=True)
+    names = np.array([match_key(x) for x in _col(df, "name")], dtype=object)
+    pairs = []
+    for col in ["phone", "website_root"]:
+        for block in _blocks(_col(df, col), max_block, names):
+            pairs.append(_match_block(names, block, key_name_threshold, empty_matches=True))
+    named = pd.Series(names != "", index=df.index)
+    postal = _col(df, "postal_code")
+    for block in _blocks(postal.where(named, ""), max_block, names):
+        pairs.append(_match_block(names, block, name_threshold, empty_matches=False))
+    # name-only matches stay within a state, or within a 3-digit postal prefix
+    state = _col(df, "state")
+    for regions in (state.where(state != "", None).to_numpy(), postal.str[:3].where(postal != "", None).to_numpy()):
+        for block in _token_blocks(names, regions, max_block, max_token_freq):
+            pairs.append(_match_block(names, block, name_threshold, empty_matches=False))
+    if geo_radius_m > 0 and {"lat", "lon"} <= set(df.columns):
+        ii, jj = _geo_pairs(df, names, geo_radius_m)
+        from rapidfuzz import fuzz, process
+        scores = process.cpdist(names[ii], names[jj], scorer=fuzz.token_sort_ratio, score_cutoff=key_name_threshold)
+        keep = scores > 0
+        pairs.append((ii[keep], jj[keep], scores[keep].astype(np.uint8)))
+
+    uf = UnionFind(n, [_col(df, c).tolist() for c in VETO_COLS])
+    if pairs:
+        a, b, sc = (np.concatenate(x) for x in zip(*pairs))
+        # rows are in canonical order, so positions break score ties deterministically
+        for k in np.lexsort((np.maximum(a, b), np.minimum(a, b), -sc.astype(np.int16))):
+            uf.union(int(a[k]), int(b[k]))
+
+    labels = np.array([uf.find(i) for i in range(n)])
+    members = df.copy()
+    members["cluster_id"] = cluster_ids(df, labels)
+
+    # representative: most complete row, then best fit score, then canonical order
+    completeness = sum((_col(df, c) != "").astype(int) for c in REP_COMPLETENESS_COLS)
+    fit = df["market_fit_score"] if "market_fit_score" in df.columns else pd.Series(0.0, index=df.index)
+    order = pd.DataFrame({"cluster_id": members["cluster_id"], "c": completeness, "f": fit}) \
+        .sort_values(["cluster_id", "c", "f"], ascending=[True, False, False], kind="stable")
+    entities = members.loc[order.drop_duplicates("cluster_id").index].set_index("cluster_id")
+    ranked = members.loc[order.index]
+    for c in COALESCE_COLS:
+        if c in members.columns:
+            fill = ranked[c].where(_col(ranked, c) != "").groupby(ranked["cluster_id"]).first().reindex(entities.index)
+            entities[c] = entities[c].where((_col(entities, c) != "") | fill.isna(), fill)
+    cid = members["cluster_id"]
+    if "has_dot_flag" in members.columns:
+        entities["has_dot_flag"] = members["has_dot_flag"].eq(True).groupby(cid).any()
+    entities["member_count"] = cid.value_counts()
+    # source names are few, so build the "a,b,c" list one source at a time instead of per cluster
+    src = _col(members, "source_name")
+    sources = pd.Series("", index=entities.index, dtype=object)
+    for name in sorted(set(src) - {""}):
+        present = src.eq(name).groupby(cid).any().reindex(entities.index, fill_value=False)
+        sources = sources.where(~present, sources + name + ",")
+    entities["sources"] = sources.str.rstrip(",")
+    # members back in input order
+    members.index = perm
+    return entities.reset_index(), members.sort_index()
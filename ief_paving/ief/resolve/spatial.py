@@ -0,0 +1,209 @@
+from __future__ import annotations
+import math
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+EARTH_RADIUS_M = 6_371_000.0
+M_PER_DEG_LAT = 111_320.0
+
+def haversine_m(lat1, lon1, lat2, lon2) -> np.ndarray:
+    lat1, lon1, lat2, lon2 = (np.radians(np.asarray(x, dtype=float)) for x in (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+def _lat_reach_deg(radius_m: float) -> float:
+    """Largest latitude difference between two points `radius_m` apart."""
+    return math.degrees(radius_m / EARTH_RADIUS_M)
+
+def _lon_reach_deg(radius_m: float, max_abs_lat: float) -> float:
+    """Largest longitude difference between two points `radius_m` apart when
+    neither is further than `max_abs_lat` from the equator (180 = any)."""
+    cos = math.cos(math.radians(min(max_abs_lat, 90.0)))
+    s = math.sin(min(radius_m / (2 * EARTH_RADIUS_M), math.pi / 2))
+    if s >= cos:
+        return 180.0
+    return math.degrees(2 * math.asin(s / cos))
+
+class GridIndex:
+    """Uniform lat/lon grid over points, for radius queries and proximity pairs.
+
+    Cells are about `cell_m` wide at the highest latitude present (longitude
+    spacing is set there) and columns run all the way round, so neighbours
+    across the antimeridian are adjacent cells. How many rows and columns a
+    search spans comes from the haversine distance itself: columns widen
+    towards the poles, and a search reaching over a pole covers the whole
+    row. Points are kept sorted by cell code, so each run of neighbouring
+    cells in a row is one binary search. Rows with missing coordinates are
+    never indexed.
+    """
+    def __init__(self, lats, lons, cell_m: float = 500.0):
+        self.lats = np.asarray(lats, dtype=float)
+        self.lons = np.asarray(lons, dtype=float)
+        self.cell_m = cell_m
+        ok = np.isfinite(self.lats) & np.isfinite(self.lons)
+        self.max_lat = float(np.abs(self.lats[ok]).max()) if ok.any() else 0.0
+        # a hair wider than `cell_m` reaches, so a radius of `cell_m` spans one cell each way
+        self.dlat = _lat_reach_deg(cell_m) * (1 + 1e-6)
+        dlon = _lon_reach_deg(cell_m, min(self.max_lat, 89.0)) * (1 + 1e-6)
+        # equal columns all the way round, so the antimeridian is an ordinary boundary
+        self.width = max(int(360.0 // dlon), 1)
+        self.dlon = 360.0 / self.width
+        idx = np.flatnonzero(ok)
+        cy = self._row(self.lats[idx])
+        cx = self._col(self.lons[idx])
+        self.y0 = int(cy.min()) if len(idx) else 0
+        self.height = int(cy.max()) - self.y0 + 1 if len(idx) else 0
+        codes = (cy - self.y0) * self.width + cx
+        order = np.argsort(codes, kind="stable")
+        self.index = idx[order]
+        self.codes = codes[order]
+
+    def _row(self, lat):
+        return np.floor((np.asarray(lat, dtype=float) + 90.0) / self.dlat).astype(np.int64)
+
+    def _col(self, lon):
+        return np.floor((np.asarray(lon, dtype=float) + 180.0) / self.dlon).astype(np.int64) % self.width
+
+    def _col_reach(self, radius_m: float, max_abs_lat) -> np.ndarray:
+        """Columns either side of a point's own that can hold points within `radius_m`."""
+        cos = np.cos(np.radians(np.minimum(np.atleast_1d(np.asarray(max_abs_lat, dtype=float)), 90.0)))
+        s = math.sin(min(radius_m / (2 * EARTH_RADIUS_M), math.pi / 2))
+        # same bound as _lon_reach_deg, for many latitudes at once
+        with np.errstate(divide="ignore", invalid="ignore"):
+            reach = np.where(s >= cos, 180.0, np.degrees(2 * np.arcsin(np.minimum(s / cos, 1.0))))
+        return np.minimum(np.ceil(reach / self.dlon).astype(np.int64), self.width)
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def query_radius(self, lat: float, lon: float, radius_m: float) -> np.ndarray:
+        """Indices of points within `radius_m` of (lat, lon)."""
+        reach = _lat_reach_deg(radius_m)
+        y_lo = max(math.floor((max(lat - reach, -90.0) + 90.0) / self.dlat) - self.y0, 0)
+        y_hi = min(math.floor((min(lat + reach, 90.0) + 90.0) / self.dlat) - self.y0, self.height - 1)
+        kx = min(math.ceil(_lon_reach_deg(radius_m, max(abs(lat), min(abs(lat) + reach, self.max_lat))) / self.dlon),
+                 self.width)
+        cx = math.floor((lon + 180.0) / self.dlon) % self.width
+        if 2 * kx + 1 >= self.width:
+            spans = [(0, self.width - 1)]
+        elif cx - kx < 0:
+            spans = [(cx - kx + self.width, self.width - 1), (0, cx + kx)]
+        elif cx + kx >= self.width:
+            spans = [(cx - kx, self.width - 1), (0, cx + kx - self.width)]
+        else:
+            spans = [(cx - kx, cx + kx)]
+        found = []
+        for y in range(y_lo, y_hi + 1):
+            for x_lo, x_hi in spans:
+                lo, hi = np.searchsorted(self.codes, [y * self.width + x_lo, y * self.width + x_hi + 1])
+                if hi > lo:
+                    found.append(self.index[lo:hi])
+        if not found:
+            return np.array([], dtype=np.int64)
+        cand = np.concatenate(found)
+        return cand[haversine_m(lat, lon, self.lats[cand], self.lons[cand]) <= radius_m]
+
+    def pairs_within(self, radius_m: float) -> Tuple[np.ndarray, np.ndarray]:
+        """All index pairs (i < j) closer than `radius_m`.
+
+        Vectorized per cell offset over half the neighbourhood (later rows, or
+        the same row and later columns), so each cell pair is visited once;
+        each point only takes the column offsets its own latitude needs.
+        """
+        reach = _lat_reach_deg(radius_m)
+        ky = int(math.ceil(reach / self.dlat))
+        cy, cx = np.divmod(self.codes, self.width)
+        kx = self._col_reach(radius_m, np.minimum(np.abs(self.lats[self.index]) + reach, self.max_lat)) \
+            if len(self.codes) else np.zeros(0, dtype=np.int64)
+        kmax = int(kx.max()) if len(kx) else 0
+        # offsets beyond half the row wrap onto ones already visited
+        half = self.width // 2
+        wraps = kmax >= half
+        pos = np.arange(len(self.codes))
+        ii: List[np.ndarray] = []
+        jj: List[np.ndarray] = []
+        for dy in range(0, ky + 1):
+            for dx in range(-min(kmax, half), min(kmax, half) + 1):
+                if dy == 0 and dx < 0:
+                    continue
+                ok = (cy + dy < self.height) & (np.abs(dx) <= kx)
+                target = (cy + dy) * self.width + (cx + dx) % self.width
+                lo = np.searchsorted(self.codes, target, side="left")
+                hi = np.searchsorted(self.codes, target, side="right")
+                if dy == 0 and dx == 0:
+                    lo = np.maximum(lo, pos + 1)  # same cell: only later points
+                counts = np.where(ok, np.maximum(hi - lo, 0), 0)
+                total = int(counts.sum())
+                if not total:
+                    continue
+                a = np.repeat(pos, counts)
+                # b runs lo[a]..hi[a]-1 for each a
+                b = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts) + np.repeat(lo, counts)
+                i, j = self.index[a], self.index[b]
+                keep = haversine_m(self.lats[i], self.lons[i], self.lats[j], self.lons[j]) <= radius_m
+                ii.append(i[keep])
+                jj.append(j[keep])
+        if not ii:
+            return np.array([], dtype=np.int64), np.array([], dtype=np.int64)
+        i, j = np.concatenate(ii), np.concatenate(jj)
+        i, j = np.minimum(i, j), np.maximum(i, j)
+        if wraps:
+            # rows narrow enough to wrap can reach the same cell pair both ways round
+            i, j = np.unique(np.stack([i, j]), axis=1)
+        return i, j
+
+# Simplified state outlines as (lon, lat) rings, accurate to roughly 0.1 deg
+# along land borders and to about a kilometre along the border rivers where
+# towns face each other (Rio Grande, Menominee, Montreal, St Marys); see
+# tests/test_spatial.py. Water boundaries are drawn generously offshore so
+# coastal and island businesses stay in. Michigan is one ring around both
+# peninsulas (the lakes between them hold no POIs).
+STATE_POLYGONS: Dict[str, List[List[Tuple[float, float]]]] = {
+    "CO": [[(-109.06, 36.99), (-102.04, 36.99), (-102.04, 41.00), (-109.06, 41.00)]],
+    "TX": [[(-103.04, 36.50), (-100.00, 36.50), (-100.00, 34.56), (-99.20, 34.37), (-98.10, 34.13),
+            (-96.90, 33.95), (-95.80, 33.86), (-94.48, 33.64), (-94.04, 33.55), (-94.04, 32.00),
+            (-93.82, 31.55), (-93.56, 31.00), (-93.73, 30.30), (-93.70, 29.50), (-94.70, 29.00),
+            (-96.30, 28.00), (-97.00, 27.00), (-97.00, 25.96), (-97.15, 25.95), (-97.45, 25.89),
+            (-97.50, 25.895), (-97.56, 25.93), (-97.74, 26.04), (-97.95, 26.06), (-98.20, 26.06), (-98.27, 26.09),
+            (-98.40, 26.17), (-98.82, 26.36), (-99.02, 26.40), (-99.17, 26.56), (-99.30, 26.90), (-99.45, 27.30),
+            (-99.51, 27.50), (-99.74, 27.70), (-100.30, 28.27), (-100.70, 29.10), (-101.40, 29.77),
+            (-102.40, 29.78), (-102.70, 29.60), (-103.10, 28.98), (-103.60, 29.16), (-104.38, 29.52),
+            (-104.50, 29.64), (-104.70, 30.20), (-105.00, 30.68), (-105.60, 31.08), (-105.85, 31.26),
+            (-106.07, 31.40), (-106.16, 31.44), (-106.27, 31.55), (-106.34, 31.66), (-106.40, 31.73),
+            (-106.45, 31.764), (-106.487, 31.747), (-106.52, 31.76), (-106.545, 31.80), (-106.57, 31.88),
+            (-106.63, 32.00), (-103.06, 32.00)]],
+    "MI": [[(-86.82, 41.76), (-84.81, 41.70), (-83.45, 41.73), (-83.15, 42.05), (-83.12, 42.25),
+            (-83.00, 42.32), (-82.90, 42.36), (-82.45, 42.60), (-82.40, 43.00), (-82.10, 43.60),
+            (-82.30, 44.50), (-82.70, 45.30),
+            (-83.50, 45.95), (-83.95, 46.10), (-84.05, 46.30), (-84.10, 46.48), (-84.25, 46.50),
+            (-84.36, 46.505), (-84.60, 46.60), (-84.80, 46.95), (-86.00, 47.40),
+            (-88.40, 48.30), (-89.50, 48.05), (-90.42, 46.90), (-90.42, 46.57), (-90.18, 46.452),
+            (-90.04, 46.34), (-89.10, 46.14), (-88.70, 46.02), (-88.40, 45.98), (-88.25, 45.96), (-88.13, 45.94),
+            (-88.12, 45.83), (-88.11, 45.77), (-88.00, 45.785), (-87.88, 45.76), (-87.82, 45.62), (-87.80, 45.45),
+            (-87.70, 45.25), (-87.66, 45.13), (-87.59, 45.09), (-87.30, 45.25), (-86.80, 45.45),
+            (-86.90, 44.80), (-87.00, 43.00), (-87.20, 42.50), (-87.02, 41.76)]],
+}
+
+def points_in_polygon(lats, lons, ring: List[Tuple[float, float]]) -> np.ndarray:
+    """Even-odd ray casting for many points against one (lon, lat) ring."""
+    x, y = np.asarray(lons, dtype=float), np.asarray(lats, dtype=float)
+    inside = np.zeros(len(x), dtype=bool)
+    pts = np.asarray(ring, dtype=float)
+    for (x1, y1), (x2, y2) in zip(pts, np.roll(pts, -1, axis=0)):
+        if y1 == y2:
+            continue
+        crosses = (y1 > y) != (y2 > y)
+        xint = x1 + (y - y1) * (x2 - x1) / (y2 - y1)
+        inside ^= crosses & (x < xint)
+    return inside
+
+def in_state(lats, lons, state: str) -> np.ndarray:
+    """True where the point lies in the state's outline (or the state has no outline)."""
+    lats = np.asarray(lats, dtype=float)
+    if state not in STATE_POLYGONS:
+        return np.ones(len(lats), dtype=bool)
+    out = np.zeros(len(lats), dtype=bool)
+    for ring in STATE_POLYGONS[state]:
+        out |= points_in_polygon(lats, lons, ring)
+    return out
@@ -0,0 +1,90 @@
+from __future__ import annotations
+from typing import Dict
+
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+# One typed layout for evidence rows, applied where each ingestor hands rows
+# to the pipeline. Low-cardinality text is categorical (dictionary-encoded in
+# Arrow/Parquet), free text uses Arrow-backed strings, so a million rows cost
+# tens of MB instead of hundreds. Kinds match ParquetAppender's column types.
+EVIDENCE_SCHEMA: Dict[str, str] = {
+    "source_name": "category",
+    "state": "category",
+    "name": "string",
+    "address": "string",
+    "city": "category",
+    "postal_code": "string",
+    "phone": "string",
+    "website": "string",
+    "work_types": "category",
+    "lat": "float",
+    "lon": "float",
+    "has_dot_flag": "bool",
+}
+# hive partition keys of the evidence dataset, outermost first
+EVIDENCE_PARTITIONS = ["run_date", "state", "source_name"]
+# published entity columns, in order, for every resolution path (in memory,
+# --store, --delta-dir)
+ENTITY_COLUMNS = ["cluster_id", *EVIDENCE_SCHEMA, "website_root", "market_fit_score", "fit_label",
+                  "member_count", "sources"]
+
+def pandas_dtype(kind: str):
+    return {"category": "category", "string": pd.StringDtype("pyarrow"), "float": "float64",
+            "bool": "bool", "int": "int64"}[kind]
+
+def _as_text(s: pd.Series) -> pd.Series:
+    # numbers from spreadsheets become their str(); nulls stay null
+    s = s.astype(object)
+    return s.where(s.isna(), s.astype(str))
+
+def as_evidence(df: pd.DataFrame, **constants) -> pd.DataFrame:
+    """`df` with exactly the EVIDENCE_SCHEMA columns, in order and typed.
+
+    Missing columns become nulls (False for flags), extra columns are
+    dropped; `constants` fill whole columns, e.g. `has_dot_flag=True`.
+    Idempotent, so it also re-types frames whose categories were lost in a
+    concat of differently-categorized parts.
+    """
+    out = {}
+    for col, kind in EVIDENCE_SCHEMA.items():
+        if col in constants:
+            s = pd.Series(constants[col], index=df.index)
+        elif col in df.columns:
+            s = df[col]
+        else:
+            s = pd.Series(None, index=df.index, dtype=object)
+        if kind == "bool":
+            s = s.eq(True) if s.dtype != bool else s
+        elif kind == "float":
+            s = pd.to_numeric(s, errors="coerce").astype("float64")
+        elif s.dtype != pandas_dtype(kind):
+            s = _as_text(s).astype(pandas_dtype(kind))
+        out[col] = s
+    return pd.DataFrame(out, index=df.index)
+
+def concat_evidence(frames) -> pd.DataFrame:
+    """`as_evidence` frames stacked into one. Column by column with categories
+    unioned, so empty or all-null parts don't sway the result dtypes (which
+    pandas' concat is deprecating)."""
+    frames = [as_evidence(f) for f in frames if len(f)]
+    if not frames:
+        return as_evidence(pd.DataFrame())
+    out = {}
+    for col, kind in EVIDENCE_SCHEMA.items():
+        parts = [f[col] for f in frames]
+        if kind == "category":
+            out[col] = pd.Series(union_categoricals(parts, ignore_order=True))
+        else:
+            out[col] = pd.concat(parts, ignore_index=True)
+    return pd.DataFrame(out)
+
+def memory_report(before: pd.DataFrame, after: pd.DataFrame) -> pd.DataFrame:
+    """Per-column deep memory (MB) and dtype of two versions of the same frame, plus a total row."""
+    cols = [c for c in after.columns if c in before.columns]
+    mb = lambda df: df[cols].memory_usage(deep=True, index=False) / 2**20
+    rep = pd.DataFrame({"dtype_before": before[cols].dtypes.astype(str), "mb_before": mb(before),
+                        "dtype_after": after[cols].dtypes.astype(str), "mb_after": mb(after)})
+    rep.loc["total"] = ["", rep["mb_before"].sum(), "", rep["mb_after"].sum()]
+    rep["ratio"] = rep["mb_before"] / rep["mb_after"].where(rep["mb_after"] > 0)
+    return rep.round(2)
@@ -1,4 +1,5 @@
 from __future__ import annotations
+import logging
 import pandas as pd
 from pathlib import Path
 
@@ -8,4 +9,303 @@ def write_csv(df: pd.DataFrame, path: str|Path):
 
 def write_parquet(df: pd.DataFrame, path: str|Path):
     Path(path).parent.mkdir(parents=True, exist_ok=True)
-    df.to_parquet(path, index=False)
\ No newline at end of file
+    df.to_parquet(path, index=False)
+
+
+def arrow_schema(columns: dict):
+    """pyarrow schema for a column -> kind mapping (see ParquetAppender)."""
+    import pyarrow as pa
+    types = {"string": pa.string(), "category": pa.dictionary(pa.int32(), pa.string()),
+             "bool": pa.bool_(), "float": pa.float64(), "int": pa.int64()}
+    return pa.schema([(c, types[t]) for c, t in columns.items()])
+
+class ParquetAppender:
+    """Append DataFrame batches to one Parquet file with a fixed schema.
+
+    `columns` maps column name -> "string" | "category" | "bool" | "float" | "int"; missing
+    columns are written as nulls and extra ones dropped, so batches from
+    different sources can share a file.
+    """
+    def __init__(self, path: str|Path, columns: dict, row_group_size: int = 128_000):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.columns = columns
+        self.schema = arrow_schema(columns)
+        self.row_group_size = row_group_size
+        self.rows = 0
+        self._writer = None
+
+    def write(self, df: pd.DataFrame):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        data = {}
+        for c, t in self.columns.items():
+            col = df[c] if c in df.columns else pd.Series(None, index=df.index, dtype=object)
+            if t in ("string", "category") and not isinstance(col.dtype, (pd.StringDtype, pd.CategoricalDtype)):
+                col = col.astype(object)
+                col = col.where(col.isna(), col.astype(str)).where(col.notna(), None)
+            elif t == "bool":
+                col = col.eq(True)
+            data[c] = col
+        table = pa.Table.from_pandas(pd.DataFrame(data, index=df.index), schema=self.schema, preserve_index=False)
+        if self._writer is None:
+            self._writer = pq.ParquetWriter(str(self.path), self.schema)
+        self._writer.write_table(table, row_group_size=self.row_group_size)
+        self.rows += len(df)
+
+    def close(self):
+        import pyarrow.parquet as pq
+        if self._writer is None:
+            # still leave a valid (empty) file behind
+            self._writer = pq.ParquetWriter(str(self.path), self.schema)
+        self._writer.close()
+
+class EvidenceDataset:
+    """Evidence batches as a hive-partitioned Parquet dataset: run_date=/state=/source_name=.
+
+    Batches are written to a staging directory under `root`; `close` swaps
+    each staged partition in, replacing that partition from an earlier run
+    the same day. Files are zstd-compressed with column statistics and rows
+    sorted by postal code within a partition, so readers (DuckDB
+    `read_parquet(..., hive_partitioning = true)`, pyarrow.dataset) skip
+    whole directories on state/source filters and row groups on ranges.
+    """
+    def __init__(self, root: str|Path, run_date: str|None = None, row_group_size: int = 128_000):
+        import datetime, uuid
+        from ief.schema import EVIDENCE_SCHEMA
+        self.root = Path(root)
+        self.run_date = run_date or datetime.date.today().isoformat()
+        self.staging = self.root / f"_staging-{uuid.uuid4().hex[:8]}"
+        self.row_group_size = row_group_size
+        self.columns = {"run_date": "string", **EVIDENCE_SCHEMA}
+        # every file gets the same types, whatever a batch's nulls would infer;
+        # partition keys are plain strings on disk (null -> __HIVE_DEFAULT_PARTITION__)
+        from ief.schema import EVIDENCE_PARTITIONS
+        self.schema = arrow_schema({c: "string" if c in EVIDENCE_PARTITIONS else t for c, t in self.columns.items()})
+        self.rows = 0
+        self._batches = 0
+
+    def write(self, df: pd.DataFrame):
+        import pyarrow as pa
+        import pyarrow.dataset as ds
+        from ief.schema import as_evidence, EVIDENCE_PARTITIONS
+        if df.empty:
+            return
+        typed = as_evidence(df).sort_values(["state", "source_name", "postal_code"], na_position="last")
+        typed.insert(0, "run_date", self.run_date)
+        for c in EVIDENCE_PARTITIONS:
+            typed[c] = typed[c].astype(object)
+        table = pa.Table.from_pandas(typed, schema=self.schema, preserve_index=False)
+        part_schema = pa.schema([self.schema.field(c) for c in EVIDENCE_PARTITIONS])
+        opts = ds.ParquetFileFormat().make_write_options(compression="zstd", write_statistics=True)
+        ds.write_dataset(table, self.staging, format="parquet", file_options=opts,
+                         partitioning=ds.partitioning(part_schema, flavor="hive"),
+                         basename_template=f"part-{self.staging.name[9:]}-{self._batches:05d}-{{i}}.parquet",
+                         existing_data_behavior="overwrite_or_ignore",
+                         min_rows_per_group=min(self.row_group_size, len(table)),
+                         max_rows_per_group=self.row_group_size)
+        self.rows += len(table)
+        self._batches += 1
+
+    def close(self) -> int:
+        """Swap staged partitions into place; returns how many were written."""
+        import shutil
+        parts = sorted(p.parent for p in self.staging.rglob("*.parquet"))
+        parts = list(dict.fromkeys(parts))
+        for part in parts:
+            dst = self.root / part.relative_to(self.staging)
+            if dst.exists():
+                shutil.rmtree(dst)
+            dst.parent.mkdir(parents=True, exist_ok=True)
+            part.rename(dst)
+        shutil.rmtree(self.staging, ignore_errors=True)
+        return len(parts)
+
+
+EVIDENCE_COLS = ["source_name", "state", "name", "address", "city", "postal_code", "phone", "website", "work_types"]
+
+def evidence_ids(df: pd.DataFrame) -> pd.Series:
+    """Content hash of an evidence row (source fields only), as 16 hex chars."""
+    cols = pd.DataFrame({c: df[c].astype(object).fillna("").astype(str) if c in df.columns else "" for c in EVIDENCE_COLS},
+                        index=df.index)
+    return pd.util.hash_pandas_object(cols, index=False).map("{:016x}".format)
+
+# whitespace as Python's str.isspace() sees it (RE2's \s is ASCII-only), so the
+# SQL name cleanup matches cleaning.normalize_name
+_SQL_WS = r"[\s\v\x{1c}-\x{1f}\x{85}\p{Z}]+"
+
+def _sql_any_contains(expr: str, terms) -> str:
+    terms = [t for t in terms if t]
+    if not terms:
+        return "FALSE"
+    return "(" + " OR ".join(f"contains({expr}, '{t.replace(chr(39), chr(39) * 2)}')" for t in terms) + ")"
+
+class EntityStore:
+    """Persistent DuckDB store for evidence, normalized rows and cluster membership.
+
+    Evidence is keyed by a content hash and upserted, so re-ingesting the same
+    rows only bumps `last_seen`. Normalization and classification run as SQL
+    over rows that have no normalized counterpart yet, and the `entities` view
+    picks one representative per cluster by the same rules as
+    `resolve_entities`, so `export` writes what the in-memory path writes. The config fingerprint the derived tables were built under
+    is kept in `meta`; see `check_config`.
+    """
+    def __init__(self, path: str|Path, memo=None):
+        import duckdb
+        from ief.normalize.cleaning import to_e164, root_domain, normalize_unique, NormalizeMemo
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.con = duckdb.connect(str(path))
+        # DuckDB calls UDFs one vector at a time; the memo carries results across vectors
+        self.memo = memo or NormalizeMemo()
+
+        # DuckDB may read a UDF's long strings straight from the returned Arrow
+        # buffers after the call, so results are kept alive until the statement ends
+        self._udf_results = []
+
+        def _arrow_udf(fn, kind):
+            import pyarrow as pa
+            def _run(arr):
+                out = pa.array(normalize_unique(arr.to_pandas(), fn, self.memo, kind).tolist(), type=pa.string())
+                self._udf_results.append(out)
+                return out
+            return _run
+        self.con.create_function("ief_e164", _arrow_udf(to_e164, "phone"), ["VARCHAR"], "VARCHAR", type="arrow")
+        self.con.create_function("ief_root_domain", _arrow_udf(root_domain, "domain"), ["VARCHAR"], "VARCHAR", type="arrow")
+        self.con.execute("""CREATE TABLE IF NOT EXISTS evidence (
+            evidence_id VARCHAR PRIMARY KEY, source_name VARCHAR, state VARCHAR, name VARCHAR, address VARCHAR,
+            city VARCHAR, postal_code VARCHAR, phone VARCHAR, website VARCHAR, work_types VARCHAR,
+            has_dot_flag BOOLEAN, first_seen TIMESTAMP, last_seen TIMESTAMP)""")
+        # coordinates came later; stores created before that get the columns added
+        for col in ["lat", "lon"]:
+            self.con.execute(f"ALTER TABLE evidence ADD COLUMN IF NOT EXISTS {col} DOUBLE")
+        self.con.execute("CREATE INDEX IF NOT EXISTS evidence_src_state ON evidence (source_name, state)")
+        self.con.execute("""CREATE TABLE IF NOT EXISTS entities_norm (
+            evidence_id VARCHAR PRIMARY KEY, name VARCHAR, phone VARCHAR, website_root VARCHAR,
+            market_fit_score DOUBLE, fit_label VARCHAR)""")
+        self.con.execute("""CREATE TABLE IF NOT EXISTS cluster_members (
+            evidence_id VARCHAR PRIMARY KEY, cluster_id VARCHAR)""")
+        self.con.execute("CREATE INDEX IF NOT EXISTS cluster_members_cluster ON cluster_members (cluster_id)")
+        self.con.execute("CREATE TABLE IF NOT EXISTS meta (key VARCHAR PRIMARY KEY, value VARCHAR)")
+        self._create_views()
+
+    def _create_views(self):
+        self.con.execute("""CREATE OR REPLACE VIEW entity_rows AS
+            SELECT e.evidence_id, n.name, e.address, e.city, e.state, e.postal_code, n.phone, e.website,
+                   n.website_root, e.work_types, e.source_name, e.lat, e.lon, e.has_dot_flag, n.market_fit_score, n.fit_label,
+                   coalesce(c.cluster_id, 'k' || md5(concat_ws('|', n.phone, n.website_root, coalesce(e.postal_code, ''), n.name))) AS cluster_id
+            FROM evidence e JOIN entities_norm n USING (evidence_id) LEFT JOIN cluster_members c USING (evidence_id)
+            WHERE n.fit_label <> 'exclude'""")
+        # representative and blank-filling rules of matching.resolve_entities: most
+        # complete member, best fit, lowest evidence_id; blanks take the first
+        # non-blank value in that ranking
+        from ief.resolve.matching import COALESCE_COLS, REP_COMPLETENESS_COLS
+        from ief.schema import ENTITY_COLUMNS
+        completeness = " + ".join(f"(coalesce({c}, '') <> '')::INT" for c in REP_COMPLETENESS_COLS)
+        fills = ", ".join(f"arg_min({c}, rn) FILTER (WHERE coalesce({c}, '') <> '') AS fill_{c}" for c in COALESCE_COLS)
+        agg_cols = {"has_dot_flag": "a.any_dot", "member_count": "a.member_count", "sources": "a.sources"}
+        select = ", ".join(
+            f"{agg_cols[c]} AS {c}" if c in agg_cols
+            else f"coalesce(nullif(r.{c}, ''), a.fill_{c}, r.{c}) AS {c}" if c in COALESCE_COLS
+            else f"r.{c}" for c in ENTITY_COLUMNS)
+        self.con.execute(f"""CREATE OR REPLACE VIEW entities AS
+            WITH ranked AS (
+                SELECT *, row_number() OVER (PARTITION BY cluster_id ORDER BY
+                    {completeness} DESC, market_fit_score DESC, evidence_id) AS rn
+                FROM entity_rows),
+            agg AS (
+                SELECT cluster_id, count(*) AS member_count, bool_or(coalesce(has_dot_flag, FALSE)) AS any_dot,
+                       string_agg(DISTINCT source_name, ',' ORDER BY source_name) AS sources, {fills}
+                FROM ranked GROUP BY cluster_id)
+            SELECT {select}
+            FROM ranked r JOIN agg a USING (cluster_id) WHERE r.rn = 1
+            ORDER BY cluster_id""")
+
+    def upsert_evidence(self, df: pd.DataFrame) -> int:
+        """Insert unseen evidence rows (by content hash); returns how many were new."""
+        staged = pd.DataFrame({c: df[c].astype(object) if c in df.columns else None for c in EVIDENCE_COLS}, index=df.index)
+        staged = staged.where(staged.isna(), staged.astype(str)).astype(object).where(staged.notna(), None)
+        staged.insert(0, "evidence_id", evidence_ids(df))
+        staged["has_dot_flag"] = df["has_dot_flag"].eq(True) if "has_dot_flag" in df.columns else False
+        for col in ["lat", "lon"]:
+            staged[col] = pd.to_numeric(df[col], errors="coerce") if col in df.columns else float("nan")
+        staged = staged.drop_duplicates("evidence_id")
+        before = self.con.execute("SELECT count(*) FROM evidence").fetchone()[0]
+        self.con.register("staged_evidence", staged)
+        cols = ", ".join(["evidence_id", *EVIDENCE_COLS, "has_dot_flag", "lat", "lon"])
+        self.con.execute(f"""INSERT INTO evidence ({cols}, first_seen, last_seen) SELECT {cols}, now(), now() FROM staged_evidence
+            ON CONFLICT (evidence_id) DO UPDATE SET last_seen = excluded.last_seen""")
+        self.con.unregister("staged_evidence")
+        return self.con.execute("SELECT count(*) FROM evidence").fetchone()[0] - before
+
+    def check_config(self, config_fp: str) -> bool:
+        """Record the config fingerprint; if it changed, drop normalized rows and
+        clusters so every row is re-classified and re-resolved. True if reset."""
+        row = self.con.execute("SELECT value FROM meta WHERE key = 'config_fp'").fetchone()
+        reset = row is not None and row[0] != config_fp
+        if reset:
+            logging.info("Store config changed; re-classifying and re-resolving all evidence")
+            self.con.execute("DELETE FROM entities_norm")
+            self.con.execute("DELETE FROM cluster_members")
+        self.con.execute("INSERT OR REPLACE INTO meta VALUES ('config_fp', ?)", [config_fp])
+        return reset
+
+    def normalize_pending(self, cfg: dict) -> int:
+        """Normalize + classify (set-based) every evidence row not yet in entities_norm."""
+        text = "lower(coalesce(e.name, '') || ' ' || coalesce(e.work_types, '') || ' ' || coalesce(e.source_name, ''))"
+        inc = _sql_any_contains(text, cfg.get("include_terms", []))
+        exc = _sql_any_contains(text, cfg.get("exclude_terms", []))
+        # same arithmetic, in the same order, as rules.score_record
+        score = (f"greatest(least((CASE WHEN {inc} THEN 0.6::DOUBLE ELSE 0.0::DOUBLE END)"
+                 f" - (CASE WHEN {exc} THEN 0.9::DOUBLE ELSE 0.0::DOUBLE END)"
+                 f" + (CASE WHEN coalesce(e.has_dot_flag, FALSE) THEN 0.4::DOUBLE ELSE 0.0::DOUBLE END), 1.0::DOUBLE), -1.0::DOUBLE)")
+        # scored on the normalized name, as classify_df runs after normalize_df
+        n = self.con.execute(f"""INSERT INTO entities_norm
+            SELECT e.evidence_id, e.name, e.phone, e.website_root, {score} AS s,
+                   CASE WHEN s > 0.5 THEN 'include' WHEN s < 0.2 THEN 'exclude' ELSE 'review' END
+            FROM (SELECT r.evidence_id, r.work_types, r.source_name, r.has_dot_flag,
+                         trim(regexp_replace(coalesce(r.name, ''), '{_SQL_WS}', ' ', 'g')) AS name,
+                         coalesce(ief_e164(r.phone), '') AS phone,
+                         coalesce(ief_root_domain(r.website), '') AS website_root
+                  FROM evidence r ANTI JOIN entities_norm n ON r.evidence_id = n.evidence_id) e""").fetchone()[0]
+        self._udf_results.clear()
+        return n
+
+    def resolution_candidates(self) -> pd.DataFrame:
+        """Rows to re-resolve: those not clustered yet, plus every member of any
+        cluster they could join (sharing phone, website root or postal code)."""
+        return self.con.execute("""
+            WITH fresh AS (
+                SELECT r.* FROM entity_rows r ANTI JOIN cluster_members c ON r.evidence_id = c.evidence_id),
+            touched AS (
+                -- one equi-join per key (hash joins) rather than a single OR join
+                SELECT r.cluster_id FROM entity_rows r JOIN fresh f ON r.phone = f.phone WHERE f.phone <> ''
+                UNION
+                SELECT r.cluster_id FROM entity_rows r JOIN fresh f ON r.website_root = f.website_root
+                WHERE f.website_root <> ''
+                UNION
+                SELECT r.cluster_id FROM entity_rows r JOIN fresh f ON r.postal_code = f.postal_code
+                WHERE f.postal_code <> '')
+            SELECT * FROM entity_rows WHERE cluster_id IN (SELECT cluster_id FROM touched)
+               OR evidence_id IN (SELECT evidence_id FROM fresh)""").df()
+
+    def upsert_clusters(self, members: pd.DataFrame):
+        m = members[["evidence_id", "cluster_id"]]
+        self.con.register("staged_members", m)
+        self.con.execute("""INSERT INTO cluster_members SELECT evidence_id, cluster_id FROM staged_members
+            ON CONFLICT (evidence_id) DO UPDATE SET cluster_id = excluded.cluster_id""")
+        self.con.unregister("staged_members")
+
+    def export(self, relation: str, path: str|Path):
+        """COPY a table/view to Parquet; CSV goes through pandas so it is formatted
+        exactly like the in-memory path's output (True/False, floats, blanks)."""
+        if not str(path).endswith(".parquet"):
+            write_csv(self.con.execute(f"SELECT * FROM {relation}").df(), path)
+            return
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.con.execute(f"COPY (SELECT * FROM {relation}) TO '{str(path).replace(chr(39), chr(39) * 2)}' (FORMAT PARQUET)")
+
+    def count(self, relation: str) -> int:
+        return self.con.execute(f"SELECT count(*) FROM {relation}").fetchone()[0]
+
+    def close(self):
+        self.con.close()
@@ -0,0 +1,104 @@
+from __future__ import annotations
+import hashlib, json, time
+from pathlib import Path
+from typing import Iterable, Optional, Set
+
+import pandas as pd
+
+# Delta runs without a database: the last run's normalized rows (keyed by
+# evidence_id, tagged with their cluster_id) and its entities (with an
+# entity_fp content fingerprint) are kept in a state directory. The next run
+# only normalizes, classifies and resolves what changed, and diffs entity
+# fingerprints to emit added/updated/removed entities.
+
+# representative-row bookkeeping, not entity content
+ENTITY_FP_EXCLUDE = {"cluster_id", "entity_fp", "evidence_id"}
+# rows sharing one of these can merge at the resolver's lower name threshold
+TOUCH_KEYS = ["phone", "website_root"]
+
+def _text(s: pd.Series) -> pd.Series:
+    s = s.astype(object)
+    return s.where(s.notna(), "").astype(str)
+
+def entity_fingerprints(entities: pd.DataFrame) -> pd.Series:
+    """Content hash of each entity row (every output column but ids), as 16 hex chars."""
+    cols = sorted(c for c in entities.columns if c not in ENTITY_FP_EXCLUDE)
+    text = pd.DataFrame({c: _text(entities[c]) for c in cols}, index=entities.index)
+    return pd.util.hash_pandas_object(text, index=False).map("{:016x}".format)
+
+def config_fingerprint(cfg: dict, **params) -> str:
+    """Hash of what classification and resolution depend on; a change forces a full run."""
+    blob = json.dumps({"include_terms": cfg.get("include_terms", []), "exclude_terms": cfg.get("exclude_terms", []),
+                       **params}, sort_keys=True)
+    return hashlib.blake2b(blob.encode(), digest_size=8).hexdigest()
+
+def _postal_tokens(df: pd.DataFrame) -> pd.Series:
+    """'postal|token' per distinctive name token of each row (index repeats per token)."""
+    from ..resolve.matching import NAME_STOPWORDS
+    if "postal_code" not in df.columns or "name" not in df.columns:
+        return pd.Series([], dtype=object)
+    postal = _text(df["postal_code"])
+    toks = _text(df["name"]).str.lower().str.findall(r"[a-z0-9]+").explode().dropna()
+    toks = toks[(toks.str.len() >= 3) & ~toks.isin(NAME_STOPWORDS)]
+    toks = toks[postal.reindex(toks.index) != ""]
+    return postal.reindex(toks.index) + "|" + toks
+
+def touched_clusters(prev: pd.DataFrame, fresh: pd.DataFrame, removed: Iterable[str]) -> Set[str]:
+    """Clusters to re-resolve: those sharing a phone or website root with a fresh
+    row, or a postal code plus a distinctive name token, and those that lost a member."""
+    clustered = prev[prev["cluster_id"].notna()]
+    hit = pd.Series(False, index=clustered.index)
+    for key in TOUCH_KEYS:
+        if key in clustered.columns and key in fresh.columns:
+            values = set(_text(fresh[key])) - {""}
+            hit |= _text(clustered[key]).isin(values)
+    keys = _postal_tokens(clustered)
+    hit |= clustered.index.isin(keys.index[keys.isin(set(_postal_tokens(fresh)))])
+    return set(clustered.loc[hit, "cluster_id"]) | {c for c in removed if isinstance(c, str)}
+
+def changeset(before: pd.DataFrame, after: pd.DataFrame) -> pd.DataFrame:
+    """Entities added, updated (fingerprint changed) or removed between two snapshots.
+
+    Removed entities carry their last known values; `change` is the first column.
+    """
+    old = before.set_index("cluster_id")["entity_fp"]
+    known = after["cluster_id"].isin(old.index)
+    updated = known & after["entity_fp"].ne(after["cluster_id"].map(old))
+    removed = before[~before["cluster_id"].isin(after["cluster_id"])]
+    parts = [p for p in (after[~known].assign(change="added"), after[updated].assign(change="updated"),
+                         removed.assign(change="removed")) if len(p)]
+    cols = ["change", *after.columns, *[c for c in before.columns if c not in after.columns]]
+    return (pd.concat(parts, ignore_index=True) if parts else pd.DataFrame()).reindex(columns=cols)
+
+class DeltaState:
+    """The last delta run in `root`: rows.parquet, entities.parquet and state.json.
+
+    state.json is removed before and written after the Parquet files, so a run
+    interrupted while saving leaves no state and the next run starts full.
+    """
+    def __init__(self, root: str|Path):
+        self.root = Path(root)
+        meta = self.root / "state.json"
+        self.meta = json.loads(meta.read_text()) if meta.exists() else {}
+
+    def rows(self, config_fp: str) -> Optional[pd.DataFrame]:
+        """Previous normalized rows; None if there are none or they were classified under another config."""
+        if not self.meta or self.meta.get("config_fp") != config_fp:
+            return None
+        return pd.read_parquet(self.root / "rows.parquet")
+
+    def entities(self) -> pd.DataFrame:
+        if not self.meta:
+            return pd.DataFrame(columns=["cluster_id", "entity_fp"])
+        return pd.read_parquet(self.root / "entities.parquet")
+
+    def save(self, rows: pd.DataFrame, entities: pd.DataFrame, config_fp: str):
+        self.root.mkdir(parents=True, exist_ok=True)
+        (self.root / "state.json").unlink(missing_ok=True)
+        for name, df in (("rows", rows), ("entities", entities)):
+            tmp = self.root / f"{name}.parquet.tmp"
+            df.to_parquet(tmp, index=False)
+            tmp.replace(self.root / f"{name}.parquet")
+        self.meta = {"config_fp": config_fp, "rows": len(rows), "entities": len(entities),
+                     "saved": time.strftime("%Y-%m-%dT%H:%M:%S")}
+        (self.root / "state.json").write_text(json.dumps(self.meta))
@@ -0,0 +1,53 @@
+from ief.ingestion.crawl_frontier import DONE, FAILED, IN_PROGRESS, PENDING, CrawlFrontier
+
+def _status(frontier):
+    return dict(frontier.con.execute("SELECT domain, status FROM domains"))
+
+def test_fresh_seed_resets_state(tmp_path):
+    f = CrawlFrontier(tmp_path)
+    f.seed(["a.com", "b.com"])
+    f.start("a.com")
+    f.done("a.com", {"website": "https://a.com"})
+    assert f.seed(["c.com", "a.com"]) == ["c.com", "a.com"]
+    assert _status(f) == {"c.com": PENDING, "a.com": PENDING}
+    assert f.results() == []
+
+def test_resume_skips_done_and_retries_failed_and_interrupted(tmp_path):
+    f = CrawlFrontier(tmp_path, max_attempts=3)
+    domains = ["a.com", "b.com", "c.com", "d.com"]
+    f.seed(domains)
+    f.start("a.com")
+    f.done("a.com", {"website": "https://a.com", "name": "A"})
+    f.start("b.com")
+    f.failed("b.com", "timeout")
+    f.start("c.com")  # interrupted
+    f.close()
+    f = CrawlFrontier(tmp_path, max_attempts=3)
+    assert f.seed(domains, resume=True) == ["b.com", "c.com", "d.com"]
+    assert [r["name"] for r in f.results()] == ["A"]
+
+def test_resume_gives_up_at_max_attempts(tmp_path):
+    f = CrawlFrontier(tmp_path, max_attempts=2)
+    f.seed(["a.com", "b.com"])
+    for _ in range(2):
+        f.start("a.com")
+        f.failed("a.com", "HTTP 503")
+        f.start("b.com")  # interrupted every time
+    assert f.seed(["a.com", "b.com"], resume=True) == []
+    assert _status(f) == {"a.com": FAILED, "b.com": FAILED}
+    assert f.summary() == {FAILED: 2}
+
+def test_resume_keeps_interrupted_domain_below_the_cap(tmp_path):
+    f = CrawlFrontier(tmp_path, max_attempts=2)
+    f.seed(["a.com"])
+    f.start("a.com")
+    assert f.seed(["a.com"], resume=True) == ["a.com"]
+    assert _status(f) == {"a.com": IN_PROGRESS}
+
+def test_results_keep_last_row_per_website(tmp_path):
+    f = CrawlFrontier(tmp_path)
+    f.seed(["a.com"])
+    f.done("a.com", {"website": "https://a.com", "name": "old"})
+    f.done("a.com", {"website": "https://a.com", "name": "new"})
+    assert f.results() == [{"website": "https://a.com", "name": "new"}]
+    assert _status(f) == {"a.com": DONE}
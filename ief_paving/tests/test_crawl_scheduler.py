@@ -0,0 +1,65 @@
+import asyncio
+import time
+from email.utils import formatdate
+from urllib import robotparser
+
+import pytest
+
+from ief.ingestion.crawl_scheduler import CrawlScheduler, parse_retry_after
+
+def test_parse_retry_after_seconds_and_http_date():
+    assert parse_retry_after("120") == 120.0
+    assert parse_retry_after(" 7 ") == 7.0
+    assert parse_retry_after(formatdate(time.time() + 30, usegmt=True)) == pytest.approx(30, abs=2)
+    # a date in the past means "now", not a negative wait
+    assert parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT") == 0.0
+    for bad in (None, "", "soon", "-5", "1.5"):
+        assert parse_retry_after(bad) is None
+
+def _robots(text):
+    rp = robotparser.RobotFileParser()
+    rp.parse(text.splitlines())
+    return rp
+
+def test_crawl_delay_is_a_floor_for_pacing():
+    async def run():
+        s = CrawlScheduler(rate_per_host=2.0, max_rate_per_host=4.0, speedup_after=2, max_interval_s=60)
+        s.configure_host("slow.com", _robots("User-agent: *\nCrawl-delay: 5"), "ief")
+        s.configure_host("rated.com", _robots("User-agent: *\nRequest-rate: 1/10"), "ief")
+        s.configure_host("huge.com", _robots("User-agent: *\nCrawl-delay: 3600"), "ief")
+        slow, rated, huge = s.hosts["slow.com"], s.hosts["rated.com"], s.hosts["huge.com"]
+        assert (slow.interval, rated.interval, huge.interval) == (5.0, 10.0, 60.0)
+        # fast successes speed a host up, but never past its Crawl-delay
+        for _ in range(10):
+            s.record("slow.com", 200, 0.1)
+            s.record("fast.com", 200, 0.1)
+        assert slow.interval == 5.0 and s.hosts["fast.com"].interval == 0.25
+        # errors and throttles slow it down, capped at max_interval_s
+        s.record("slow.com", 500, 0.1)
+        assert slow.interval == 7.5
+        for _ in range(5):
+            s.record("slow.com", 429, 0.1)
+        assert slow.interval == 60.0 and slow.throttles == 5 and slow.errors == 1
+        # Retry-After pushes the next request out, within max_retry_after_s
+        now = asyncio.get_running_loop().time()
+        s.record("rated.com", 503, 0.1, retry_after="30")
+        assert rated.next_at == pytest.approx(now + 30, abs=1)
+        s.record("rated.com", 503, 0.1, retry_after="9999")
+        assert rated.next_at == pytest.approx(now + 120, abs=1)
+    asyncio.run(run())
+
+def test_slot_spaces_requests_by_the_host_interval():
+    async def run():
+        s = CrawlScheduler(rate_per_host=1000, max_rate_per_host=1000, global_rps=0)
+        # robotparser only reads whole-second Crawl-delays; Request-rate gives 0.05s
+        s.configure_host("a.com", _robots("User-agent: *\nRequest-rate: 20/1"), "ief")
+        loop = asyncio.get_running_loop()
+        t0 = loop.time()
+        async def one(host):
+            async with s.slot(host):
+                return loop.time() - t0
+        times = await asyncio.gather(*(one("a.com") for _ in range(4)), one("b.com"))
+        assert sorted(times[:4])[-1] >= 0.15
+        assert times[4] < 0.05
+        assert s.hosts["a.com"].requests == 4
+    asyncio.run(run())
@@ -0,0 +1,88 @@
+import json
+
+import pandas as pd
+import pytest
+
+from ief.ingestion import crawl_shards, web_discovery
+from ief.ingestion.crawl_frontier import CrawlFrontier
+from ief.ingestion.crawl_shards import _run_shard, merge_shards, partition, shard_dir, shard_of
+from ief.schema import as_evidence
+
+DOMAINS = [f"site{i}.com" for i in range(40)]
+
+def test_shard_assignment_is_stable_and_complete():
+    # pinned: a change here reshuffles every existing shard frontier and cache
+    assert [shard_of(d, 4) for d in DOMAINS[:6]] == [2, 0, 0, 3, 3, 1]
+    assert [shard_of(d.upper(), 4) for d in DOMAINS[:6]] == [2, 0, 0, 3, 3, 1]
+    parts = partition(DOMAINS + DOMAINS[:5], 4)
+    assert sorted(d for p in parts for d in p) == sorted(DOMAINS)
+    assert all(shard_of(d, 4) == k for k, p in enumerate(parts) for d in p)
+    # input order doesn't move a domain
+    assert partition(DOMAINS[::-1], 4) == [p[::-1] for p in parts]
+    assert all(len(p) for p in parts)
+
+def _fake_crawl(crawled, crash_on=None):
+    async def crawl_domains(domains, limit, frontier, resume, on_result, **kw):
+        for d in frontier.seed(domains, resume=resume):
+            frontier.start(d)
+            if d == crash_on:
+                raise RuntimeError("worker died")
+            row = {"name": d.split(".")[0], "website": f"https://{d}"}
+            frontier.done(d, row)
+            crawled.append(d)
+            on_result(row)
+    return crawl_domains
+
+def test_restarted_shard_resumes_from_its_frontier(tmp_path, monkeypatch):
+    domains = ["a.com", "b.com", "c.com", "d.com"]
+    crawled = []
+    monkeypatch.setattr(web_discovery, "crawl_domains", _fake_crawl(crawled, crash_on="c.com"))
+    with pytest.raises(RuntimeError):
+        _run_shard(0, 1, domains, str(tmp_path), False, 3, {})
+    assert crawled == ["a.com", "b.com"]
+    assert not (shard_dir(tmp_path, 0, 1) / "rows.parquet").exists()
+
+    monkeypatch.setattr(web_discovery, "crawl_domains", _fake_crawl(crawled))
+    _run_shard(0, 1, domains, str(tmp_path), True, 3, {})
+    # only the unfinished domains are crawled again; earlier rows come from the frontier
+    assert crawled == ["a.com", "b.com", "c.com", "d.com"]
+    rows = pd.read_parquet(shard_dir(tmp_path, 0, 1) / "rows.parquet")
+    assert sorted(rows["website"]) == [f"https://{d}" for d in domains]
+
+def _shard_rows(root, k, shards, sites):
+    d = shard_dir(root, k, shards)
+    d.mkdir(parents=True, exist_ok=True)
+    as_evidence(pd.DataFrame({"name": sites, "website": [f"https://{s}" for s in sites]})).to_parquet(d / "rows.parquet")
+
+def test_merge_skips_stale_shards_and_falls_back_to_results_log(tmp_path):
+    _shard_rows(tmp_path, 0, 3, ["a.com", "b.com"])
+    _shard_rows(tmp_path, 1, 3, ["stale.com"])  # from an earlier crawl; no domains this time
+    _shard_rows(tmp_path, 2, 3, ["half.com"])
+    # shard 2 failed: its results log is newer than any rows.parquet
+    f = CrawlFrontier(shard_dir(tmp_path, 2, 3))
+    f.seed(["c.com", "b.com"])
+    for d in ("c.com", "b.com"):
+        f.start(d)
+        f.done(d, {"name": d, "website": f"https://{d}"})
+    f.close()
+    rows = merge_shards(tmp_path, 3, failed=[2], only=[0, 2])
+    assert sorted(r["website"] for r in rows) == ["https://a.com", "https://b.com", "https://c.com"]
+    assert len(pd.read_parquet(tmp_path / "web_rows.parquet")) == 3
+    assert "https://stale.com" in {r["website"] for r in merge_shards(tmp_path, 3)}
+
+def test_resume_keeps_the_recorded_shard_count(tmp_path, monkeypatch):
+    (tmp_path / "shards.json").write_text(json.dumps({"shards": 2, "domains": DOMAINS}))
+    started = []
+    class FakeProcess:
+        def __init__(self, target, name, args):
+            self.args, self.exitcode, self.sentinel = args, 0, None
+        def start(self):
+            started.append(self.args[:2])
+        def is_alive(self):
+            return False
+        def join(self):
+            pass
+    monkeypatch.setattr(crawl_shards.mp, "get_context", lambda kind: type("Ctx", (), {"Process": FakeProcess}))
+    monkeypatch.setattr(crawl_shards, "wait", lambda sentinels: None)
+    crawl_shards.crawl_sharded(DOMAINS, tmp_path, shards=4, resume=True)
+    assert sorted(started) == [(0, 2), (1, 2)]
@@ -0,0 +1,67 @@
+import pandas as pd
+
+from ief.storage.delta import DeltaState, changeset, config_fingerprint, entity_fingerprints, touched_clusters
+
+def _entities(rows):
+    df = pd.DataFrame(rows)
+    return df.assign(entity_fp=entity_fingerprints(df))
+
+def test_entity_fingerprint_ignores_ids_only():
+    a = _entities([{"cluster_id": "c1", "evidence_id": "e1", "name": "Acme", "phone": "1"}])
+    b = _entities([{"cluster_id": "c9", "evidence_id": "e7", "name": "Acme", "phone": "1"}])
+    c = _entities([{"cluster_id": "c1", "evidence_id": "e1", "name": "Acme", "phone": "2"}])
+    assert a["entity_fp"][0] == b["entity_fp"][0] != c["entity_fp"][0]
+
+def test_config_fingerprint_tracks_terms_and_params():
+    cfg = {"include_terms": ["paving"], "exclude_terms": ["pool"], "market_id": "m"}
+    fp = config_fingerprint(cfg, geo_radius_m=250)
+    assert fp == config_fingerprint(dict(cfg, market_id="other"), geo_radius_m=250)
+    assert fp != config_fingerprint(dict(cfg, include_terms=["asphalt"]), geo_radius_m=250)
+    assert fp != config_fingerprint(cfg, geo_radius_m=100)
+
+def test_changeset_added_updated_removed():
+    before = _entities([{"cluster_id": "c1", "name": "Acme", "phone": "1"},
+                        {"cluster_id": "c2", "name": "Blacktop", "phone": "2"},
+                        {"cluster_id": "c3", "name": "Rivera", "phone": "3"}])
+    after = _entities([{"cluster_id": "c1", "name": "Acme", "phone": "1"},
+                       {"cluster_id": "c2", "name": "Blacktop Bros", "phone": "2"},
+                       {"cluster_id": "c4", "name": "Summit", "phone": "4"}])
+    changes = changeset(before, after)
+    assert changes.columns[0] == "change"
+    assert dict(zip(changes["cluster_id"], changes["change"])) == {"c4": "added", "c2": "updated", "c3": "removed"}
+    assert changes.set_index("cluster_id").loc["c3", "name"] == "Rivera"
+
+def test_changeset_without_changes_is_empty():
+    snap = _entities([{"cluster_id": "c1", "name": "Acme", "phone": "1"}])
+    changes = changeset(snap, snap.copy())
+    assert changes.empty and list(changes.columns) == ["change", *snap.columns]
+
+def test_touched_clusters_by_key_postal_token_and_removal():
+    prev = pd.DataFrame([
+        {"cluster_id": "c1", "name": "Acme Paving", "phone": "+1512", "website_root": "", "postal_code": "78701"},
+        {"cluster_id": "c2", "name": "Blacktop Bros", "phone": "", "website_root": "blacktop.com", "postal_code": ""},
+        {"cluster_id": "c3", "name": "Rivera Sealcoating", "phone": "", "website_root": "", "postal_code": "48201"},
+        {"cluster_id": "c4", "name": "Summit Striping", "phone": "", "website_root": "", "postal_code": "48201"},
+        {"cluster_id": "c5", "name": "Quiet Co", "phone": "", "website_root": "", "postal_code": "80202"},
+        {"cluster_id": None, "name": "Excluded", "phone": "+1512", "website_root": "", "postal_code": ""},
+    ])
+    fresh = pd.DataFrame([
+        {"name": "ACME", "phone": "+1512", "website_root": "", "postal_code": ""},
+        {"name": "Blacktop", "phone": "", "website_root": "blacktop.com", "postal_code": ""},
+        # same postal code as c3/c4, but only c3 shares a distinctive name token
+        {"name": "Rivera Paving", "phone": "", "website_root": "", "postal_code": "48201"},
+        # an empty key never touches anything
+        {"name": "Nobody", "phone": "", "website_root": "", "postal_code": ""},
+    ])
+    assert touched_clusters(prev, fresh, removed=["c5", None]) == {"c1", "c2", "c3", "c5"}
+
+def test_delta_state_round_trip_and_config_guard(tmp_path):
+    state = DeltaState(tmp_path / "d")
+    assert state.rows("fp") is None and state.entities().empty
+    rows = pd.DataFrame({"evidence_id": ["e1"], "cluster_id": ["c1"]})
+    ents = _entities([{"cluster_id": "c1", "name": "Acme"}])
+    state.save(rows, ents, "fp")
+    again = DeltaState(tmp_path / "d")
+    assert again.rows("fp").equals(rows)
+    assert again.rows("other") is None
+    assert again.entities()["entity_fp"].tolist() == ents["entity_fp"].tolist()
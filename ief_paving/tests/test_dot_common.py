@@ -0,0 +1,48 @@
+import logging
+
+import pandas as pd
+import yaml
+
+from ief.ingestion.dot_common import DEFAULT_DOT_SOURCES, DEFAULT_MARKET_YAML, parse_dot_jobs, resolve_columns
+
+TX = DEFAULT_DOT_SOURCES["TX"]
+
+def test_defaults_are_the_market_yaml_sources():
+    assert DEFAULT_DOT_SOURCES == yaml.safe_load(DEFAULT_MARKET_YAML.read_text())["dot_sources"]
+
+def test_resolve_columns_aliases():
+    cols = ["Vendor Name", " Street Address ", "CITY", "State", "Zip Code", "Telephone", "Web Site", "Work Codes",
+            "Statement Date"]
+    assert resolve_columns(cols, TX["columns"]) == {
+        "name": "Vendor Name", "address": " Street Address ", "city": "CITY", "state": "State",
+        "postal_code": "Zip Code", "phone": "Telephone", "website": "Web Site", "work_types": "Work Codes"}
+    # the first matching rule wins per column; the last matching column wins per field
+    assert resolve_columns(["Company", "Firm"], TX["columns"]) == {"name": "Firm"}
+
+def _write(path, rows):
+    pd.DataFrame(rows).to_csv(path, index=False)
+    return path
+
+def test_missing_name_column_is_skipped(tmp_path, caplog):
+    ok = _write(tmp_path / "tx_a.csv", [{"Firm": "Acme Paving", "Phone": "512-555-0100"}])
+    bad = _write(tmp_path / "tx_b.csv", [{"Street": "1 Main St", "Phone": "512-555-0101"}])
+    with caplog.at_level(logging.WARNING):
+        a, b = parse_dot_jobs([(ok, TX), (bad, TX)], workers=1)
+    assert a["name"].tolist() == ["Acme Paving"] and a["source_name"].tolist() == ["txdot"]
+    assert b is None and "no column for name" in caplog.text
+
+def test_cache_hits_until_file_content_changes(tmp_path, caplog):
+    path = _write(tmp_path / "tx.csv", [{"Firm": "Acme Paving"}])
+    cache = tmp_path / "cache"
+    def run():
+        caplog.clear()
+        with caplog.at_level(logging.INFO):
+            (df,) = parse_dot_jobs([(path, TX)], cache_dir=cache, workers=1)
+        return df["name"].tolist(), [r.getMessage() for r in caplog.records if r.getMessage().startswith("DOT files")]
+    assert run() == (["Acme Paving"], ["DOT files: 1 parsed, 0 from cache"])
+    assert run() == (["Acme Paving"], ["DOT files: 0 parsed, 1 from cache"])
+    _write(path, [{"Firm": "Blacktop Bros"}])
+    assert run() == (["Blacktop Bros"], ["DOT files: 1 parsed, 0 from cache"])
+    # the spec is part of the key too
+    (df,) = parse_dot_jobs([(path, {**TX, "source_name": "other"})], cache_dir=cache, workers=1)
+    assert df["source_name"].tolist() == ["other"]
@@ -0,0 +1,49 @@
+import time
+
+from ief.ingestion.http_cache import ResponseCache
+
+def _store(cache, url, body="x" * 100):
+    cache.store(url, 200, "text/html", "", "", body)
+
+def test_lookup_hit_and_miss(tmp_path):
+    cache = ResponseCache(tmp_path / "c.sqlite")
+    assert cache.lookup("https://a.example/") is None
+    cache.store("https://a.example/", 200, "text/html", '"v1"', "Mon, 01 Jan 2024 00:00:00 GMT", "<html>a</html>")
+    hit = cache.lookup("https://a.example/")
+    assert (hit.status, hit.etag, hit.body) == (200, '"v1"', "<html>a</html>")
+    assert cache.misses == 1 and cache.stores == 1
+
+def test_freshness_and_revalidation(tmp_path):
+    cache = ResponseCache(tmp_path / "c.sqlite", max_age_days=1)
+    _store(cache, "https://a.example/")
+    assert cache.is_fresh(cache.lookup("https://a.example/"))
+    cache.con.execute("UPDATE responses SET fetched_at = ?", (time.time() - 2 * 86400,))
+    stale = cache.lookup("https://a.example/")
+    assert not cache.is_fresh(stale)
+    cache.mark_revalidated("https://a.example/")
+    assert cache.is_fresh(cache.lookup("https://a.example/"))
+    assert cache.revalidated == 1
+
+def test_evicts_least_recently_used(tmp_path):
+    cache = ResponseCache(tmp_path / "c.sqlite", max_bytes=350)
+    for i, url in enumerate(["https://a.example/", "https://b.example/", "https://c.example/"]):
+        _store(cache, url)
+        cache.con.execute("UPDATE responses SET accessed_at = ? WHERE url = ?", (1000.0 + i, url))
+    cache.con.execute("UPDATE responses SET accessed_at = 2000 WHERE url = 'https://a.example/'")  # a was read last
+    _store(cache, "https://d.example/")
+    assert cache.lookup("https://b.example/") is None
+    assert cache.lookup("https://a.example/") is not None
+    assert cache.total_bytes <= 350 * 0.9 and cache.evicted >= 1
+
+def test_replacing_an_entry_keeps_the_size_total(tmp_path):
+    cache = ResponseCache(tmp_path / "c.sqlite")
+    _store(cache, "https://a.example/", "x" * 100)
+    _store(cache, "https://a.example/", "x" * 40)
+    assert cache.total_bytes == 40
+    cache.close()
+    assert ResponseCache(tmp_path / "c.sqlite").total_bytes == 40
+
+def test_oversized_body_is_not_stored(tmp_path):
+    cache = ResponseCache(tmp_path / "c.sqlite", max_bytes=50)
+    _store(cache, "https://a.example/", "x" * 100)
+    assert cache.lookup("https://a.example/") is None and cache.total_bytes == 0
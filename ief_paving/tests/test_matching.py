@@ -0,0 +1,109 @@
+import numpy as np
+import pandas as pd
+
+from ief.resolve.matching import UnionFind, _windows, cluster_ids, resolve_entities
+
+def _rows():
+    return pd.DataFrame([
+        # same phone, names differ by a suffix
+        {"source_name": "osm", "name": "Acme Paving LLC", "phone": "+15125550100", "website_root": "", "postal_code": "78701"},
+        {"source_name": "dot", "name": "ACME Paving", "phone": "+15125550100", "website_root": "", "postal_code": ""},
+        # same website root, no name on one side
+        {"source_name": "web", "name": "Blacktop Bros", "phone": "", "website_root": "blacktopbros.com", "postal_code": ""},
+        {"source_name": "osm", "name": "", "phone": "", "website_root": "blacktopbros.com", "postal_code": "80202"},
+        # same postal code, near-identical names
+        {"source_name": "osm", "name": "Rivera Sealcoating", "phone": "", "website_root": "", "postal_code": "48201"},
+        {"source_name": "dot", "name": "Rivera Sealcoating Inc", "phone": "", "website_root": "", "postal_code": "48201"},
+        # same postal code, different business
+        {"source_name": "dot", "name": "Summit Striping", "phone": "", "website_root": "", "postal_code": "48201"},
+    ])
+
+def test_union_find_smaller_root_wins_regardless_of_order():
+    for pairs in ([(3, 1), (1, 2)], [(2, 1), (1, 3)], [(1, 3), (2, 3)]):
+        uf = UnionFind(5)
+        for a, b in pairs:
+            uf.union(a, b)
+        assert [uf.find(i) for i in range(5)] == [0, 1, 1, 1, 4]
+
+def test_windows_overlap_and_cover_oversized_blocks():
+    positions = np.arange(10)
+    keys = np.array([f"n{i}" for i in range(10)], dtype=object)
+    windows = list(_windows(positions, keys, max_block=4))
+    assert all(len(w) <= 4 for w in windows)
+    assert set(np.concatenate(windows)) == set(range(10))
+    assert all(set(a) & set(b) for a, b in zip(windows, windows[1:]))
+
+def test_resolve_merges_on_blocking_keys():
+    df = _rows()
+    entities, members = resolve_entities(df)
+    cid = members["cluster_id"]
+    assert cid[0] == cid[1]
+    assert cid[2] == cid[3]
+    assert cid[4] == cid[5]
+    assert cid[6] not in {cid[0], cid[2], cid[4]}
+    assert len(entities) == 4
+    acme = entities.set_index("cluster_id").loc[cid[0]]
+    assert acme["member_count"] == 2 and acme["sources"] == "dot,osm"
+    assert acme["postal_code"] == "78701"
+
+def test_cluster_ids_do_not_depend_on_row_order():
+    df = _rows()
+    _, members = resolve_entities(df)
+    shuffled = df.sample(frac=1, random_state=4).reset_index(drop=True)
+    _, members2 = resolve_entities(shuffled)
+    key = ["source_name", "name", "postal_code"]
+    a = members.set_index(key)["cluster_id"].sort_index()
+    b = members2.set_index(key)["cluster_id"].sort_index()
+    assert a.equals(b)
+
+def test_cluster_id_survives_a_new_member():
+    df = _rows()
+    _, before = resolve_entities(df)
+    extra = pd.DataFrame([{"source_name": "web", "name": "Acme Paving", "phone": "+15125550100",
+                           "website_root": "acmepaving.com", "postal_code": ""}])
+    _, after = resolve_entities(pd.concat([df, extra], ignore_index=True))
+    # the id is the smallest member hash; it only changes if the new row hashes lower
+    fp_min = cluster_ids(pd.concat([df.iloc[:2], extra], ignore_index=True), np.zeros(3, dtype=int))[0]
+    assert after["cluster_id"][7] == fp_min
+    assert after["cluster_id"][0] == after["cluster_id"][7]
+    assert set(after["cluster_id"][2:7]) == set(before["cluster_id"][2:7])
+
+def test_unnamed_row_joins_named_row_whichever_comes_first():
+    df = _rows().iloc[[3, 2]].reset_index(drop=True)
+    _, members = resolve_entities(df)
+    assert members["cluster_id"].nunique() == 1
+
+def test_similar_names_with_different_phones_stay_apart():
+    df = pd.DataFrame([
+        {"source_name": "dot", "name": "Kinransten Pioneer Sealcoating", "phone": "+15125550101", "state": "TX"},
+        {"source_name": "osm", "name": "Katinran Pioneer Sealcoating", "phone": "+15125550202", "state": "TX"},
+    ])
+    _, members = resolve_entities(df, name_threshold=80)
+    assert members["cluster_id"].nunique() == 2
+
+def test_veto_holds_through_a_row_without_keys():
+    # the middle row matches both by name, but would chain two phones together
+    df = pd.DataFrame([
+        {"source_name": "dot", "name": "Eagle Paving", "phone": "+15125550101", "website_root": "", "state": "TX"},
+        {"source_name": "osm", "name": "Eagle Paving", "phone": "", "website_root": "", "state": "TX"},
+        {"source_name": "web", "name": "Eagle Paving", "phone": "+15125550202", "website_root": "", "state": "TX"},
+    ])
+    for order in ([0, 1, 2], [2, 1, 0], [1, 2, 0]):
+        _, members = resolve_entities(df.iloc[order].reset_index(drop=True))
+        by_phone = members.groupby("phone")["cluster_id"].first()
+        assert by_phone["+15125550101"] != by_phone["+15125550202"]
+        assert members["phone"].groupby(members["cluster_id"]).apply(lambda p: p[p != ""].nunique()).max() == 1
+        # and the unkeyed row joins the same side every time
+        assert members.loc[members["phone"] == "", "cluster_id"].iloc[0] == by_phone.min()
+
+def test_name_only_matches_stay_within_a_state_or_postal_prefix():
+    df = pd.DataFrame([
+        {"source_name": "dot", "name": "Heritage Asphalt Paving", "state": "TX", "postal_code": "78701"},
+        {"source_name": "osm", "name": "Heritage Asphalt Paving Inc", "state": "MI", "postal_code": "48201"},
+        {"source_name": "web", "name": "Heritage Asphalt Paving Co", "state": "", "postal_code": "78745"},
+        {"source_name": "web", "name": "Heritage Asphalt Paving LLC", "state": "", "postal_code": "80202"},
+    ])
+    _, members = resolve_entities(df)
+    cid = members["cluster_id"]
+    assert cid[0] == cid[2]  # same postal prefix
+    assert cid.nunique() == 3
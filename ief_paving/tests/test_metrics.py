@@ -0,0 +1,56 @@
+import re
+
+from ief.metrics import RunProfile
+
+_SAMPLE = re.compile(r'^([a-zA-Z_:][a-zA-Z0-9_:]*)(\{(?:[a-zA-Z_][a-zA-Z0-9_]*="(?:[^"\\]|\\.)*",?)*\})? (\S+)$')
+
+def _parse(text):
+    """{family: type}, [(name, labels, value)]; asserts the exposition format rules we rely on."""
+    types, samples, families = {}, [], []
+    for line in text.splitlines():
+        if line.startswith("# TYPE "):
+            _, _, name, kind = line.split(" ")
+            assert name not in types
+            types[name] = kind
+            families.append(name)
+        elif line.startswith("# HELP "):
+            continue
+        else:
+            m = _SAMPLE.match(line)
+            assert m, line
+            name, labels, value = m.group(1), m.group(2) or "", float(m.group(3))
+            base = re.sub(r"_(bucket|sum|count)$", "", name)
+            family = base if types.get(base) == "histogram" else name
+            # every sample follows its own family's TYPE line
+            assert families and families[-1] == family, line
+            samples.append((name, labels, value))
+    return types, samples
+
+def test_prometheus_output_parses_with_types_and_unique_series(tmp_path):
+    prof = RunProfile()
+    for market in ("a", "b"):
+        with prof.labels(market=market):
+            for rows in (10, 5):
+                with prof.stage("normalize", rows_in=rows) as st:
+                    st.rows_out = rows
+    with prof.stage("ingest") as st:
+        st.rows_out = 30
+    prof.count("evidence_rows_total", 3, source="dot", market='x"y')
+    prof.count("evidence_rows_total", 4, source="osm", market="x")
+    prof.observe("http_request_seconds", 0.2, host="h")
+    prof.observe("http_request_seconds", 3.0, host="h")
+    prof.write_prometheus(tmp_path / "p.prom")
+    types, samples = _parse((tmp_path / "p.prom").read_text())
+
+    assert types["ief_stage_wall_seconds"] == "gauge"
+    assert types["ief_evidence_rows_total"] == "counter"
+    assert types["ief_http_request_seconds"] == "histogram"
+    series = [(n, l) for n, l, _ in samples]
+    assert len(series) == len(set(series))
+    values = {(n, l): v for n, l, v in samples}
+    # the repeated stage is summed per market
+    assert values[("ief_stage_rows_in", '{market="a",stage="normalize"}')] == 15
+    assert values[("ief_stage_rows_out", '{stage="ingest"}')] == 30
+    assert values[("ief_evidence_rows_total", '{market="x\\"y",source="dot"}')] == 3
+    assert values[("ief_http_request_seconds_bucket", '{host="h",le="+Inf"}')] == 2
+    assert values[("ief_http_request_seconds_count", '{host="h"}')] == 2
@@ -0,0 +1,52 @@
+import gzip
+import logging
+
+import pytest
+
+from ief.ingestion.osm_extract import collect_extract, iter_extract
+
+OSM = """<?xml version="1.0" encoding="UTF-8"?>
+<osm version="0.6">
+  <node id="1" lat="39.70" lon="-105.00"><tag k="name" v="Acme Paving"/></node>
+  <node id="10" lat="39.80" lon="-105.10"/>
+  <node id="11" lat="39.90" lon="-105.30"/>
+  <node id="12" lat="39.84" lon="-105.20"/>
+  <node id="13" lat="38.00" lon="-104.00"/>
+  <node id="14" lat="38.20" lon="-104.40"/>
+  <node id="15" lat="38.40" lon="-104.20"/>
+  <node id="16" lat="30.00" lon="-97.00"><tag k="name" v="Texas Asphalt"/></node>
+  <way id="100"><nd ref="10"/><nd ref="11"/><nd ref="12"/><nd ref="10"/><tag k="name" v="Blacktop ASPHALT"/></way>
+  <way id="101"><nd ref="998"/><nd ref="999"/><tag k="name" v="Ghost Paving"/></way>
+  <way id="102"><nd ref="13"/><nd ref="14"/></way>
+  <way id="103"><nd ref="10"/><nd ref="11"/><tag k="name" v="Pool Co"/></way>
+  <relation id="200">
+    <member type="way" ref="102" role="outer"/><member type="node" ref="15" role=""/>
+    <tag k="name" v="Summit Paving Yard"/>
+  </relation>
+</osm>
+"""
+
+@pytest.fixture(params=["x.osm", "x.osm.gz"])
+def extract(tmp_path, request):
+    path = tmp_path / request.param
+    with (gzip.open if request.param.endswith(".gz") else open)(path, "wt") as f:
+        f.write(OSM)
+    return path
+
+def test_ways_and_relations_get_bounding_box_centers(extract, caplog):
+    with caplog.at_level(logging.WARNING):
+        els = {(el["type"], el["id"]): el for el in iter_extract(extract, "paving|asphalt")}
+    assert set(els) == {("node", 1), ("node", 16), ("way", 100), ("relation", 200)}
+    assert els[("node", 1)]["lat"] == 39.70 and els[("node", 1)]["tags"]["name"] == "Acme Paving"
+    c = els[("way", 100)]["center"]
+    assert c["lat"] == pytest.approx(39.85) and c["lon"] == pytest.approx(-105.20)
+    # the relation's center spans its member way's nodes and its member node
+    c = els[("relation", 200)]["center"]
+    assert c["lat"] == pytest.approx(38.20) and c["lon"] == pytest.approx(-104.20)
+    # way 101 references nodes outside the extract
+    assert "dropped 1 ways and 0 relations" in caplog.text
+
+def test_collect_extract_buckets_by_state(extract):
+    out = collect_extract(extract, "paving|asphalt", ["CO", "TX"])
+    assert sorted(el["id"] for el in out["CO"]) == [1, 100, 200]
+    assert [el["id"] for el in out["TX"]] == [16]
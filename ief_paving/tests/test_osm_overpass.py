@@ -0,0 +1,81 @@
+import re
+
+import requests
+
+from bench.synth import osm_elements
+from ief.ingestion.osm_overpass import STATE_BBOX, TileCheckpoint, clip_to_state, collect_state, grid
+
+_BBOX = re.compile(r"\(([-\d.]+),([-\d.]+),([-\d.]+),([-\d.]+)\);")
+_LIMIT = re.compile(r"out center tags ?(\d*);")
+
+class FakeResponse:
+    def __init__(self, status, data=None):
+        self.status_code, self.data, self.headers = status, data or {}, {}
+
+    def json(self):
+        return self.data
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(f"HTTP {self.status_code}", response=self)
+
+class FakeOverpass:
+    """Answers Overpass queries from a fixed element list, like the real `out ... N;`.
+
+    Tiles wider than `timeout_deg` time out (504); tiles in `down` fail with a 500.
+    """
+    def __init__(self, elements, timeout_deg=99.0, down=()):
+        self.elements, self.timeout_deg, self.down = elements, timeout_deg, set(down)
+        self.tiles = []
+
+    def post(self, url, data, timeout):
+        s, w, n, e = map(float, _BBOX.search(data["data"]).groups())
+        limit = _LIMIT.search(data["data"]).group(1)
+        self.tiles.append((s, w, n, e))
+        if TileCheckpoint.key((s, w, n, e)) in self.down:
+            return FakeResponse(500)
+        if n - s > self.timeout_deg:
+            return FakeResponse(504)
+        hits = [el for el in self.elements
+                if s <= (el.get("center") or el)["lat"] <= n and w <= (el.get("center") or el)["lon"] <= e]
+        return FakeResponse(200, {"elements": hits[:int(limit)] if limit else hits})
+
+def _elements():
+    # sparse over the state plus a dense cluster near Denver that forces splits
+    sparse = osm_elements(STATE_BBOX["CO"], per_sq_deg=4, seed=1)
+    dense = osm_elements((39.70, -105.05, 39.90, -104.85), per_sq_deg=2000, seed=2)
+    return sparse + dense
+
+def _ids(elements):
+    return sorted((el["type"], el["id"]) for el in elements)
+
+def test_dense_tiles_are_split_until_complete():
+    els = _elements()
+    fake = FakeOverpass(els, timeout_deg=3.0)
+    got = collect_state("CO", "paving", step=4.0, max_elements=50, concurrency=2, session=fake)
+    assert _ids(got) == _ids(clip_to_state(els, "CO"))
+    # the 4-degree tiles time out, the dense area goes down to small tiles, the rest stays coarse
+    assert min(n - s for s, w, n, e in fake.tiles) <= 0.25
+    assert len(fake.tiles) < 200
+
+def test_checkpoint_resumes_only_unfinished_tiles(tmp_path):
+    els = _elements()
+    first_tiles = list(grid(STATE_BBOX["CO"], step=2.0))
+    down = {TileCheckpoint.key(t) for t in first_tiles[:2]}
+    fake = FakeOverpass(els, down=down)
+    partial = collect_state("CO", "paving", step=2.0, max_elements=500, max_retries=0, checkpoint_dir=tmp_path,
+                            session=fake)
+    assert len(partial) < len(clip_to_state(els, "CO"))
+
+    again = FakeOverpass(els)
+    got = collect_state("CO", "paving", step=2.0, max_elements=500, checkpoint_dir=tmp_path, session=again)
+    assert _ids(got) == _ids(clip_to_state(els, "CO"))
+    assert {TileCheckpoint.key(t) for t in again.tiles} == down
+
+    # everything is in the log now; an expired log starts over
+    third = FakeOverpass(els)
+    assert _ids(collect_state("CO", "paving", step=2.0, max_elements=500, checkpoint_dir=tmp_path,
+                              session=third)) == _ids(got)
+    assert third.tiles == []
+    collect_state("CO", "paving", step=2.0, max_elements=500, checkpoint_dir=tmp_path, max_age_days=0, session=third)
+    assert len(third.tiles) == len(first_tiles)
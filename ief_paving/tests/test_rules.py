@@ -0,0 +1,32 @@
+import numpy as np
+import pandas as pd
+
+from ief.classify.rules import MarketConfig, label_from_score, labels_from_scores, score_frame, score_record
+
+CFG = MarketConfig(include_terms=["paving", "seal.coat", "a+b", "(asphalt)"], exclude_terms=["pool", "[x]"])
+
+def test_score_frame_matches_score_record_row_by_row():
+    df = pd.DataFrame([
+        {"name": "Acme Paving", "work_types": "HMAC", "source_name": "txdot", "has_dot_flag": True},
+        {"name": np.nan, "work_types": np.nan, "source_name": "osm", "has_dot_flag": False},
+        {"name": None, "work_types": "PAVING", "source_name": None, "has_dot_flag": np.nan},
+        {"name": "ACME PAVING & POOLS", "work_types": "", "source_name": "web", "has_dot_flag": False},
+        # regex metacharacters are literal: "seal.coat" must not match "sealxcoat"
+        {"name": "Sealxcoat Co", "work_types": "", "source_name": "web", "has_dot_flag": False},
+        {"name": "Seal.Coat Co", "work_types": "", "source_name": "web", "has_dot_flag": False},
+        {"name": "A+B Contractors", "work_types": "", "source_name": "web", "has_dot_flag": True},
+        {"name": "AAB Contractors", "work_types": "", "source_name": "web", "has_dot_flag": False},
+        {"name": "(Asphalt) Inc [x]", "work_types": "", "source_name": "web", "has_dot_flag": False},
+        {"name": "Asphalt Inc x", "work_types": "", "source_name": "web", "has_dot_flag": True},
+    ])
+    expected = [score_record(r, CFG) for r in df.to_dict("records")]
+    got = score_frame(df, CFG)
+    assert got.tolist() == expected
+    assert labels_from_scores(got).tolist() == [label_from_score(s) for s in expected]
+    assert expected[4] == 0.0 and expected[5] == 0.6 and expected[7] == 0.0
+
+def test_label_boundaries():
+    scores = pd.Series([0.19, 0.2, 0.35, 0.5, 0.51, -1.0, 1.0])
+    labels = ["exclude", "review", "review", "review", "include", "exclude", "include"]
+    assert [label_from_score(s) for s in scores] == labels
+    assert labels_from_scores(scores).tolist() == labels
@@ -0,0 +1,28 @@
+import warnings
+
+import pandas as pd
+
+from ief.flows.paving_run import split_by_name
+from ief.schema import EVIDENCE_SCHEMA, as_evidence, concat_evidence
+
+def test_concat_evidence_unions_categories_without_warnings():
+    dot = as_evidence(pd.DataFrame({"name": ["Acme"], "state": ["TX"]}), source_name="txdot")
+    osm = as_evidence(pd.DataFrame({"name": ["Blacktop"], "lat": [30.1], "lon": [-97.7]}))
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        out = concat_evidence([dot, as_evidence(pd.DataFrame()), osm])
+    assert list(out.columns) == list(EVIDENCE_SCHEMA)
+    assert out["name"].tolist() == ["Acme", "Blacktop"]
+    assert out["source_name"].tolist()[0] == "txdot" and pd.isna(out["source_name"][1])
+    assert out["state"].dtype == "category" and out["lat"].isna().tolist() == [True, False]
+    assert concat_evidence([]).empty
+
+def test_split_by_name_filters_per_market_without_group_warning():
+    df = as_evidence(pd.DataFrame({"name": ["Acme Paving", "Pool Co", None, "Best Sealcoating"]}))
+    cfgs = [{"market_id": "paving", "platform_categories": {"osm_name_regex": "(paving|asphalt)"}},
+            {"market_id": "seal", "platform_categories": {"osm_name_regex": "seal(coat|ing)"}}]
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        out = split_by_name(df, cfgs)
+    assert out["paving"]["name"].tolist() == ["Acme Paving"]
+    assert out["seal"]["name"].tolist() == ["Best Sealcoating"]
@@ -0,0 +1,125 @@
+import zlib
+
+import numpy as np
+import pytest
+
+from ief.resolve.spatial import GridIndex, haversine_m, in_state
+
+# Town centres on either side of a state line; clip_to_state drops
+# Overpass rows with these outlines, so a wrong side loses or imports rows.
+BORDER_TOWNS = [
+    ("Brownsville TX", 25.9017, -97.4975, "TX", True),
+    ("Matamoros MX", 25.87, -97.50, "TX", False),
+    ("McAllen TX", 26.2034, -98.2300, "TX", True),
+    ("Reynosa MX", 26.0508, -98.2979, "TX", False),
+    ("Roma TX", 26.4053, -99.0156, "TX", True),
+    ("Laredo TX", 27.5306, -99.4803, "TX", True),
+    ("Nuevo Laredo MX", 27.4763, -99.5164, "TX", False),
+    ("Eagle Pass TX", 28.7091, -100.4995, "TX", True),
+    ("Piedras Negras MX", 28.7000, -100.5231, "TX", False),
+    ("Del Rio TX", 29.3627, -100.8968, "TX", True),
+    ("Ciudad Acuna MX", 29.3232, -100.9522, "TX", False),
+    ("Presidio TX", 29.5607, -104.3722, "TX", True),
+    ("Ojinaga MX", 29.5461, -104.4083, "TX", False),
+    ("Fabens TX", 31.5023, -106.1586, "TX", True),
+    ("El Paso TX", 31.7619, -106.4850, "TX", True),
+    ("Ciudad Juarez MX", 31.6904, -106.4245, "TX", False),
+    ("Sunland Park NM", 31.7965, -106.5799, "TX", False),
+    ("Hobbs NM", 32.7026, -103.1360, "TX", False),
+    ("Texline TX", 36.3770, -103.0216, "TX", True),
+    ("Guymon OK", 36.6828, -101.4816, "TX", False),
+    ("Denison TX", 33.7557, -96.5367, "TX", True),
+    ("Durant OK", 33.9940, -96.3708, "TX", False),
+    ("Texarkana TX", 33.4251, -94.0477, "TX", True),
+    ("Shreveport LA", 32.5252, -93.7502, "TX", False),
+    ("Orange TX", 30.0930, -93.7366, "TX", True),
+    ("Vinton LA", 30.1905, -93.5813, "TX", False),
+    ("South Padre Island TX", 26.1118, -97.1681, "TX", True),
+    ("Menominee MI", 45.11, -87.61, "MI", True),
+    ("Marinette WI", 45.0870, -87.6650, "MI", False),
+    ("Peshtigo WI", 45.0544, -87.7490, "MI", False),
+    ("Iron Mountain MI", 45.8202, -88.0660, "MI", True),
+    ("Florence WI", 45.9222, -88.2518, "MI", False),
+    ("Ironwood MI", 46.4547, -90.1710, "MI", True),
+    ("Hurley WI", 46.4400, -90.1900, "MI", False),
+    ("Sault Ste. Marie MI", 46.4953, -84.3453, "MI", True),
+    ("Sault Ste. Marie ON", 46.5219, -84.3461, "MI", False),
+    ("Detroit MI", 42.3314, -83.0458, "MI", True),
+    ("Windsor ON", 42.2800, -83.0000, "MI", False),
+    ("Port Huron MI", 42.9709, -82.4249, "MI", True),
+    ("Sarnia ON", 42.9745, -82.3900, "MI", False),
+    ("Monroe MI", 41.9164, -83.3977, "MI", True),
+    ("Toledo OH", 41.6528, -83.5379, "MI", False),
+    ("Niles MI", 41.8298, -86.2542, "MI", True),
+    ("South Bend IN", 41.6764, -86.2520, "MI", False),
+    ("Copper Harbor MI", 47.4686, -87.8886, "MI", True),
+    ("Washington Island WI", 45.3800, -86.9000, "MI", False),
+    ("Trinidad CO", 37.1695, -104.5005, "CO", True),
+    ("Raton NM", 36.9034, -104.4392, "CO", False),
+    ("Julesburg CO", 40.9886, -102.2638, "CO", True),
+    ("Cheyenne WY", 41.1400, -104.8202, "CO", False),
+]
+
+@pytest.mark.parametrize("town,lat,lon,state,inside", BORDER_TOWNS, ids=[t[0] for t in BORDER_TOWNS])
+def test_in_state_border_towns(town, lat, lon, state, inside):
+    assert bool(in_state([lat], [lon], state)[0]) is inside
+
+def test_in_state_without_outline_keeps_everything():
+    assert in_state([10.0, 60.0], [0.0, 0.0], "ZZ").all()
+
+def test_pairs_within_matches_brute_force():
+    rng = np.random.default_rng(1)
+    lat, lon = rng.uniform(29.0, 29.2, 400), rng.uniform(-98.6, -98.4, 400)
+    lat[5] = np.nan
+    ii, jj = GridIndex(lat, lon, cell_m=300).pairs_within(500)
+    got = set(zip(ii.tolist(), jj.tolist()))
+    d = haversine_m(lat[:, None], lon[:, None], lat[None, :], lon[None, :])
+    want = {(i, j) for i, j in zip(*np.nonzero(d <= 500)) if i < j}
+    assert got == want
+
+def test_query_radius_matches_brute_force():
+    rng = np.random.default_rng(2)
+    lat, lon = rng.uniform(42.0, 42.1, 300), rng.uniform(-83.1, -83.0, 300)
+    index = GridIndex(lat, lon, cell_m=250)
+    found = set(index.query_radius(lat[0], lon[0], 1000).tolist())
+    assert found == set(np.flatnonzero(haversine_m(lat[0], lon[0], lat, lon) <= 1000).tolist())
+
+def _brute_pairs(lat, lon, radius_m):
+    d = haversine_m(lat[:, None], lon[:, None], lat[None, :], lon[None, :])
+    return {(i, j) for i, j in zip(*np.nonzero(d <= radius_m)) if i < j}
+
+def _cluster(rng, n, lat, lon, spread_deg, lon_spread_deg=None):
+    lats = np.clip(lat + rng.uniform(-spread_deg, spread_deg, n), -90, 90)
+    lons = (lon + rng.uniform(-1, 1, n) * (lon_spread_deg or spread_deg) + 180) % 360 - 180
+    return lats, lons
+
+# (name, centre lat, centre lon, lat spread, lon spread, cell_m, radius_m)
+REGIONS = [
+    ("cell boundaries", 29.1, -98.5, 0.02, 0.02, 250, 1000),
+    ("radius below cell", 45.0, 10.0, 0.05, 0.05, 2000, 300),
+    ("antimeridian", -16.5, 180.0, 0.02, 0.02, 300, 800),
+    ("antimeridian high latitude", 65.8, -180.0, 0.02, 0.08, 300, 1500),
+    ("odd cell width at the antimeridian", 0.0, 180.0, 0.01, 0.01, 777, 400),
+    ("north pole", 89.97, 0.0, 0.03, 180.0, 500, 3000),
+    ("south pole", -89.9, 0.0, 0.1, 180.0, 1000, 5000),
+    ("mixed latitudes", 50.0, 0.0, 40.0, 0.0005, 500, 600),
+]
+
+@pytest.mark.parametrize("name,lat,lon,dlat,dlon,cell_m,radius_m", REGIONS, ids=[r[0] for r in REGIONS])
+def test_grid_index_matches_brute_force(name, lat, lon, dlat, dlon, cell_m, radius_m):
+    rng = np.random.default_rng(zlib.crc32(name.encode()))
+    lats, lons = _cluster(rng, 500, lat, lon, dlat, dlon)
+    index = GridIndex(lats, lons, cell_m=cell_m)
+    ii, jj = index.pairs_within(radius_m)
+    want = _brute_pairs(lats, lons, radius_m)
+    assert len(ii) == len(want) and set(zip(ii.tolist(), jj.tolist())) == want
+    for q in range(0, 500, 25):
+        found = index.query_radius(lats[q], lons[q], radius_m)
+        assert sorted(found.tolist()) == np.flatnonzero(haversine_m(lats[q], lons[q], lats, lons) <= radius_m).tolist()
+
+def test_grid_index_across_the_antimeridian_and_pole():
+    lat = np.array([10.0, 10.0, 89.99, 89.99, -89.995, -89.995])
+    lon = np.array([179.999, -179.999, 0.0, 180.0, 90.0, -90.0])
+    ii, jj = GridIndex(lat, lon, cell_m=250).pairs_within(2500)
+    assert set(zip(ii.tolist(), jj.tolist())) == {(0, 1), (2, 3), (4, 5)}
+    assert sorted(GridIndex(lat, lon, cell_m=250).query_radius(10.0, 180.0, 500).tolist()) == [0, 1]
@@ -0,0 +1,66 @@
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from ief.schema import EVIDENCE_PARTITIONS, EVIDENCE_SCHEMA, as_evidence
+from ief.storage.db import EvidenceDataset, ParquetAppender, arrow_schema
+
+KINDS = {pa.string(): "string", pa.dictionary(pa.int32(), pa.string()): "category", pa.bool_(): "bool",
+         pa.float64(): "float"}
+
+# batches with different columns present and different columns entirely null
+BATCHES = [
+    as_evidence(pd.DataFrame({"name": ["Acme Paving", "Blacktop"], "state": ["TX", "MI"], "city": ["Austin", None],
+                              "source_name": ["txdot", "mdot"], "postal_code": ["78701", None]}), has_dot_flag=True),
+    pd.DataFrame({"name": ["Rivera Sealcoating"], "state": ["TX"], "source_name": ["osm"], "lat": [30.2], "lon": [-97.7],
+                  "has_dot_flag": [None], "extra": [1]}),
+    pd.DataFrame({"name": [None], "state": [None], "source_name": ["web"], "website": ["https://x.com"]}),
+]
+
+def _kinds(schema, skip=()):
+    return {f.name: KINDS[f.type] for f in schema if f.name not in skip}
+
+def test_parquet_appender_round_trip(tmp_path):
+    out = ParquetAppender(tmp_path / "e.parquet", EVIDENCE_SCHEMA, row_group_size=2)
+    for b in BATCHES:
+        out.write(b)
+    out.close()
+    table = pq.read_table(tmp_path / "e.parquet")
+    assert table.schema.equals(arrow_schema(EVIDENCE_SCHEMA))
+    assert _kinds(table.schema) == EVIDENCE_SCHEMA
+    df = table.to_pandas()
+    assert out.rows == len(df) == 4
+    assert df["name"].tolist()[:3] == ["Acme Paving", "Blacktop", "Rivera Sealcoating"] and pd.isna(df["name"][3])
+    assert df["has_dot_flag"].tolist() == [True, True, False, False]
+    assert df["lat"].isna().tolist() == [True, True, False, True]
+
+def test_empty_appender_leaves_a_valid_file(tmp_path):
+    out = ParquetAppender(tmp_path / "e.parquet", EVIDENCE_SCHEMA)
+    out.close()
+    assert pq.read_table(tmp_path / "e.parquet").schema.equals(arrow_schema(EVIDENCE_SCHEMA))
+
+def test_evidence_dataset_round_trip_by_partition(tmp_path):
+    lake = EvidenceDataset(tmp_path / "lake", run_date="2026-01-02", row_group_size=2)
+    for b in BATCHES:
+        lake.write(b)
+    assert lake.close() == 4
+    files = sorted((tmp_path / "lake").rglob("*.parquet"))
+    # every file has the full typed layout, whatever its batch's nulls were
+    for f in files:
+        assert _kinds(pq.read_schema(f)) == {c: t for c, t in EVIDENCE_SCHEMA.items() if c not in EVIDENCE_PARTITIONS}
+    dataset = ds.dataset(tmp_path / "lake", format="parquet", partitioning="hive")
+    assert _kinds(dataset.schema) == {"run_date": "string", **EVIDENCE_SCHEMA, "state": "string", "source_name": "string"}
+    tx = dataset.to_table(filter=ds.field("state") == "TX").to_pandas()
+    assert sorted(tx["name"]) == ["Acme Paving", "Rivera Sealcoating"]
+    assert set(tx["source_name"]) == {"txdot", "osm"} and set(tx["run_date"]) == {"2026-01-02"}
+    web = dataset.to_table(filter=ds.field("source_name") == "web").to_pandas()
+    assert web["website"].tolist() == ["https://x.com"] and web["state"].isna().all()
+    assert dataset.count_rows() == lake.rows == 4
+    # a rerun the same day replaces the partitions it writes, and only those
+    again = EvidenceDataset(tmp_path / "lake", run_date="2026-01-02")
+    again.write(pd.DataFrame({"name": ["Summit Paving"], "state": ["MI"], "source_name": ["mdot"]}))
+    again.close()
+    mi = ds.dataset(tmp_path / "lake", format="parquet", partitioning="hive").to_table(
+        filter=ds.field("state") == "MI").to_pandas()
+    assert mi["name"].tolist() == ["Summit Paving"]
@@ -0,0 +1,37 @@
+from argparse import Namespace
+
+import pandas as pd
+
+from bench.synth import evidence_frame
+from ief.flows.paving_run import load_cfg, process_market
+
+def _args(tmp_path, name, **kw):
+    base = dict(out=str(tmp_path / f"{name}.csv"), evidence_dir="", store="", delta_dir="", normalize_cache="",
+                resolver="fuzzy", geo_radius_m=250, save_clusters="", save_evidence="")
+    return Namespace(**{**base, **kw})
+
+def test_store_output_matches_in_memory(tmp_path):
+    cfg = load_cfg()
+    evidence = evidence_frame(3000, seed=5)
+    # duplicated rows, shuffled: neither may change the output
+    evidence = pd.concat([evidence, evidence.head(200)]).sample(frac=1, random_state=1).reset_index(drop=True)
+    mem = _args(tmp_path, "mem")
+    process_market(mem, cfg, evidence)
+    store = _args(tmp_path, "store", store=str(tmp_path / "s.duckdb"))
+    process_market(store, cfg, evidence)
+    a, b = (open(p.out).read() for p in (mem, store))
+    assert a.count("\n") > 100
+    assert a == b
+
+def test_delta_run_over_unchanged_evidence_matches_full_run(tmp_path):
+    cfg = load_cfg()
+    evidence = evidence_frame(3000, seed=9)
+    full = _args(tmp_path, "full")
+    process_market(full, cfg, evidence)
+    delta = _args(tmp_path, "delta", delta_dir=str(tmp_path / "state"))
+    expected = open(full.out).read()
+    for frame in (evidence, evidence.sample(frac=1, random_state=2)):
+        process_market(delta, cfg, frame)
+        assert open(delta.out).read() == expected
+    assert "entity_fp" not in open(delta.out).readline()
+    assert open(tmp_path / "delta_changes.csv").read().count("\n") == 1
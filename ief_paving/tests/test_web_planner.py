@@ -0,0 +1,58 @@
+import asyncio
+
+from ief.ingestion.web_discovery import crawl_domain, rank_pages
+
+HOME_PHONE = "<html><head><title>Acme Paving</title></head><body>Call 512-555-0100</body></html>"
+HOME_BARE = "<html><head><title>Acme Paving</title></head><body>Welcome</body></html>"
+SERVICES = "<html><head><title>Services</title></head><body>Asphalt paving and sealcoating</body></html>"
+CONTACT = "<html><head><title>Contact</title></head><body>Phone: (512) 555-0100</body></html>"
+
+class FakeFetcher:
+    """Serves a fixed site; records the order pages were requested in."""
+    def __init__(self, pages, sitemaps=()):
+        self.pages, self.sitemaps, self.fetched = pages, list(sitemaps), []
+
+    async def get(self, url, content_types=("text/html",)):
+        self.fetched.append(url.removeprefix("https://acme.com"))
+        return self.pages.get(url.removeprefix("https://acme.com"), "")
+
+    async def site_maps(self, base):
+        return self.sitemaps
+
+def _sitemap(paths):
+    return "<urlset>" + "".join(f"<url><loc>https://acme.com{p}</loc></url>" for p in paths) + "</urlset>"
+
+def test_rank_pages_by_keywords_depth_and_site():
+    urls = ["https://acme.com/", "https://www.acme.com/contact-us", "https://acme.com/blog/paving-tips",
+            "https://acme.com/services/asphalt-paving", "https://acme.com/services", "https://other.com/contact",
+            "https://acme.com/gallery", "https://acme.com/about", "https://acme.com/brochure.pdf",
+            "https://acme.com/contact-us"]
+    assert rank_pages(urls, "https://acme.com", 10) == [
+        "https://acme.com/services/asphalt-paving",  # service + asphalt + paving
+        "https://www.acme.com/contact-us",
+        "https://acme.com/about",
+        "https://acme.com/services",
+    ]
+    assert rank_pages(urls, "https://acme.com", 2) == rank_pages(urls, "https://acme.com", 10)[:2]
+
+def test_stops_at_the_homepage_when_it_reaches_the_target():
+    fetcher = FakeFetcher({"/": HOME_PHONE, "/services": SERVICES})
+    row = asyncio.run(crawl_domain("acme.com", fetcher, target_score=1))
+    assert fetcher.fetched == ["/"]
+    assert row["phone"] == "+15125550100" and row["_score"] == 1 and row["source_name"] == "web"
+
+def test_fetches_ranked_sitemap_pages_until_the_target():
+    sitemap = _sitemap(["/gallery", "/blog/news", "/contact", "/services", "/about", "/areas"])
+    fetcher = FakeFetcher({"/": HOME_BARE, "/services": SERVICES, "/contact": CONTACT, "/sitemap.xml": sitemap})
+    row = asyncio.run(crawl_domain("acme.com", fetcher, max_pages=6, fanout=1))
+    # contact (4) before about/services (3, shorter path first); stop once phone + work types are in
+    assert fetcher.fetched == ["/", "/sitemap.xml", "/contact", "/about", "/services"]
+    assert row["_score"] == 2 and row["name"] == "Acme Paving"
+    assert row["phone"] == "+15125550100" and "sealcoating" in row["work_types"]
+
+def test_without_a_sitemap_falls_back_to_service_paths_and_max_pages():
+    fetcher = FakeFetcher({"/": HOME_BARE})
+    row = asyncio.run(crawl_domain("acme.com", fetcher, max_pages=3, fanout=2))
+    assert fetcher.fetched == ["/", "/sitemap.xml", "/about", "/services"]
+    assert row["_score"] == 0 and row["name"] == "Acme Paving"
+    assert asyncio.run(crawl_domain("acme.com", FakeFetcher({}), max_pages=3)) == {}